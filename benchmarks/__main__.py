@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""Runs the benchmark suite from the repository root, e.g.
+python -m benchmarks --output results.json --baseline baseline.json"""
+
+import argparse
+import benchmarks.suite as bs
+
+parser = argparse.ArgumentParser(
+	prog='python -m benchmarks',
+	description='Benchmark training and its most expensive functions')
+parser.add_argument(
+	'--tracks', nargs='+', default=['0', '1'], help='track numbers to use')
+parser.add_argument(
+	'--particle-sizes', nargs='+', default=['15'], help='particle sizes to use')
+parser.add_argument(
+	'--populations', nargs='+', type=int, default=[100, 1000],
+	help='numbers of particles per generation')
+parser.add_argument(
+	'--engines', nargs='+', default=['particle', 'vectorised'],
+	help="engines to time generations of ('particle', 'vectorised' or "
+	"'parallel')")
+parser.add_argument(
+	'--generations', type=int, default=10,
+	help='number of generations timed for each engine and population')
+parser.add_argument(
+	'--genome-length', type=int, default=300,
+	help='length of genomes used to benchmark mutation and selection')
+parser.add_argument(
+	'-o', '--output', default='benchmark_results.json',
+	help='path to write results to, as JSON')
+parser.add_argument(
+	'--baseline', default=None,
+	help='path of earlier results to compare against; regressions are listed and '
+	'give a non-zero exit status')
+parser.add_argument(
+	'--tolerance', type=float, default=0.2,
+	help='fraction by which a result may be worse than baseline, default 0.2')
+args = parser.parse_args()
+
+results = bs.run_benchmarks(
+	args.tracks, args.particle_sizes, args.populations, args.engines,
+	args.generations, args.genome_length)
+bs.write_results(args.output, results)
+print('Results written to {}'.format(args.output))
+
+if args.baseline is not None:
+	regressions = bs.compare_results(
+		results, bs.read_results(args.baseline), args.tolerance)
+	for name, baseline_value, value, change in regressions:
+		print('REGRESSION {}: {:.4g} -> {:.4g} ({:+.0%})'.format(
+			name, baseline_value, value, change))
+	if regressions:
+		raise SystemExit(1)
+	print('No regressions against {}'.format(args.baseline))
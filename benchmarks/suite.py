@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of whole generations (in headless mode) and of the functions
+that dominate them, across tracks, particle sizes and population sizes. Each
+result has a value, its unit and whether higher values are better, such that
+results can be saved as JSON and compared against a stored baseline"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import random
+import platform
+import subprocess
+import statistics
+import numpy as np
+import pygame
+import cv2
+import modules.initialisation as init
+import modules.generation_run as gr
+import modules.distance_handling as dh
+import modules.run_modes as rm
+import modules.parallel_run as pr
+import modules.metrics as mt
+import modules.genome as g
+from modules.particle import Particle
+from modules.fitness_cache import FitnessCache
+
+# minimum total time of each repeat of a micro-benchmark, in seconds
+min_repeat_time = 0.2
+num_of_repeats = 5
+
+
+def get_machine_info():
+	"""Returns details of machine and software that results depend on"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	try:
+		commit = subprocess.run(
+			['git', 'rev-parse', 'HEAD'], cwd=parent_path, capture_output=True,
+			text=True, timeout=10).stdout.strip() or None
+	except (OSError, subprocess.SubprocessError):
+		commit = None
+	return {
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'processor': platform.processor(),
+		'cpu_count': os.cpu_count(),
+		'python': sys.version.split()[0],
+		'numpy': np.__version__,
+		'pygame': pygame.version.ver,
+		'opencv': cv2.__version__,
+		'commit': commit,
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def get_result(value, unit, higher_is_better, **details):
+	"""Returns result of a benchmark, as stored in JSON"""
+	result = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+	result.update(details)
+	return result
+
+
+def time_per_call(func):
+	"""Returns best and median time of a call of func, in seconds, over
+	num_of_repeats repeats each lasting at least min_repeat_time"""
+	timer = timeit.Timer(func)
+	number, total = timer.autorange()
+	number = max(number, int(number * min_repeat_time / max(total, 1e-9)))
+	times = [t / number for t in timer.repeat(num_of_repeats, number)]
+	return min(times), statistics.median(times)
+
+
+def get_input_params(track_num, particle_size, population, engine, seed=0):
+	"""Returns input_params, as set up by main.py, for headless training with
+	specified engine"""
+	return {
+		'particle_size': particle_size,
+		'track_num': track_num,
+		'num_of_particles_per_generation': population,
+		'movement_step': 15,
+		'mutation_chance_options': (
+			[i for i in range(10, 101, 10)] + [i for i in range(100, 1001, 100)]),
+		'num_best_to_take': 5,
+		'num_random_to_take': 3,
+		'chance_of_picking_random_sample': 10,
+		'fps': 60,
+		'mutate_moves_mapping_func_type': 'exp',
+		'pickle_best': False,
+		'adaptive_algo': [True, 1, 100, 0],
+		'headless': True,
+		'engine': engine,
+		'num_of_workers': None,
+		'seed': seed,
+		'fitness_tiebreak': 'steps',
+		'reuse_parent_prefix': True,
+		'fitness_cache_size': 10000,
+		'fitness_mode': 'sections'}
+
+
+def get_params(track_num, particle_size, population, engine, seed=0):
+	"""Returns input_params and headless init_params, as set up by main.py, for
+	training with specified engine"""
+	input_params = get_input_params(
+		track_num, particle_size, population, engine, seed)
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		track_bitmap, victory_box_bitmap, possible_moves, starting_pos,
+		sections) = init.initialise_from_track_bundle(input_params)
+	init_params = {
+		'track_img': track_img,
+		'particle_width': particle_width,
+		'particle_height': particle_height,
+		'display_width': display_width,
+		'display_height': display_height,
+		'track_bitmap': track_bitmap,
+		'victory_box_bitmap': victory_box_bitmap,
+		'possible_moves': possible_moves,
+		'starting_pos': starting_pos,
+		'sections': sections,
+		'section_index': init.initialise_section_index(sections),
+		'distance_field': None,
+		'game_display': None,
+		'clock': None,
+		'rng': random.Random(seed),
+		'trajectories': None,
+		'fitness_cache': FitnessCache(input_params['fitness_cache_size'])}
+	return input_params, init_params
+
+
+def run_generations(input_params, init_params, num_of_generations):
+	"""Runs num_of_generations generations of training with
+	rm.run_all_generations, without printing or checkpointing, returning time
+	taken and number of particle steps simulated, as recorded in the metrics of
+	each generation"""
+	input_params = dict(
+		input_params, num_of_generations=num_of_generations, print_progress=False,
+		checkpoint_interval=0, adaptive_algo=list(input_params['adaptive_algo']))
+	metrics_sink = mt.RingBufferSink(max_records=num_of_generations)
+	init_params['metrics_sink'] = metrics_sink
+	start_time = time.perf_counter()
+	rm.run_all_generations(input_params, init_params)
+	elapsed = time.perf_counter() - start_time
+	return elapsed, sum(record['steps'] for record in metrics_sink.get_records())
+
+
+def benchmark_generations(
+	track_num, particle_size, population, engine, num_of_generations):
+	"""Returns generations per second and steps per second of training. For the
+	parallel engine, workers are started for this case before training is timed,
+	and the time taken to start them is returned separately"""
+	input_params, init_params = get_params(
+		track_num, particle_size, population, engine)
+	results = {}
+	if engine == 'parallel':
+		# every worker is started, with one genome each
+		start_time = time.perf_counter()
+		pr.simulate_genomes(
+			input_params, init_params,
+			[b''] * pr.get_num_of_workers(input_params), 0)
+		results['pool_startup'] = get_result(
+			(time.perf_counter() - start_time) * 1e3, 'ms', False)
+	try:
+		elapsed, num_of_steps = run_generations(
+			input_params, init_params, num_of_generations)
+	finally:
+		if engine == 'parallel':
+			pr.shutdown_pool()
+	results['generations_per_sec'] = get_result(
+		num_of_generations / elapsed, 'generations/s', True,
+		generations=num_of_generations)
+	results['steps_per_sec'] = get_result(
+		num_of_steps / elapsed, 'steps/s', True, steps=num_of_steps)
+	return results
+
+
+def get_track_moves(sections, section_index, movement_step, num_of_moves, rng):
+	"""Returns list of (prev_pos, current_pos) single moves within sections"""
+	moves = []
+	bounds = section_index.bounds
+	while len(moves) < num_of_moves:
+		x_start, x_end, y_start, y_end = bounds[rng.randrange(len(bounds))]
+		prev_pos = (rng.randint(x_start, x_end), rng.randint(y_start, y_end))
+		direction = g.directions[rng.choice(g.possible_moves)]
+		current_pos = (
+			prev_pos[0] + direction[0] * movement_step,
+			prev_pos[1] + direction[1] * movement_step)
+		if 0 <= current_pos[0] < section_index.raster.shape[0] and (
+			0 <= current_pos[1] < section_index.raster.shape[1]) and (
+			section_index.raster[current_pos] >= 0):
+			moves.append((prev_pos, current_pos))
+	return moves
+
+
+def benchmark_functions(track_num, particle_size):
+	"""Returns time per call of collision checks and distance scoring on the
+	specified track and particle"""
+	input_params = {
+		'particle_size': particle_size, 'track_num': track_num,
+		'fitness_mode': 'sections'}
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
+		sections) = init.initialise_setup(input_params)
+	track_bitmap, victory_box_bitmap = init.initialise_collision_bitmaps(
+		particle_mask, track_mask, victory_box_mask)
+	track_rows = gr.get_collision_rows(track_bitmap)
+	section_index = init.initialise_section_index(sections)
+	rng = random.Random(0)
+	positions = [
+		(rng.randrange(display_width), rng.randrange(display_height))
+		for i in range(1000)]
+	moves = get_track_moves(sections, section_index, 15, 1000, rng)
+	particle = Particle(particle_size, starting_pos, load_img=False)
+
+	def check_masks():
+		for x, y in positions:
+			gr.collision_check(track_mask, particle_mask, x, y)
+
+	def check_bitmap():
+		for x, y in positions:
+			gr.bitmap_collision_check(
+				track_rows, particle_width, particle_height, x, y)
+
+	def score_moves(index):
+		for prev_pos, current_pos in moves:
+			particle.x, particle.y = current_pos
+			dh.update_distance_score(sections, particle, prev_pos, 15, index)
+
+	results = {}
+	for name, func, calls in (
+		('collision_check', check_masks, len(positions)),
+		('bitmap_collision_check', check_bitmap, len(positions)),
+		('update_distance_score', lambda: score_moves(None), len(moves)),
+		(
+			'update_distance_score_indexed', lambda: score_moves(section_index),
+			len(moves))):
+		best, median = time_per_call(func)
+		results[name] = get_result(
+			best / calls * 1e6, 'us/call', False, median=median / calls * 1e6)
+	return results
+
+
+def benchmark_selection(population, genome_length):
+	"""Returns time per generation of mutation and selection for a population of
+	genomes of specified length"""
+	input_params = get_input_params('0', '15', population, 'vectorised')
+	rng = random.Random(0)
+	genomes = [
+		bytes(rng.choice(g.possible_moves) for j in range(genome_length))
+		for i in range(min(population, 100))]
+	genomes = [genomes[i % len(genomes)] for i in range(population)]
+	generation_data = [
+		(genome, rng.randrange(1000), rng.randrange(1000)) for genome in genomes]
+
+	def mutate_scalar():
+		for genome in genomes:
+			gr.mutate_moves(genome, input_params, g.possible_moves, False, rng)
+
+	def mutate_batch():
+		gr.mutate_genomes(genomes, input_params, g.possible_moves, False, rng)
+
+	def select():
+		top_results = rm.get_top_results(
+			input_params['num_best_to_take'], generation_data)
+		random_results = rm.get_random_selection(
+			top_results, generation_data, input_params['num_random_to_take'], rng)
+		rm.choose_samples(input_params, random_results, top_results, rng)
+
+	results = {}
+	for name, func in (
+		('mutate_moves', mutate_scalar), ('mutate_genomes', mutate_batch),
+		('get_top_results_and_choose_samples', select)):
+		best, median = time_per_call(func)
+		results[name] = get_result(
+			best * 1e3, 'ms/generation', False, median=median * 1e3)
+	return results
+
+
+def benchmark_startup(track_num, particle_size):
+	"""Returns time taken to load a track from its images, and from its bundle"""
+	input_params = {
+		'particle_size': particle_size, 'track_num': track_num,
+		'fitness_mode': 'sections', 'headless': True}
+
+	def setup():
+		(
+			track_img, particle_width, particle_height, display_width,
+			display_height, particle_mask, track_mask, victory_box_mask,
+			possible_moves, starting_pos, sections) = init.initialise_setup(
+				input_params)
+		init.initialise_collision_bitmaps(
+			particle_mask, track_mask, victory_box_mask)
+
+	# bundle is compiled before timing, if it is missing or stale
+	init.initialise_from_track_bundle(input_params)
+	results = {}
+	for name, func in (
+		('initialise_setup', setup),
+		(
+			'initialise_from_track_bundle',
+			lambda: init.initialise_from_track_bundle(input_params))):
+		best, median = time_per_call(func)
+		results[name] = get_result(best * 1e3, 'ms', False, median=median * 1e3)
+	return results
+
+
+def run_benchmarks(
+	track_nums, particle_sizes, populations, engines, num_of_generations,
+	genome_length=300, log=print):
+	"""Runs all benchmarks, returning dict of machine info, configuration and
+	results keyed by benchmark name"""
+	results = {}
+
+	def add_results(prefix, new_results):
+		for name, result in new_results.items():
+			results[prefix + name] = result
+			log('{}{}: {:.4g} {}'.format(prefix, name, result['value'], result['unit']))
+
+	for track_num in track_nums:
+		for particle_size in particle_sizes:
+			prefix = 'track_{}/particle_{}/'.format(track_num, particle_size)
+			add_results(prefix, benchmark_startup(track_num, particle_size))
+			add_results(prefix, benchmark_functions(track_num, particle_size))
+			for engine in engines:
+				for population in populations:
+					add_results(
+						prefix + '{}/population_{}/'.format(engine, population),
+						benchmark_generations(
+							track_num, particle_size, population, engine,
+							num_of_generations))
+	for population in populations:
+		add_results(
+			'population_{}/genome_length_{}/'.format(population, genome_length),
+			benchmark_selection(population, genome_length))
+	return {
+		'machine': get_machine_info(),
+		'config': {
+			'track_nums': list(track_nums), 'particle_sizes': list(particle_sizes),
+			'populations': list(populations), 'engines': list(engines),
+			'num_of_generations': num_of_generations,
+			'genome_length': genome_length},
+		'results': results}
+
+
+def compare_results(results, baseline, tolerance):
+	"""Returns list of (name, baseline value, value, relative change) of results
+	that are worse than those of baseline by more than tolerance (a fraction,
+	e.g. 0.2 for 20%). Results missing from either are ignored"""
+	regressions = []
+	for name, result in results['results'].items():
+		baseline_result = baseline['results'].get(name)
+		if baseline_result is None or baseline_result['value'] == 0:
+			continue
+		change = result['value'] / baseline_result['value'] - 1
+		if result['higher_is_better']:
+			regressed = change < -tolerance
+		else:
+			regressed = change > tolerance
+		if regressed:
+			regressions.append((name, baseline_result['value'], result['value'], change))
+	return regressions
+
+
+def write_results(path, results):
+	"""Writes results to path as JSON"""
+	with open(path, 'w') as f:
+		json.dump(results, f, indent=1)
+
+
+def read_results(path):
+	"""Returns results written by write_results"""
+	with open(path) as f:
+		return json.load(f)
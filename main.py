@@ -11,10 +11,60 @@ import modules.pickle_funcs as pf
 import os
 import random
 import modules.run_modes as rm
+from modules.fitness_cache import FitnessCache
+from modules.profiler import Profiler
+import modules.metrics as mt
+from modules.viewer import Viewer
+from modules.rendering import Renderer
 
-run_mode = 'train'  # valid values are 'train' or 'show'
+run_mode = 'train'  # valid values are 'train', 'resume', 'show' or 'verify';
+# 'resume' continues training from the last checkpoint, up to
+# num_of_generations, and 'verify' replays saved best moves without a display,
+# reporting whether they still lead to victory
 particle_size = '15'  # in pixels, for square particles
 track_num = '1'
+headless = False  # set to True to train without a display, event handling or
+# frame rate limit, which is much faster; only used when training
+engine = 'particle'  # valid values are 'particle', 'vectorised' or
+# 'parallel'; the vectorised engine steps the whole population at once using
+# NumPy arrays, is much faster for large populations, and is always headless
+# (train only); the parallel engine splits the population between processes,
+# each running the vectorised engine
+num_of_workers = None  # processes used by parallel engine; None uses all CPUs
+seed = None  # set to an integer to make all random choices reproducible
+fitness_tiebreak = 'time'  # valid values are 'time' or 'steps'; equal distance
+# scores are ranked by wall-clock time taken, or by number of steps taken, which
+# does not depend on machine speed or load
+reuse_parent_prefix = True  # set to True for vectorised engine to resume each
+# particle from its parent's state at the first mutated move, rather than
+# simulating the unchanged moves again; only used when fitness_tiebreak is
+# 'steps'
+fitness_mode = 'sections'  # valid values are 'sections' or 'distance_field';
+# particles are scored by the track's .section file, or by how much closer they
+# are to the victory box along the shortest path around the track, which needs
+# no .section file and is cached in the track's cache folder after first use
+fitness_cache_size = 10000  # number of genomes whose results are stored,
+# such that unchanged genomes are not simulated again; set to 0 to disable. Only
+# used when fitness_tiebreak is 'steps', as times measured in an earlier
+# generation are not comparable with those of the current one; its hit rate is
+# recorded in the metrics of each generation
+profile_phases = False  # set to True to time each phase of every generation
+# (e.g. mutation, collision, scoring, selection) and count steps, particles
+# alive and section crossings, printing a table of them at the end of training
+profile_output_path = None  # set to a file path to also write a summary of
+# each generation to it, as JSON lines; only used when profile_phases is True
+metrics_path = None  # set to a file path to record metrics of each generation
+# (e.g. best and mean distance score, diversity, genome lengths, wall time), as
+# CSV if it ends in .csv and as JSON lines otherwise
+print_progress = True  # set to False to not print progress of each generation
+live_viewer = False  # set to True to watch headless training in a separate
+# window, drawn by another process at up to fps frames per second, such that
+# training is not slowed down; not used by the parallel engine
+checkpoint_interval = 50  # generations between checkpoints of training, which
+# are also written when training ends, is interrupted with Ctrl-C or its window
+# is closed; set to 0 to disable
+checkpoint_path = None  # None uses
+# pickles/checkpoint_for_particle_{particle_size},_track_{track_num}.pickle
 
 num_of_generations = 1000
 num_of_particles_per_generation = 100
@@ -29,8 +79,19 @@ num_random_to_take = 3  # takes random M samples to mutate upon, for genetic
 # diversity
 chance_of_picking_random_sample = 10  # %
 fps = 60  # frames per second
+render_mode = 'fast'  # valid values are 'fast' or 'simple'; 'fast' converts
+# images to the display's pixel format once, only redraws particles that moved,
+# and draws large populations all at once with pygame.surfarray, while 'simple'
+# redraws the whole display every frame
+render_every = 1  # draw every Nth generation; other generations are run
+# without drawing or a frame rate limit, so are much faster (use with
+# fitness_tiebreak 'steps', as times of undrawn generations are shorter)
+render_best_only = False  # set to True to only draw the particle with the
+# highest distance score so far
 mutate_moves_mapping_func_type = 'exp'
-pickle_best = True  # set to True to save final best moves as a pickle
+pickle_best = True  # set to True to save final best moves as a move file in
+# the best_moves folder (best moves pickled by older versions are converted
+# when shown)
 adaptive_algo = [True, 1, 100, 0]  # (set to True to use a different mutation
 # algorithm when victory_box has been reached that mutates all moves with equal
 # chance, regardless of position; 2nd value is percent chance of mutation, when
@@ -52,19 +113,64 @@ input_params = {
 	'fps': fps,
 	'mutate_moves_mapping_func_type': mutate_moves_mapping_func_type,
 	'pickle_best': pickle_best,
-	'adaptive_algo': adaptive_algo
+	'adaptive_algo': adaptive_algo,
+	'headless': (
+		(headless or engine != 'particle') and run_mode != 'show' or
+		run_mode == 'verify'),
+	'engine': engine if run_mode != 'show' else 'particle',
+	'num_of_workers': num_of_workers,
+	'seed': seed,
+	'fitness_tiebreak': fitness_tiebreak,
+	'reuse_parent_prefix': reuse_parent_prefix,
+	'fitness_cache_size': fitness_cache_size,
+	'fitness_mode': fitness_mode,
+	'print_progress': print_progress,
+	'render_every': render_every,
+	'render_best_only': render_best_only,
+	'checkpoint_interval': checkpoint_interval,
+	'checkpoint_path': checkpoint_path,
+	'resume': run_mode == 'resume'
 }
 
 
+# track data is loaded from the track's compiled bundle, which is rebuilt
+# automatically whenever the track or particle images change
 (
 	track_img, particle_width, particle_height, display_width, display_height,
-	particle_mask, track_mask, victory_box_mask, possible_moves,
-	starting_pos, sections) = init.initialise_setup(input_params)
+	track_bitmap, victory_box_bitmap, possible_moves, starting_pos,
+	sections) = init.initialise_from_track_bundle(input_params)
+if input_params['fitness_mode'] == 'sections':
+	section_index = init.initialise_section_index(sections)
+	distance_field = None
+else:
+	section_index = None
+	distance_field = init.initialise_distance_field(
+		input_params, track_bitmap, victory_box_bitmap, particle_width,
+		particle_height, display_width, display_height, starting_pos)
+
+# viewer process is started before pygame is initialised in this process
+if live_viewer and input_params['headless'] and run_mode != 'verify':
+	viewer = Viewer(
+		track_num, particle_size, display_width, display_height, fps)
+else:
+	viewer = None
 
 pygame.init()
-game_display = pygame.display.set_mode((display_width, display_height))
-pygame.display.set_caption('Genetic Algorithm Demo')
-clock = pygame.time.Clock()
+if input_params['headless']:
+	# no window is opened, so nothing is drawn and the frame rate is not limited
+	game_display = None
+	clock = None
+	renderer = None
+else:
+	game_display = pygame.display.set_mode((display_width, display_height))
+	pygame.display.set_caption('Genetic Algorithm Demo')
+	clock = pygame.time.Clock()
+	if render_mode == 'fast':
+		renderer = Renderer(game_display, track_img, particle_size)
+	elif render_mode == 'simple':
+		renderer = None
+	else:
+		raise Exception('main error: unknown render_mode specified')
 
 # Store initialisation parameters in a dictionary, for ease of access and
 # retrieval
@@ -74,19 +180,32 @@ init_params = {
 	'particle_height': particle_height,
 	'display_width': display_width,
 	'display_height': display_height,
-	'particle_mask': particle_mask,
-	'track_mask': track_mask,
-	'victory_box_mask': victory_box_mask,
+	'track_bitmap': track_bitmap,
+	'victory_box_bitmap': victory_box_bitmap,
 	'possible_moves': possible_moves,
 	'starting_pos': starting_pos,
 	'sections': sections,
+	'section_index': section_index,
+	'distance_field': distance_field,
 	'game_display': game_display,
-	'clock': clock
+	'clock': clock,
+	'renderer': renderer,
+	'rng': random.Random(input_params['seed']),
+	'trajectories': None,
+	'fitness_cache': (
+		FitnessCache(input_params['fitness_cache_size'])
+		if input_params['fitness_cache_size'] > 0 and
+		input_params['fitness_tiebreak'] == 'steps' else None),
+	'profiler': Profiler(profile_output_path) if profile_phases else None,
+	'metrics_sink': mt.get_sink(metrics_path),
+	'viewer': viewer
 }
 
 
-if run_mode == 'train':
+if run_mode in ('train', 'resume'):
 	rm.run_all_generations(input_params, init_params)
+elif run_mode == 'verify':
+	rm.verify_best_moves(input_params, init_params)
 elif run_mode == 'show':
 	input_params['num_of_particles_per_generation'] = 1
 	input_params['mutation_chance_options'] = [0]
@@ -96,4 +215,6 @@ else:
 	raise Exception('main error: unknown run_mode specified')
 
 
+if viewer is not None:
+	viewer.close()
 pygame.quit()
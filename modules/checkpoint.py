@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""Checkpoints of training, which store the full state of the genetic algorithm
+after a generation, such that training can be resumed from it with run_mode
+'resume'. Checkpoints are written atomically, to a temporary file which then
+replaces the checkpoint, so that a crash while writing never leaves a corrupt
+checkpoint, and by a background thread, so that generations are not stalled"""
+
+import os
+import queue
+import pickle
+import threading
+
+# increment when the contents of checkpoints change
+checkpoint_version = 1
+
+
+def get_checkpoint_path(input_params):
+	"""Returns input_params['checkpoint_path'] if it is set, or the default path
+	of the checkpoint of the specified particle and track"""
+	if input_params.get('checkpoint_path') is not None:
+		return input_params['checkpoint_path']
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	return (
+		parent_path + "/pickles/checkpoint_for_particle_{},_track_{}.pickle".format(
+			input_params['particle_size'], input_params['track_num']))
+
+
+def get_state(
+	input_params, init_params, generation, best_moves, best_distance_score,
+	corresponding_best_time, victory_status, combined_results, chosen_indices,
+	elapsed):
+	"""Returns state of training before the specified generation is run. Lists
+	are not copied, as run_all_generations replaces rather than modifies them"""
+	return {
+		'checkpoint_version': checkpoint_version,
+		'particle_size': input_params['particle_size'],
+		'track_num': input_params['track_num'],
+		'num_of_particles_per_generation': (
+			input_params['num_of_particles_per_generation']),
+		'generation': generation,
+		'best_moves': best_moves,
+		'best_distance_score': best_distance_score,
+		'corresponding_best_time': corresponding_best_time,
+		'victory_status': victory_status,
+		'combined_results': combined_results,
+		'chosen_indices': chosen_indices,
+		# generation that adaptive algorithm switches at, 0 before victory
+		'adaptive_algo_switch': input_params['adaptive_algo'][3],
+		'rng_state': init_params['rng'].getstate(),
+		'elapsed': elapsed}
+
+
+def write_checkpoint(path, state):
+	"""Writes state to path atomically, creating its folder if needed"""
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	# written to temporary file first, so an interrupted write is never loaded
+	temporary_path = path + '.tmp'
+	with open(temporary_path, 'wb') as f:
+		pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temporary_path, path)
+
+
+def load_checkpoint(path, input_params):
+	"""Returns state stored at path, checking that it is from training of the
+	same particle, track and population size as input_params"""
+	if not os.path.isfile(path):
+		raise Exception(
+			"load_checkpoint error: no checkpoint found at {}".format(path))
+	with open(path, 'rb') as f:
+		state = pickle.load(f)
+	if state.get('checkpoint_version') != checkpoint_version:
+		raise Exception(
+			"load_checkpoint error: checkpoint was written by a different version")
+	for key in ('particle_size', 'track_num', 'num_of_particles_per_generation'):
+		if str(state[key]) != str(input_params[key]):
+			raise Exception(
+				"load_checkpoint error: checkpoint has {} {}, not {}".format(
+					key, state[key], input_params[key]))
+	return state
+
+
+class CheckpointWriter:
+	"""Writes checkpoints to path in a background thread. Only the latest
+	checkpoint matters, so one that is still waiting when another is submitted
+	is discarded"""
+
+	def __init__(self, path):
+		self.path = path
+		self.error = None
+		self.states = queue.Queue()
+		self.thread = threading.Thread(target=self.write_states, daemon=True)
+		self.thread.start()
+
+	def write_states(self):
+		while True:
+			state = self.states.get()
+			if state is None:
+				return
+			try:
+				write_checkpoint(self.path, state)
+			except Exception as e:
+				self.error = e
+
+	def submit(self, state):
+		"""Queues state to be written, replacing any state still waiting"""
+		self.check_error()
+		try:
+			while True:
+				self.states.get_nowait()
+		except queue.Empty:
+			pass
+		self.states.put(state)
+
+	def close(self):
+		"""Waits for queued checkpoint to be written, and stops the thread"""
+		self.states.put(None)
+		self.thread.join()
+		self.check_error()
+
+	def check_error(self):
+		if self.error is not None:
+			raise Exception(
+				"CheckpointWriter error: could not write checkpoint ({})".format(
+					self.error))
@@ -1,20 +1,49 @@
-import cv2
-import colour_store as cs
+#!/usr/bin/env python3
+
+"""Counts the pixels of each colour in a track image, e.g. to check that a
+track only uses the colours in colour_store. Run as a script from the
+repository root, e.g. python -m modules.colour_tester 1"""
+
 import os
+import argparse
+import cv2
+import numpy as np
+
+
+def get_colour_counts(img):
+	"""Returns dict of number of pixels of each colour in img, keyed by colour
+	tuple in the channel order of img (blue, green, red when loaded by cv2)"""
+	pixels = np.ascontiguousarray(img).reshape(-1, img.shape[2]).astype(np.uint32)
+	# pack each pixel into a single integer, as np.unique is much faster on a 1D
+	# array than on rows of a 2D array
+	packed = np.zeros(len(pixels), dtype=np.uint32)
+	for channel in range(img.shape[2]):
+		packed = (packed << 8) | pixels[:, channel]
+	colours, counts = np.unique(packed, return_counts=True)
+	colour_counts = {}
+	for colour, count in zip(colours.tolist(), counts.tolist()):
+		colour_counts[tuple(
+			(colour >> (8 * (img.shape[2] - 1 - channel))) & 255
+			for channel in range(img.shape[2]))] = count
+	return colour_counts
+
+
+def get_track_colour_counts(track_num):
+	"""Returns get_colour_counts of full image of specified track"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	img = cv2.imread(
+		parent_path + '/tracks/track_{}/track_{}_full.png'.format(
+			track_num, track_num))
+	if img is None:
+		raise Exception(
+			"get_track_colour_counts error: track {} image not found".format(
+				track_num))
+	return get_colour_counts(img)
+
 
-track_num = 1
-
-parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-img = cv2.imread(
-	parent_path + '/tracks/track_{}/track_{}_full.png'.format(
-		track_num, track_num))
-img_to_list = img.tolist()
-colour_dict = {}
-for i, j in enumerate(img_to_list):
-	for k, l in enumerate(j):
-		if str(l) not in colour_dict.keys():
-			colour_dict[str(l)] = 1
-		else:
-			colour_dict[str(l)] += 1
-
-print(colour_dict)
\ No newline at end of file
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Print number of pixels of each colour in a track image')
+	parser.add_argument('track_num', help='number of track, e.g. 1')
+	args = parser.parse_args()
+	print(get_track_colour_counts(args.track_num))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""Alternative to scoring particles by track sections, in which the score of a
+particle is how much closer it is to the victory box than starting_pos, in
+pixels along the shortest path through the positions in which the particle does
+not collide with the track. Distances are found once per track and particle
+size by a breadth first search from the victory box, and cached to disk"""
+
+import os
+import hashlib
+import numpy as np
+
+# progress of positions from which victory box cannot be reached
+unreachable_progress = -2**30
+
+
+def get_passable_and_goal(
+	track_bitmap, victory_box_bitmap, particle_width, particle_height,
+	display_width, display_height):
+	"""Returns boolean arrays, indexed by particle position [x, y] on the display,
+	of positions that do not collide with the track, and positions that collide
+	with the victory box"""
+	x_slice = slice(particle_width - 1, display_width)
+	y_slice = slice(particle_height - 1, display_height)
+	passable = ~track_bitmap[x_slice, y_slice]
+	goal = victory_box_bitmap[x_slice, y_slice].copy()
+	return passable, goal
+
+
+def compute_distances(passable, goal):
+	"""Breadth first search from every goal position through passable positions,
+	returning number of single pixel moves from each position to the nearest goal
+	position, or -1 if no goal position can be reached"""
+	width, height = passable.shape
+	passable = passable.ravel()
+	distances = np.full(width * height, -1, dtype=np.int32)
+	frontier = np.flatnonzero(goal.ravel())
+	distances[frontier] = 0
+	distance = 0
+	while len(frontier) > 0:
+		distance += 1
+		xs, ys = np.divmod(frontier, height)
+		neighbours = np.concatenate((
+			frontier[xs > 0] - height, frontier[xs < width - 1] + height,
+			frontier[ys > 0] - 1, frontier[ys < height - 1] + 1))
+		neighbours = np.unique(
+			neighbours[passable[neighbours] & (distances[neighbours] < 0)])
+		distances[neighbours] = distance
+		frontier = neighbours
+	return distances.reshape(width, height)
+
+
+def get_cache_path(track_num, particle_size):
+	"""Returns path of cached distances for specified track and particle size"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	return (
+		parent_path + '/tracks/track_{}/cache/distance_field_particle_{}.npz'.format(
+			track_num, particle_size))
+
+
+def get_bitmaps_key(passable, goal):
+	"""Returns hash of passable and goal positions, used to check that cached
+	distances were computed for the current track images"""
+	key = hashlib.sha1(str(passable.shape).encode())
+	key.update(np.packbits(passable).tobytes())
+	key.update(np.packbits(goal).tobytes())
+	return key.hexdigest()
+
+
+def get_distances(track_num, particle_size, passable, goal):
+	"""Returns distances from compute_distances, loaded from cache if they have
+	already been computed for these passable and goal positions, otherwise
+	computed and then cached"""
+	cache_path = get_cache_path(track_num, particle_size)
+	key = get_bitmaps_key(passable, goal)
+	if os.path.isfile(cache_path):
+		with np.load(cache_path) as cached:
+			if str(cached['key']) == key:
+				return cached['distances']
+	distances = compute_distances(passable, goal)
+	os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+	# written to temporary file first, so an interrupted write is never loaded
+	temporary_path = cache_path + '.tmp.npz'
+	np.savez(temporary_path, key=np.array(key), distances=distances)
+	os.replace(temporary_path, cache_path)
+	return distances
+
+
+class DistanceField:
+	"""Progress of a particle at each position towards the victory box, relative
+	to starting_pos, such that scoring a particle is a single lookup"""
+
+	def __init__(self, distances, starting_pos):
+		start_distance = int(distances[starting_pos[0], starting_pos[1]])
+		if start_distance < 0:
+			raise Exception(
+				"DistanceField error: victory box cannot be reached from starting_pos")
+		self.progress = np.where(
+			distances >= 0, start_distance - distances,
+			unreachable_progress).astype(np.int32)
+
+	def get_progress(self, xs, ys):
+		"""Returns array of progress for arrays of x and y coordinates"""
+		in_range = (
+			(xs >= 0) & (xs < self.progress.shape[0]) &
+			(ys >= 0) & (ys < self.progress.shape[1]))
+		progress = np.full(len(xs), unreachable_progress, dtype=np.int64)
+		progress[in_range] = self.progress[xs[in_range], ys[in_range]]
+		return progress
+
+	def get_point_progress(self, x, y):
+		"""Returns progress for a single position"""
+		if 0 <= x < self.progress.shape[0] and 0 <= y < self.progress.shape[1]:
+			return int(self.progress[x, y])
+		return unreachable_progress
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import os
+import numpy as np
 
 
 class Section:
@@ -112,9 +113,11 @@ def section_check(sections):
 						"section_check error: regions {} and {} overlap".format(i, index))
 
 
-def get_section(point, sections):
+def get_section(point, sections, section_index=None):
 	"""Finds which section given coordinate is in, assuming rectangular
-	sections"""
+	sections, using section_index for a single lookup if given"""
+	if section_index is not None:
+		return section_index.get_section(point)
 	matching_section = None
 	for section in sections:
 		if (
@@ -130,6 +133,69 @@ def get_section(point, sections):
 	return matching_section
 
 
+def get_section_arrays(sections):
+	"""Returns array of section bounds, with rows of form: x_start, x_end,
+	y_start, y_end, and arrays of increasing_x_reward and increasing_y_reward"""
+	bounds = np.array(
+		[(
+			section.top_left_point[0], section.top_right_point[0],
+			section.top_left_point[1], section.bottom_left_point[1])
+			for section in sections], dtype=np.int64).reshape(-1, 4)
+	x_rewards = np.array(
+		[section.increasing_x_reward for section in sections], dtype=np.int64)
+	y_rewards = np.array(
+		[section.increasing_y_reward for section in sections], dtype=np.int64)
+	return bounds, x_rewards, y_rewards
+
+
+class SectionIndex:
+	"""Raster holding the index of the section containing each pixel (-1 if none),
+	built once per track, such that the section containing a point is found with
+	a single lookup rather than a scan of every section"""
+
+	def __init__(self, sections):
+		self.sections = sections
+		width = max([section.top_right_point[0] for section in sections] + [-1]) + 1
+		height = (
+			max([section.bottom_left_point[1] for section in sections] + [-1]) + 1)
+		self.raster = np.full(
+			(width, height), -1,
+			dtype=np.int16 if len(sections) < 2**15 else np.int32)
+		# filled in reverse, so that the first matching section is kept where
+		# sections share a boundary, as in get_section
+		for i in reversed(range(len(sections))):
+			section = sections[i]
+			self.raster[
+				max(section.top_left_point[0], 0): section.top_right_point[0] + 1,
+				max(section.top_left_point[1], 0): section.bottom_left_point[1] + 1] = i
+		self.bounds, self.x_rewards, self.y_rewards = get_section_arrays(sections)
+
+	def get_indices(self, xs, ys):
+		"""Returns array of index of section containing each point, for arrays of
+		x and y coordinates"""
+		in_range = (
+			(xs >= 0) & (xs < self.raster.shape[0]) &
+			(ys >= 0) & (ys < self.raster.shape[1]))
+		indices = np.full(len(xs), -1, dtype=np.int64)
+		indices[in_range] = self.raster[xs[in_range], ys[in_range]]
+		if (indices < 0).any():
+			k = np.flatnonzero(indices < 0)[0]
+			raise Exception(
+				'get_section error: no matching section found for point: {}.'.format(
+					(xs[k], ys[k])))
+		return indices
+
+	def get_section(self, point):
+		"""Finds which section given coordinate is in"""
+		x, y = point
+		if 0 <= x < self.raster.shape[0] and 0 <= y < self.raster.shape[1]:
+			i = self.raster[x, y]
+			if i >= 0:
+				return self.sections[i]
+		raise Exception(
+			'get_section error: no matching section found for point: {}.'.format(point))
+
+
 def delta_sign_handle(delta, current_pos, prev_pos):
 	"""Produces a list of coordinates from prev_pos to current_pos"""
 	if delta >= 0:
@@ -163,7 +229,7 @@ def separate_by_section_identifier(
 
 def handle_move_through_boundary(
 	coord_type, current_pos, prev_pos, delta_x, delta_y, sections, prev_section,
-	current_section):
+	current_section, section_index=None):
 	"""Takes in 2 positions and returns the resulting score from moving from the
 	1st to the 2nd, for case of crossing between 2 sections. Note will not work if
 	crossing over 3 sections in one move."""
@@ -184,7 +250,7 @@ def handle_move_through_boundary(
 		x_range = delta_sign_handle(delta_x, current_pos[0], prev_pos[0])
 		for dynamic_coord in x_range:
 			section_identifier = get_section(
-				(dynamic_coord, static_coord), sections).top_left_point
+				(dynamic_coord, static_coord), sections, section_index).top_left_point
 			(
 				prev_section_dynamic,
 				current_section_dynamic) = separate_by_section_identifier(
@@ -194,7 +260,7 @@ def handle_move_through_boundary(
 		y_range = delta_sign_handle(delta_y, current_pos[1], prev_pos[1])
 		for dynamic_coord in y_range:
 			section_identifier = get_section(
-				(static_coord, dynamic_coord), sections).top_left_point
+				(static_coord, dynamic_coord), sections, section_index).top_left_point
 			(
 				prev_section_dynamic,
 				current_section_dynamic) = separate_by_section_identifier(
@@ -217,10 +283,58 @@ def handle_move_through_boundary(
 	return score_delta
 
 
+def get_axis_move_scores(
+	sections, xs, ys, prev_xs, prev_ys, section_index=None):
+	"""Returns change in score for each straight, axis-aligned move from previous
+	to current point (arrays of coordinates), which may cross any number of
+	sections. Each move is intersected with the section rectangles, so cost does
+	not depend on length of move. As in handle_move_through_boundary, only
+	movement within each section is scored, so each step across a boundary
+	between sections scores nothing"""
+	if section_index is not None:
+		bounds, x_rewards, y_rewards = (
+			section_index.bounds, section_index.x_rewards, section_index.y_rewards)
+	else:
+		bounds, x_rewards, y_rewards = get_section_arrays(sections)
+	x_moves = xs != prev_xs
+	# start and end of each move along the axis it moves in, and its position
+	# along the other axis
+	starts = np.where(x_moves, np.minimum(xs, prev_xs), np.minimum(ys, prev_ys))
+	ends = np.where(x_moves, np.maximum(xs, prev_xs), np.maximum(ys, prev_ys))
+	statics = np.where(x_moves, ys, xs)
+	directions = np.where(x_moves, np.sign(xs - prev_xs), np.sign(ys - prev_ys))
+
+	# one row per move, one column per section
+	moving_x = x_moves[:, None]
+	lows = np.where(moving_x, bounds[:, 0], bounds[:, 2])
+	highs = np.where(moving_x, bounds[:, 1], bounds[:, 3])
+	static_lows = np.where(moving_x, bounds[:, 2], bounds[:, 0])
+	static_highs = np.where(moving_x, bounds[:, 3], bounds[:, 1])
+	overlap_starts = np.maximum(starts[:, None], lows)
+	overlap_ends = np.minimum(ends[:, None], highs)
+	overlapping = (
+		(statics[:, None] >= static_lows) & (statics[:, None] <= static_highs) &
+		(overlap_ends >= overlap_starts))
+	overlap_lengths = np.where(overlapping, overlap_ends - overlap_starts, 0)
+
+	# sections do not overlap, so every point of the move is in a section only if
+	# the points covered by all sections add up to the length of the move
+	covered = np.where(overlapping, overlap_lengths + 1, 0).sum(axis=1)
+	if (covered != ends - starts + 1).any():
+		k = np.flatnonzero(covered != ends - starts + 1)[0]
+		raise Exception(
+			"""get_section error: no matching section found for a point of move from \
+			{} to {}.""".format(
+				(prev_xs[k], prev_ys[k]), (xs[k], ys[k])).replace('\t', ''))
+	rewards = np.where(moving_x, x_rewards, y_rewards)
+	return directions * (overlap_lengths * rewards).sum(axis=1)
+
+
 def update_distance_score(
-	sections, particle, prev_pos, step_size):
+	sections, particle, prev_pos, step_size, section_index=None, profiler=None):
 	"""Returns updated distance score, with handling for case where particle stays
-	in one section and for when it moves between 2 sections"""
+	in one section and for when it moves between 2 sections. Crossings between
+	sections are counted by profiler, if given"""
 	current_pos = (particle.x, particle.y)
 	delta_x = current_pos[0] - prev_pos[0]
 	delta_y = current_pos[1] - prev_pos[1]
@@ -229,24 +343,19 @@ def update_distance_score(
 			"""update_distance_score error: both delta_x and delta_y are non-zero,
 			therefore more than one coordinate is changing in a single iteration
 			(not as intended)""")
-	prev_section = get_section(prev_pos, sections)
-	current_section = get_section(current_pos, sections)
+	prev_section = get_section(prev_pos, sections, section_index)
+	current_section = get_section(current_pos, sections, section_index)
 	if current_section.top_left_point != prev_section.top_left_point:
-		# crossed over border between sections
-		if delta_x != 0:
-			# i.e. x coordinate changes
-			score_delta = handle_move_through_boundary(
-				'x', current_pos, prev_pos, delta_x, delta_y, sections, prev_section,
-				current_section)
-		elif delta_y != 0:
-			# i.e. y coordinate changes
-			score_delta = handle_move_through_boundary(
-				'y', current_pos, prev_pos, delta_x, delta_y, sections, prev_section,
-				current_section)
-		else:
+		# crossed over border between sections, possibly several
+		if delta_x == 0 and delta_y == 0:
 			raise Exception(
 				"""update_distance_score error: both delta_x and delta_y are zero,
 				therefore no move is made in iteration; shouldn't be possible.""")
+		if profiler is not None:
+			profiler.count('boundary_crossings')
+		score_delta = int(get_axis_move_scores(
+			sections, np.array([current_pos[0]]), np.array([current_pos[1]]),
+			np.array([prev_pos[0]]), np.array([prev_pos[1]]), section_index)[0])
 	else:
 		# still within same section as previous iteration
 		score_delta = (
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+
+class FitnessCache:
+	"""Stores results of genomes, with least recently used results removed once
+	max_size is reached. Only results that did not depend on random moves should
+	be added, i.e. the particle collided before using all of its genome, such
+	that simulating the genome again would give the same result"""
+
+	def __init__(self, max_size):
+		self.max_size = max_size
+		self.results = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, genome):
+		"""Returns stored result for genome, or None if there is not one"""
+		key = bytes(genome)
+		result = self.results.get(key)
+		if result is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+			self.results.move_to_end(key)
+		return result
+
+	def add(self, genome, result):
+		"""Stores result for genome, removing least recently used result if full"""
+		key = bytes(genome)
+		self.results[key] = result
+		self.results.move_to_end(key)
+		if len(self.results) > self.max_size:
+			self.results.popitem(last=False)
+
+	def get_hit_rate(self):
+		"""Returns percentage of lookups since last reset that found a result"""
+		if self.hits + self.misses == 0:
+			return 0
+		return round(100 * self.hits / (self.hits + self.misses), 1)
+
+	def reset_stats(self):
+		"""Resets hit and miss counts, e.g. at start of each generation"""
+		self.hits = 0
+		self.misses = 0
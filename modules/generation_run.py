@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
 import modules.colour_store as cs
+from modules.mask_handling import get_collision_rows
 import time
-from math import exp
+from functools import lru_cache
 from modules.particle import Particle
 import random
+import numpy as np
 import modules.distance_handling as dh
+import modules.genome as g
+import modules.vectorised_run as vr
+import modules.parallel_run as pr
 import pygame
 
 """Note: this script assumes that the direction of a particular section is
@@ -29,52 +34,147 @@ def collision_check(static_mask, moving_mask, x_coord, y_coord):
 		return False
 
 
+def bitmap_collision_check(
+	collision_rows, particle_width, particle_height, x_coord, y_coord):
+	"""Checks if particle collides with object for specified x, y coordinates,
+	which are whole numbers of pixels, using rows of a collision bitmap
+	precomputed by get_collision_bitmap, as returned by get_collision_rows"""
+	i = x_coord + particle_width - 1
+	j = y_coord + particle_height - 1
+	if 0 <= i < len(collision_rows) and 0 <= j < len(collision_rows[0]):
+		return collision_rows[i][j] == 1
+	else:
+		return False
+
+
+def get_init_collision_rows(init_params, bitmap_key):
+	"""Returns rows of collision bitmap init_params[bitmap_key], which are
+	created on first use and stored in init_params, for bitmap_collision_check"""
+	bitmap = init_params[bitmap_key]
+	rows_key = bitmap_key + '_rows'
+	if rows_key not in init_params or init_params[rows_key][0] is not bitmap:
+		init_params[rows_key] = (bitmap, get_collision_rows(bitmap))
+	return init_params[rows_key][1]
+
+
+@lru_cache(maxsize=1024)
+def get_mutation_probabilities(length, mapping_func_type):
+	"""Returns read-only array of the relative chance of each move of a genome of
+	specified length being mutated, which is computed once per length.
+	Exponential function ensures that it is more likely that moves near the end of
+	the list are mutated, as these are more likely to need improving"""
+	indexes_scaled = np.arange(1, length + 1) / (length * 100)
+	if mapping_func_type == 'exp':
+		mapped_to_func = np.exp(indexes_scaled)
+	elif mapping_func_type == 'quadratic':
+		mapped_to_func = indexes_scaled ** 2
+	else:
+		raise Exception("mutate_moves error: unknown mapping_func_type")
+	probabilities = mapped_to_func / mapped_to_func.sum()
+	probabilities.setflags(write=False)
+	return probabilities
+
+
+@lru_cache(maxsize=1024)
+def get_mutation_thresholds(length, mapping_func_type, mutation_chance_factor):
+	"""Returns positions of moves that can be mutated, for a genome of specified
+	length, and the highest randint(1, 100) draw that mutates each of them, as
+	read-only arrays. Moves whose chance of mutation is below 1% are never
+	mutated, so are left out"""
+	thresholds = np.floor(np.minimum(
+		get_mutation_probabilities(length, mapping_func_type) *
+		mutation_chance_factor, 100)).astype(np.uint8)
+	positions = np.flatnonzero(thresholds)
+	thresholds = thresholds[positions]
+	positions.setflags(write=False)
+	thresholds.setflags(write=False)
+	return positions, thresholds
+
+
 def mutate_moves(
-	input_moves, input_params, possible_moves, victory_status):
-	"""Takes input moves and returns list with some moves changed randomly,
-	according to specified chance and function. Exponential function ensures that
-	it is more likely that moves near the end of the list are mutated, as these
-	are more likely to need improving"""
-	mutated_moves = []
-	if not victory_status:
-		input_moves_indexes_scaled = (
-			[(i / (len(input_moves) * 100)) for i in range(1, len(input_moves) + 1)])
-		if input_params['mutate_moves_mapping_func_type'] == 'exp':
-			input_moves_mapped_to_func = (
-				[exp(j) for i, j in enumerate(input_moves_indexes_scaled)])
-		elif input_params['mutate_moves_mapping_func_type'] == 'quadratic':
-			input_moves_mapped_to_func = (
-				[j**2 for i, j in enumerate(input_moves_indexes_scaled)])
-		else:
-			raise Exception("mutate_moves error: unknown mapping_func_type")
-		input_moves_probabilities = (
-			[j / sum(input_moves_mapped_to_func) for i, j in enumerate(
-				input_moves_mapped_to_func)])
-		mutation_chance_factor = random.choice(
-			input_params['mutation_chance_options'])
-		for i, j in enumerate(input_moves_probabilities):
-			if random.randint(1, 100) <= j * mutation_chance_factor:
-				# mutate move
-				mutated_moves.append(random.choice(possible_moves))
-			else:
-				mutated_moves.append(input_moves[i])
+	input_moves, input_params, possible_moves, victory_status, rng=random):
+	"""Takes input moves and returns genome with some moves changed randomly,
+	according to specified chance and function, as given by
+	get_mutation_probabilities"""
 	if victory_status and input_params['adaptive_algo'][0]:
 		"""switch to a different mutation algorithm once victory has been achieved and
 		a certain no. of generations have passed"""
-		rand_index = random.randint(0, len(input_moves) - 1)
-		mutated_moves = (
-			[j if i != rand_index else random.choice(possible_moves) for
-				i, j in enumerate(input_moves)])
-	return mutated_moves
-
-
-def initialise_mutated_moves(
-	particles, chosen_indices, combined_results, input_params,
-	possible_moves, victory_status):
-	"""Mutate moves for each particle"""
-	for i, j in enumerate(chosen_indices):
-		particles[i].best_moves_mutated = mutate_moves(
-			combined_results[j][0], input_params, possible_moves, victory_status)
+		rand_index = rng.randint(0, len(input_moves) - 1)
+		mutated_moves = bytearray(input_moves)
+		mutated_moves[rand_index] = rng.choice(possible_moves)
+		return bytes(mutated_moves)
+	mutated_moves = bytearray()
+	input_moves_probabilities = get_mutation_probabilities(
+		len(input_moves), input_params['mutate_moves_mapping_func_type']).tolist()
+	mutation_chance_factor = rng.choice(input_params['mutation_chance_options'])
+	for i, j in enumerate(input_moves_probabilities):
+		if rng.randint(1, 100) <= j * mutation_chance_factor:
+			# mutate move
+			mutated_moves.append(rng.choice(possible_moves))
+		else:
+			mutated_moves.append(input_moves[i])
+	return bytes(mutated_moves)
+
+
+def group_by_key(keys):
+	"""Returns dict of lists of indices of equal keys, in order of first
+	appearance"""
+	groups = {}
+	for i, key in enumerate(keys):
+		groups.setdefault(key, []).append(i)
+	return groups
+
+
+def genomes_to_rows(genomes):
+	"""Returns writable matrix with one row per genome, all of equal length"""
+	return np.frombuffer(b''.join(genomes), dtype=np.uint8).reshape(
+		len(genomes), -1).copy()
+
+
+def mutate_genomes(
+	input_genomes, input_params, possible_moves, victory_status, rng=random):
+	"""Batched form of mutate_moves, which mutates every genome of the next
+	generation with NumPy, using one random matrix for all genomes of the same
+	length (and mutation_chance_factor), rather than one draw per move. Random
+	draws come from a NumPy generator seeded by rng, so differ from those of
+	mutate_moves. Returns list of mutated genomes"""
+	npr = np.random.default_rng(rng.getrandbits(64))
+	mutated_genomes = list(input_genomes)
+	if victory_status and input_params['adaptive_algo'][0]:
+		# mutate a single move, with equal chance regardless of position
+		groups = group_by_key([len(genome) for genome in input_genomes])
+		for length, indices in groups.items():
+			if length == 0:
+				continue
+			matrix = genomes_to_rows([input_genomes[i] for i in indices])
+			positions = npr.integers(0, length, size=len(indices))
+			matrix[np.arange(len(indices)), positions] = np.array(
+				possible_moves, dtype=np.uint8)[
+				npr.integers(0, len(possible_moves), size=len(indices))]
+			for i, row in zip(indices, matrix):
+				mutated_genomes[i] = row.tobytes()
+		return mutated_genomes
+
+	factors = npr.choice(
+		input_params['mutation_chance_options'], size=len(input_genomes)).tolist()
+	groups = group_by_key(
+		[(len(genome), factor) for genome, factor in zip(input_genomes, factors)])
+	for (length, factor), indices in groups.items():
+		positions, thresholds = get_mutation_thresholds(
+			length, input_params['mutate_moves_mapping_func_type'], factor)
+		if len(positions) == 0:
+			continue
+		matrix = genomes_to_rows([input_genomes[i] for i in indices])
+		# mutate move where randint(1, 100) draw is within its threshold
+		draws = npr.integers(
+			1, 101, size=(len(indices), len(positions)), dtype=np.uint8)
+		rows, columns = np.nonzero(draws <= thresholds)
+		matrix[rows, positions[columns]] = np.array(
+			possible_moves, dtype=np.uint8)[
+			npr.integers(0, len(possible_moves), size=len(rows))]
+		for i, row in zip(indices, matrix):
+			mutated_genomes[i] = row.tobytes()
+	return mutated_genomes
 
 
 def some_alive_check(particles):
@@ -87,51 +187,50 @@ def some_alive_check(particles):
 
 
 def choose_move(
-	counter, possible_moves, particle):
+	counter, possible_moves, particle, rng=random):
 	"""Choose new random move if have not got to this number of moves before,
 	otherwise choose from pre-existing, mutated moves"""
 	if counter >= len(particle.best_moves_mutated):
 		"""If move counter is higher than previous max num of moves, add a new
 		random move to move sequence"""
-		move = random.choice(possible_moves)
+		move = rng.choice(possible_moves)
 	else:
 		move = particle.best_moves_mutated[counter]
 	return move
 
 
 def act_on_move(move, movement_step):
-	"""Turn move into appropriate change in x, y coordinates"""
-	if move == 'up' or move == 'down':
-		# i.e. changes y coordinate
-		if move == 'up':
-			y_change = - movement_step
-		elif move == 'down':
-			y_change = movement_step
-		x_change = 0
-	elif move == 'left' or 'right':
-		# i.e. change x coordinate
-		if move == 'left':
-			x_change = - movement_step
-		elif move == 'right':
-			x_change = movement_step
-		y_change = 0
-	return x_change, y_change
-
-
-def check_for_collisions(init_params, particle, counter, start_time):
+	"""Turn move code into appropriate change in x, y coordinates"""
+	x_direction, y_direction = g.directions[move]
+	return x_direction * movement_step, y_direction * movement_step
+
+
+def get_elapsed(counter, start_time, fitness_tiebreak):
+	"""Returns how long particle has taken to reach its current position, used to
+	break ties between equal distance_scores: either wall-clock seconds or, for
+	reproducible results, number of steps taken"""
+	if fitness_tiebreak == 'steps':
+		return counter + 1
+	return round(time.time() - start_time, 2)
+
+
+def check_for_collisions(
+	init_params, particle, counter, start_time, fitness_tiebreak='time'):
 	"""Checks for particle colliding with track boundary and victory box"""
-	if collision_check(
-		init_params['track_mask'], init_params['particle_mask'],
-		particle.x, particle.y):
+	if bitmap_collision_check(
+		get_init_collision_rows(init_params, 'track_bitmap'),
+		init_params['particle_width'], init_params['particle_height'], particle.x,
+		particle.y):
 		# game over
 		particle.alive = False
-	if collision_check(
-		init_params['victory_box_mask'], init_params['particle_mask'],
-		particle.x, particle.y):
+	if bitmap_collision_check(
+		get_init_collision_rows(init_params, 'victory_box_bitmap'),
+		init_params['particle_width'],
+		init_params['particle_height'], particle.x, particle.y):
 		# victory
 		# game over (1st check) or victory (2nd check)
 		particle.alive = False
-		current_time_elapsed = round(time.time() - start_time, 2)
+		current_time_elapsed = get_elapsed(counter, start_time, fitness_tiebreak)
 		particle.distance_time_record = (
 			10E8,
 			counter,
@@ -155,42 +254,88 @@ def evaluate_performance(particles):
 	"""Return moves up until furthest distance reached, and corresponding
 	distance_score and time"""
 	return_list = (
-		[(particle.moves_made[0: particle.distance_time_record[1] + 1],
+		[(bytes(particle.moves_made[0: particle.distance_time_record[1] + 1]),
 			particle.distance_time_record[0],
 			particle.distance_time_record[2])
 			for i, particle in enumerate(particles)])
 	return return_list
 
 
-def run_one_generation(
-	input_params, init_params, combined_results, chosen_indices, victory_status):
+def check_for_quit(game_exit):
+	"""Checks pygame event queue for the display window being closed"""
+	for event in pygame.event.get():
+		if event.type == pygame.QUIT:
+			game_exit = True
+	return game_exit
+
+
+def draw_particles(init_params, particles):
+	"""Draws particles over track and updates display, with
+	init_params['renderer'] if it is set, or otherwise by redrawing the whole
+	display"""
+	renderer = init_params.get('renderer')
+	if renderer is not None:
+		renderer.draw(
+			[particle.x for particle in particles],
+			[particle.y for particle in particles])
+	else:
+		# Reset display and set track as background
+		init_params['game_display'].fill(cs.white)
+		track_display(init_params)
+		for particle in particles:
+			particle.show(init_params['game_display'], (particle.x, particle.y))
+		pygame.display.update()
+
+
+def simulate_particles(input_params, init_params, genomes, deterministic=None):
 	"""Run through all iterations until particle collided with track or
-	victory_box, for all particles in a single generation, then returing their
-	performance"""
-	# Initialise variables and objects
+	victory_box, for a particle following each genome, then returning their
+	performance. In headless mode nothing is drawn, no events are handled and the
+	frame rate is not limited, such that the generation runs as fast as possible.
+	Generations for which init_params['rendering'] is False are not drawn and
+	their frame rate is not limited, but events are still handled. If
+	deterministic list is given, it is extended with whether each result did not
+	depend on random moves. The number of particle steps simulated is added to
+	init_params['particle_steps']"""
+	rng = init_params['rng']
+	headless = input_params['headless']
+	rendering = not headless and init_params.get('rendering', True)
+	best_only = input_params.get('render_best_only', False)
+	profiler = init_params.get('profiler')
+	viewer = init_params.get('viewer')
+	if rendering and init_params.get('renderer') is not None:
+		init_params['renderer'].reset()
+	# Initialise variables and objects; particle images are only needed when
+	# particles are drawn without a renderer
 	particles = (
 		[Particle(
-			input_params['particle_size'], init_params['starting_pos']) for i in range(
-			input_params['num_of_particles_per_generation'])])
-	initialise_mutated_moves(
-		particles, chosen_indices, combined_results, input_params,
-		init_params['possible_moves'], victory_status)
+			input_params['particle_size'], init_params['starting_pos'],
+			load_img=rendering and init_params.get('renderer') is None)
+			for i in range(len(genomes))])
+	for particle, genome in zip(particles, genomes):
+		particle.best_moves_mutated = genome
 	game_exit = False
 	start_time = time.time()
 
 	counter = 0
 	while some_alive_check(particles) and not game_exit:
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				game_exit = True
-
-		# Reset display and set track as background
-		init_params['game_display'].fill(cs.white)
-		track_display(init_params)
+		if profiler is not None:
+			profiler.record_step(sum(particle.alive for particle in particles))
+			clock = profiler.clock()
+		if not headless:
+			game_exit = check_for_quit(game_exit)
+			if game_exit:
+				# training is stopped by run_all_generations
+				init_params['quit_requested'] = True
+			if profiler is not None:
+				clock = profiler.lap('simulation.events', clock)
+		if rendering:
+			moved_particles = [particle for particle in particles if particle.alive]
 
 		for i, particle in enumerate(particles):
 			if particle.alive:
-				move = choose_move(counter, init_params['possible_moves'], particle)
+				move = choose_move(
+					counter, init_params['possible_moves'], particle, rng)
 				particle.moves_made.append(move)
 
 				particle.x_change, particle.y_change = act_on_move(
@@ -198,28 +343,153 @@ def run_one_generation(
 
 				# Update particle with new position and put on display
 				particle.update_position((particle.x_change, particle.y_change))
-				particle.show(init_params['game_display'], (particle.x, particle.y))
+				if profiler is not None:
+					clock = profiler.lap('simulation.moves', clock)
 
-				check_for_collisions(init_params, particle, counter, start_time)
+				check_for_collisions(
+					init_params, particle, counter, start_time,
+					input_params['fitness_tiebreak'])
+				if profiler is not None:
+					clock = profiler.lap('simulation.collision', clock)
 
 				if particle.alive:
 					# no collisions
-					particle.current_distance_score = dh.update_distance_score(
-						init_params['sections'], particle, particle.last_point,
-						input_params['movement_step'])
+					if input_params['fitness_mode'] == 'distance_field':
+						particle.current_distance_score = (
+							init_params['distance_field'].get_point_progress(
+								particle.x, particle.y))
+					else:
+						particle.current_distance_score = dh.update_distance_score(
+							init_params['sections'], particle, particle.last_point,
+							input_params['movement_step'], init_params['section_index'],
+							profiler)
 					particle.last_point = (particle.x, particle.y)
 					# update best distance score, if it has improved
 					if particle.current_distance_score > particle.distance_time_record[0]:
-						current_time_elapsed = round(time.time() - start_time, 2)
+						current_time_elapsed = get_elapsed(
+							counter, start_time, input_params['fitness_tiebreak'])
 						particle.distance_time_record = (
 							particle.current_distance_score, counter, current_time_elapsed)
+					if profiler is not None:
+						clock = profiler.lap('simulation.scoring', clock)
 
 				game_exit = check_particle_in_bounds(particle, init_params, game_exit)
 
-		pygame.display.update()
-		init_params['clock'].tick(input_params['fps'])
+		if viewer is not None and viewer.is_due():
+			alive_particles = [particle for particle in particles if particle.alive]
+			viewer.publish(
+				[particle.x for particle in alive_particles],
+				[particle.y for particle in alive_particles])
+		if rendering:
+			if profiler is not None:
+				clock = profiler.clock()
+			if best_only and moved_particles:
+				# only the particle with the highest distance score is drawn
+				moved_particles = [max(
+					moved_particles,
+					key=lambda particle: particle.distance_time_record[0])]
+			draw_particles(init_params, moved_particles)
+			if profiler is not None:
+				clock = profiler.lap('simulation.drawing', clock)
+			init_params['clock'].tick(input_params['fps'])
+			if profiler is not None:
+				profiler.lap('simulation.frame_limit', clock)
 		counter += 1
+	# every particle made one move per step that it was alive
+	init_params['particle_steps'] = init_params.get('particle_steps', 0) + sum(
+		len(particle.moves_made) for particle in particles)
 
 	return_list = evaluate_performance(particles)
+	if deterministic is not None:
+		# a particle that collided before using up its genome made no random moves
+		deterministic += [
+			not particle.alive and
+			len(particle.moves_made) <= len(particle.best_moves_mutated)
+			for particle in particles]
+
+	return return_list
+
+
+def simulate(
+	input_params, init_params, genomes, parent_genomes, seed, particle_indices,
+	carried_moves, deterministic):
+	"""Simulates genomes using the engine specified in input_params"""
+	if input_params['engine'] == 'particle':
+		return simulate_particles(input_params, init_params, genomes, deterministic)
+	# whole population is stepped at once using NumPy arrays, always headless
+	if input_params['engine'] == 'parallel':
+		# population is split between worker processes
+		return pr.simulate_genomes(
+			input_params, init_params, genomes, seed, particle_indices, deterministic)
+	elif (
+		input_params['reuse_parent_prefix'] and
+		input_params['fitness_tiebreak'] == 'steps'):
+		# moves before the first mutation are not simulated again
+		return vr.simulate_children(
+			input_params, init_params, genomes, parent_genomes, seed,
+			particle_indices, deterministic, carried_moves)
+	return vr.simulate_genomes(
+		input_params, init_params, genomes, seed, particle_indices, deterministic)
+
+
+def run_one_generation(
+	input_params, init_params, combined_results, chosen_indices, victory_status):
+	"""Mutates chosen results and returns performance of the resulting genomes
+	for a single generation. Genomes whose result is stored in
+	init_params['fitness_cache'] (None to disable) are not simulated again, and
+	results that did not depend on random moves are stored for later
+	generations"""
+	if input_params['engine'] not in ('particle', 'vectorised', 'parallel'):
+		raise Exception("run_one_generation error: unknown engine specified")
+	rng = init_params['rng']
+	fitness_cache = init_params.get('fitness_cache')
+	profiler = init_params.get('profiler')
+	if profiler is not None:
+		clock = profiler.clock()
+	genomes = mutate_genomes(
+		[combined_results[j][0] for j in chosen_indices], input_params,
+		init_params['possible_moves'], victory_status, rng)
+	if profiler is not None:
+		clock = profiler.lap('mutation', clock)
+	# random moves of vectorised engines are derived from a seed drawn every
+	# generation, whether or not any genomes need simulating
+	if input_params['engine'] != 'particle':
+		seed = rng.getrandbits(64)
+	else:
+		seed = None
+	parent_genomes = [combined_results[j][0] for j in chosen_indices]
+
+	return_list = [None] * len(genomes)
+	if fitness_cache is not None:
+		fitness_cache.reset_stats()
+		for i, genome in enumerate(genomes):
+			return_list[i] = fitness_cache.get(genome)
+	misses = [i for i, result in enumerate(return_list) if result is None]
+	carried_moves = [
+		result[0] for result in return_list if result is not None]
+	if profiler is not None:
+		clock = profiler.lap('fitness_cache', clock)
+		profiler.count('particles_simulated', len(misses))
+
+	if misses:
+		deterministic = []
+		results = simulate(
+			input_params, init_params, [genomes[i] for i in misses],
+			[parent_genomes[i] for i in misses], seed, misses, carried_moves,
+			deterministic)
+		if profiler is not None:
+			clock = profiler.lap('simulation', clock)
+		for i, result, is_deterministic in zip(misses, results, deterministic):
+			return_list[i] = result
+			if fitness_cache is not None and is_deterministic:
+				fitness_cache.add(genomes[i], result)
+		if profiler is not None:
+			profiler.lap('fitness_cache', clock)
+	elif init_params.get('trajectories') is not None:
+		# keep trajectories of cached results for the next generation
+		trajectories = vr.Trajectories()
+		for moves in carried_moves:
+			trajectories.carry_over(init_params['trajectories'], moves)
+		init_params['trajectories'] = trajectories
 
 	return return_list
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+"""Genomes (sequences of moves) are stored as bytes, with one move code per
+byte, which are much smaller than lists of move strings and cheap to copy, hash
+and compare. Old lists of move strings can be converted with from_names"""
+
+import numpy as np
+
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+possible_moves = (UP, DOWN, LEFT, RIGHT)
+move_names = ('up', 'down', 'left', 'right')
+move_codes = {name: code for code, name in enumerate(move_names)}
+
+# change in x and y coordinates, in units of movement_step, indexed by move code
+directions = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def from_names(names):
+	"""Converts list of move strings, e.g. ['up', 'left'], into a genome"""
+	try:
+		return bytes(move_codes[name] for name in names)
+	except KeyError as e:
+		raise Exception("from_names error: unknown move {}".format(e))
+
+
+def to_names(genome):
+	"""Converts genome into list of move strings"""
+	return [move_names[code] for code in genome]
+
+
+def load(moves):
+	"""Returns genome for moves stored either as a genome or, in the old format,
+	as a list of move strings"""
+	if isinstance(moves, (bytes, bytearray)):
+		return bytes(moves)
+	return from_names(moves)
+
+
+def to_array(genome):
+	"""Returns read-only uint8 array view of genome, without copying it"""
+	return np.frombuffer(genome, dtype=np.uint8)
+
+
+def get_direction_tables(movement_step):
+	"""Returns arrays of x and y changes, indexed by move code"""
+	x_changes = np.array(
+		[direction[0] * movement_step for direction in directions], dtype=np.int64)
+	y_changes = np.array(
+		[direction[1] * movement_step for direction in directions], dtype=np.int64)
+	return x_changes, y_changes
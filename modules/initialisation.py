@@ -3,8 +3,12 @@
 import pygame
 import modules.colour_store as cs
 import cv2
-from modules.mask_handling import set_masks
+from modules.mask_handling import set_masks, get_collision_bitmap
 import modules.distance_handling as dh
+import modules.genome as g
+import modules.distance_field as df
+import modules.track_bundle as tb
+import numpy as np
 import os
 
 
@@ -12,17 +16,117 @@ def get_starting_pos(track_num, colour, parent_path):
 	"""Obtain starting_pos based on position of pixel with specified colour in
 	specified track. There should be only 1 pixel with this colour, as first
 	discovery of this colour will be used as starting_pos"""
-	colour = list(colour)
 	img = cv2.imread(
 		parent_path + '/tracks/track_{}/track_{}_start_mark.png'.format(
 			track_num, track_num))
-	img_to_list = img.tolist()
-	for i, j in enumerate(img_to_list):
-		if colour in j:
-			i2 = j.index(colour)
-			item_index = (i2, i)
-			break
-	return item_index[0], item_index[1]
+	# first matching pixel, scanning rows from top to bottom
+	matching_pixels = np.argwhere((img == colour).all(axis=2))
+	if len(matching_pixels) == 0:
+		raise Exception(
+			"get_starting_pos error: no pixel with start mark colour found")
+	return int(matching_pixels[0][1]), int(matching_pixels[0][0])
+
+
+def initialise_collision_bitmaps(particle_mask, track_mask, victory_box_mask):
+	"""Precomputes which particle positions collide with the track boundary and
+	with the victory box, so that each collision check is a single lookup"""
+	track_bitmap = get_collision_bitmap(track_mask, particle_mask)
+	victory_box_bitmap = get_collision_bitmap(victory_box_mask, particle_mask)
+	return track_bitmap, victory_box_bitmap
+
+
+def initialise_section_index(sections):
+	"""Precomputes which section contains each pixel, so that each section lookup
+	is a single lookup rather than a scan of every section"""
+	return dh.SectionIndex(sections)
+
+
+def initialise_distance_field(
+	input_params, track_bitmap, victory_box_bitmap, particle_width,
+	particle_height, display_width, display_height, starting_pos):
+	"""Retrieves distance of each particle position from the victory box, which is
+	computed and cached on first use for each track and particle size, for use
+	when fitness_mode is 'distance_field'"""
+	passable, goal = df.get_passable_and_goal(
+		track_bitmap, victory_box_bitmap, particle_width, particle_height,
+		display_width, display_height)
+	distances = df.get_distances(
+		input_params['track_num'], input_params['particle_size'], passable, goal)
+	return df.DistanceField(distances, starting_pos)
+
+
+def compile_track(track_num, particle_size):
+	"""Computes track data for specified track and particle size from source
+	files, including sections if track has a .section file, and writes it to a
+	track bundle"""
+	has_sections = os.path.isfile(tb.get_source_paths(track_num, particle_size)[-1])
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
+		sections) = initialise_setup({
+			'track_num': track_num, 'particle_size': particle_size,
+			'fitness_mode': 'sections' if has_sections else 'distance_field'})
+	track_bitmap, victory_box_bitmap = initialise_collision_bitmaps(
+		particle_mask, track_mask, victory_box_mask)
+	track_data = {
+		'particle_width': particle_width,
+		'particle_height': particle_height,
+		'display_width': display_width,
+		'display_height': display_height,
+		'starting_pos': list(starting_pos),
+		'sections': None if sections is None else [
+			[
+				list(section.top_left_point), list(section.top_right_point),
+				list(section.bottom_left_point), list(section.bottom_right_point),
+				section.increasing_x_reward, section.increasing_y_reward]
+			for section in sections]}
+	tb.write_bundle(
+		track_num, particle_size, track_data,
+		{'track_bitmap': track_bitmap, 'victory_box_bitmap': victory_box_bitmap})
+
+
+def initialise_from_track_bundle(input_params):
+	"""Alternative to initialise_setup and initialise_collision_bitmaps, which
+	loads track data from the track bundle, compiling it first if it is missing
+	or out of date. Masks are not loaded, as collisions are checked with the
+	collision bitmaps, and track_img is only loaded when not headless"""
+	track_num, particle_size = (
+		input_params['track_num'], input_params['particle_size'])
+	header = tb.get_current_header(track_num, particle_size)
+	if header is None:
+		compile_track(track_num, particle_size)
+		header = tb.get_current_header(track_num, particle_size)
+	arrays = tb.load_bundle(track_num, particle_size, header)
+
+	if input_params['fitness_mode'] == 'sections':
+		if header['sections'] is None:
+			raise Exception(
+				"""initialise_from_track_bundle error: track {} has no .section file, \
+				so fitness_mode must be 'distance_field'""".format(
+					track_num).replace('\t', ''))
+		sections = [
+			dh.Section(
+				tuple(section[0]), tuple(section[1]), tuple(section[2]),
+				tuple(section[3]), section[4], section[5])
+			for section in header['sections']]
+	elif input_params['fitness_mode'] == 'distance_field':
+		sections = None
+	else:
+		raise Exception(
+			"initialise_from_track_bundle error: unknown fitness_mode specified")
+
+	if input_params['headless']:
+		track_img = None
+	else:
+		parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+		track_img = pygame.image.load(
+			parent_path + '/tracks/track_{}/track_{}_full.png'.format(
+				track_num, track_num))
+	return (
+		track_img, header['particle_width'], header['particle_height'],
+		header['display_width'], header['display_height'], arrays['track_bitmap'],
+		arrays['victory_box_bitmap'], g.possible_moves, tuple(header['starting_pos']),
+		sections)
 
 
 def initialise_setup(input_params):
@@ -49,12 +153,18 @@ def initialise_setup(input_params):
 
 	particle_mask, track_mask, victory_box_mask = set_masks(
 		input_params['particle_size'], input_params['track_num'])
-	possible_moves = ['up', 'down', 'left', 'right']
+	possible_moves = g.possible_moves
 
 	starting_pos = get_starting_pos(
 		input_params['track_num'], cs.green, parent_path)
-	sections = dh.retrieve_sections(input_params['track_num'])
-	dh.section_check(sections)
+	if input_params['fitness_mode'] == 'sections':
+		sections = dh.retrieve_sections(input_params['track_num'])
+		dh.section_check(sections)
+	elif input_params['fitness_mode'] == 'distance_field':
+		# sections are not used, so are not needed for track
+		sections = None
+	else:
+		raise Exception("initialise_setup error: unknown fitness_mode specified")
 
 	return (
 		track_img, particle_width, particle_height, display_width, display_height,
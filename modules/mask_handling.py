@@ -24,3 +24,21 @@ def set_masks(particle_num, track_num):
 	victory_box_mask = pygame.mask.from_surface(victory_box_img)
 
 	return particle_mask, track_mask, victory_box_mask
+
+
+def get_collision_bitmap(static_mask, moving_mask):
+	"""Precomputes, for every top-left position of moving_mask, whether it
+	overlaps static_mask (the Minkowski sum of the two masks). Returned boolean
+	array is indexed by [x + moving_width - 1, y + moving_height - 1], such that
+	positions partly outside of static_mask are included"""
+	convolved_mask = static_mask.convolve(moving_mask)
+	convolved_surface = convolved_mask.to_surface(
+		setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 255))
+	return pygame.surfarray.array_red(convolved_surface) > 0
+
+
+def get_collision_rows(bitmap):
+	"""Returns collision bitmap as a list of bytes, one per x index, with values
+	of 1 where there is a collision and 0 otherwise; looking up a single
+	position in it is much faster than indexing the array"""
+	return [row.tobytes() for row in bitmap]
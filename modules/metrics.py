@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""Sinks that record metrics of each generation (a dict per generation), so
+training can be monitored (e.g. with tail -f) and analysed without parsing
+console output. File sinks buffer records, writing them once buffer_size
+records are waiting or flush_interval seconds have passed since the last
+write"""
+
+import csv
+import json
+import time
+from collections import deque
+
+
+class MetricsSink:
+	"""Base class of metrics sinks; subclasses override write_records to store
+	records, which are discarded by default"""
+	enabled = True
+
+	def __init__(self, buffer_size=10, flush_interval=1.0):
+		self.buffer_size = buffer_size
+		self.flush_interval = flush_interval
+		self.buffer = []
+		self.last_flush_time = time.monotonic()
+
+	def record(self, metrics):
+		"""Adds metrics of a generation, writing buffered records if due"""
+		self.buffer.append(metrics)
+		if len(self.buffer) >= self.buffer_size or (
+			time.monotonic() - self.last_flush_time >= self.flush_interval):
+			self.flush()
+
+	def flush(self):
+		"""Writes all buffered records"""
+		if self.buffer:
+			self.write_records(self.buffer)
+			self.buffer = []
+		self.last_flush_time = time.monotonic()
+
+	def close(self):
+		"""Writes all buffered records, e.g. at end of training"""
+		self.flush()
+
+	def write_records(self, records):
+		"""Stores records; does nothing unless overridden"""
+		pass
+
+
+class NullSink(MetricsSink):
+	"""Discards all metrics; metrics are not computed when it is used"""
+	enabled = False
+
+	def record(self, metrics):
+		pass
+
+
+class RingBufferSink(MetricsSink):
+	"""Keeps metrics of the last max_records generations in memory"""
+
+	def __init__(self, max_records=1000):
+		super().__init__(buffer_size=1)
+		self.records = deque(maxlen=max_records)
+
+	def write_records(self, records):
+		self.records.extend(records)
+
+	def get_records(self):
+		"""Returns list of stored metrics, oldest first"""
+		return list(self.records)
+
+
+class JsonlSink(MetricsSink):
+	"""Writes metrics to a file as JSON lines, one line per generation"""
+
+	def __init__(self, path, buffer_size=10, flush_interval=1.0):
+		super().__init__(buffer_size, flush_interval)
+		self.path = path
+		# each run starts a new file
+		open(path, 'w').close()
+
+	def write_records(self, records):
+		with open(self.path, 'a') as f:
+			f.write(''.join(json.dumps(record) + '\n' for record in records))
+
+
+class CsvSink(MetricsSink):
+	"""Writes metrics to a CSV file, with columns given by the first record"""
+
+	def __init__(self, path, buffer_size=10, flush_interval=1.0):
+		super().__init__(buffer_size, flush_interval)
+		self.path = path
+		self.fieldnames = None
+		open(path, 'w').close()
+
+	def write_records(self, records):
+		with open(self.path, 'a', newline='') as f:
+			if self.fieldnames is None:
+				self.fieldnames = list(records[0].keys())
+				writer = csv.DictWriter(
+					f, fieldnames=self.fieldnames, extrasaction='ignore')
+				writer.writeheader()
+			else:
+				writer = csv.DictWriter(
+					f, fieldnames=self.fieldnames, extrasaction='ignore')
+			writer.writerows(records)
+
+
+def get_sink(path=None, buffer_size=10, flush_interval=1.0):
+	"""Returns sink that writes to path, as CSV if it ends in .csv and as JSON
+	lines otherwise, or a NullSink if path is None"""
+	if path is None:
+		return NullSink()
+	if path.endswith('.csv'):
+		return CsvSink(path, buffer_size, flush_interval)
+	return JsonlSink(path, buffer_size, flush_interval)
+
+
+def get_generation_metrics(
+	generation, generation_data, best_distance_score, wall_time, elapsed,
+	fitness_cache=None, particle_steps=0):
+	"""Returns metrics of a generation, from its results (moves, distance_score,
+	time), the best distance_score so far and the number of particle steps
+	simulated by the engine, which excludes results taken from the fitness cache
+	and moves of parents that children resumed from. Mean distance_score is of
+	particles that did not reach the victory box, as they are scored 10E8"""
+	population = len(generation_data)
+	scores = [result[1] for result in generation_data]
+	unfinished_scores = [score for score in scores if score != 10E8]
+	genome_lengths = [len(result[0]) for result in generation_data]
+	metrics = {
+		'generation': generation,
+		'best_distance_score': max(scores, default=0),
+		'mean_distance_score': (
+			sum(unfinished_scores) / len(unfinished_scores)
+			if unfinished_scores else None),
+		'record_distance_score': best_distance_score,
+		'victory': best_distance_score == 10E8,
+		'num_victorious': population - len(unfinished_scores),
+		'diversity': (
+			len(set(result[0] for result in generation_data)) / population
+			if population else 0),
+		'mean_genome_length': (
+			sum(genome_lengths) / population if population else 0),
+		'max_genome_length': max(genome_lengths, default=0),
+		'steps': particle_steps,
+		'wall_time': wall_time,
+		'elapsed': elapsed}
+	if fitness_cache is not None:
+		metrics['fitness_cache_hit_rate'] = fitness_cache.get_hit_rate()
+	return metrics
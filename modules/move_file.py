@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""Best moves of trained particles are stored in move files, a versioned binary
+format that packs 4 moves into each byte (2 bits per move code, first move in
+the lowest bits) after a fixed size header, such that files are a quarter of
+the size of genomes, and loading them does not unpickle anything. Files are
+memory-mapped when loaded, and headers can be read without reading the moves,
+so that many files can be scanned quickly.
+
+Header layout (little-endian): magic bytes, version, header length, track_num
+(UTF-8, padded with null bytes), particle size, movement step, number of moves,
+steps taken to achieve victory (or no_steps if unknown) and CRC-32 of the
+packed moves"""
+
+import os
+import re
+import mmap
+import zlib
+import struct
+import argparse
+import numpy as np
+import modules.pickle_funcs as pf
+
+move_file_version = 1
+magic = b'GAMV'
+header_format = struct.Struct('<4sHH16sHHIII')
+no_steps = 0xFFFFFFFF
+
+
+def get_best_moves_folder():
+	"""Returns path of folder that best moves are saved in"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	return parent_path + '/best_moves'
+
+
+def get_best_moves_path(input_params):
+	"""Returns path of move file of best moves of the specified particle and
+	track"""
+	return get_best_moves_folder() + (
+		"/best_moves_for_particle_{},_track_{}.moves".format(
+			input_params['particle_size'], input_params['track_num']))
+
+
+def get_pickle_path(input_params):
+	"""Returns path that older versions pickled best moves of the specified
+	particle and track to"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	return (
+		parent_path + "/pickles/best_moves_for_particle_{},_track_{}.pickle".format(
+			input_params['particle_size'], input_params['track_num']))
+
+
+def get_pickle_paths():
+	"""Returns paths of all best moves pickled by older versions, sorted by path"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	pickles_path = parent_path + '/pickles'
+	if not os.path.isdir(pickles_path):
+		return []
+	return sorted(
+		os.path.join(pickles_path, name) for name in os.listdir(pickles_path)
+		if name.startswith('best_moves_for_particle_') and name.endswith('.pickle'))
+
+
+def pack_moves(genome):
+	"""Returns genome packed into bytes, 4 moves per byte"""
+	codes = np.zeros(-(-len(genome) // 4) * 4, dtype=np.uint8)
+	codes[:len(genome)] = np.frombuffer(genome, dtype=np.uint8)
+	codes = codes.reshape(-1, 4)
+	return (
+		codes[:, 0] | (codes[:, 1] << 2) | (codes[:, 2] << 4) |
+		(codes[:, 3] << 6)).tobytes()
+
+
+def unpack_moves(packed, genome_length):
+	"""Returns genome of genome_length moves from bytes packed by pack_moves"""
+	packed = np.frombuffer(packed, dtype=np.uint8)
+	codes = (packed[:, np.newaxis] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+	return codes.reshape(-1)[:genome_length].tobytes()
+
+
+def write_move_file(
+	path, genome, track_num, particle_size, movement_step, achieved_steps=None):
+	"""Writes genome to move file at path, creating its folder if needed"""
+	track_id = str(track_num).encode()
+	if len(track_id) > 16:
+		raise Exception(
+			"write_move_file error: track_num {} is too long".format(track_num))
+	packed = pack_moves(genome)
+	header = header_format.pack(
+		magic, move_file_version, header_format.size, track_id,
+		int(particle_size), int(movement_step), len(genome),
+		no_steps if achieved_steps is None else int(achieved_steps),
+		zlib.crc32(packed))
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	# written to temporary file first, so an interrupted write is never loaded
+	temporary_path = path + '.tmp'
+	with open(temporary_path, 'wb') as f:
+		f.write(header)
+		f.write(packed)
+	os.replace(temporary_path, path)
+
+
+def unpack_header(buffer, path):
+	"""Returns header of move file from start of buffer, as a dict"""
+	if len(buffer) < header_format.size:
+		raise Exception("unpack_header error: {} is not a move file".format(path))
+	(
+		file_magic, version, header_length, track_id, particle_size, movement_step,
+		genome_length, achieved_steps, crc32) = header_format.unpack_from(buffer)
+	if file_magic != magic:
+		raise Exception("unpack_header error: {} is not a move file".format(path))
+	if version != move_file_version:
+		raise Exception(
+			"unpack_header error: {} has unsupported version {}".format(
+				path, version))
+	return {
+		'track_num': track_id.rstrip(b'\0').decode(),
+		'particle_size': str(particle_size),
+		'movement_step': movement_step,
+		'genome_length': genome_length,
+		'achieved_steps': None if achieved_steps == no_steps else achieved_steps,
+		'crc32': crc32,
+		'header_length': header_length}
+
+
+def read_header(path):
+	"""Returns header of move file, without reading its moves"""
+	with open(path, 'rb') as f:
+		return unpack_header(f.read(header_format.size), path)
+
+
+def get_move_file_paths(folder_path):
+	"""Returns paths of every move file in folder, sorted by path"""
+	if not os.path.isdir(folder_path):
+		return []
+	return sorted(
+		os.path.join(folder_path, name) for name in os.listdir(folder_path)
+		if name.endswith('.moves'))
+
+
+def scan_move_files(folder_path):
+	"""Returns (path, header) of every move file in folder, sorted by path"""
+	return [
+		(path, read_header(path)) for path in get_move_file_paths(folder_path)]
+
+
+def load_move_file(path, verify=True):
+	"""Returns header and genome of move file, which is memory-mapped such that
+	only the moves are copied, when they are unpacked. If verify is True, the
+	checksum of the moves is checked"""
+	with open(path, 'rb') as f:
+		if os.fstat(f.fileno()).st_size < header_format.size:
+			raise Exception("load_move_file error: {} is not a move file".format(path))
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+			header = unpack_header(buffer, path)
+			packed_length = -(-header['genome_length'] // 4)
+			if len(buffer) < header['header_length'] + packed_length:
+				raise Exception("load_move_file error: {} is truncated".format(path))
+			packed = memoryview(buffer)[
+				header['header_length']: header['header_length'] + packed_length]
+			try:
+				if verify and zlib.crc32(packed) != header['crc32']:
+					raise Exception(
+						"load_move_file error: checksum of {} does not match".format(path))
+				genome = unpack_moves(packed, header['genome_length'])
+			finally:
+				packed.release()
+	return header, genome
+
+
+def convert_pickle(pickle_path, movement_step, move_file_path=None):
+	"""Converts best moves pickled by older versions into a move file, by default
+	in the best_moves folder, with track and particle taken from the pickle's
+	name. Only pickles from trusted sources should be converted, as loading a
+	pickle can run arbitrary code. Returns path of move file"""
+	match = re.fullmatch(
+		r'best_moves_for_particle_(\d+),_track_(\w+)\.pickle',
+		os.path.basename(pickle_path))
+	if match is None:
+		raise Exception(
+			"convert_pickle error: {} is not a best moves pickle".format(pickle_path))
+	input_params = {'particle_size': match.group(1), 'track_num': match.group(2)}
+	if move_file_path is None:
+		move_file_path = get_best_moves_path(input_params)
+	write_move_file(
+		move_file_path, pf.get_moves_pickle(pickle_path), input_params['track_num'],
+		input_params['particle_size'], movement_step)
+	return move_file_path
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Convert best moves pickles into move files')
+	parser.add_argument(
+		'pickle_paths', nargs='*',
+		help='pickles to convert; all pickles in the pickles folder if none given')
+	parser.add_argument(
+		'--movement-step', type=int, default=15,
+		help='movement_step the moves were trained with')
+	args = parser.parse_args()
+
+	pickle_paths = args.pickle_paths or get_pickle_paths()
+	for pickle_path in pickle_paths:
+		print('{} -> {}'.format(
+			pickle_path, convert_pickle(pickle_path, args.movement_step)))
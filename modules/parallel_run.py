@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""Evaluates the particles of a generation in parallel, by splitting their
+genomes into shards that are each simulated headlessly by the vectorised engine
+in a separate worker process. The pool of workers is created on first use and
+reused for every following generation"""
+
+import os
+import atexit
+import random
+from concurrent.futures import ProcessPoolExecutor
+import modules.vectorised_run as vr
+
+# init_params entries needed by workers; others (e.g. pygame surfaces) cannot be
+# sent to another process
+worker_init_param_keys = (
+	'particle_width', 'particle_height', 'display_width', 'display_height',
+	'track_bitmap', 'victory_box_bitmap', 'possible_moves', 'starting_pos',
+	'sections', 'section_index', 'distance_field')
+# input_params entries that workers are initialised for; a pool is only reused
+# while they are unchanged
+worker_input_param_keys = (
+	'track_num', 'particle_size', 'movement_step', 'fitness_mode',
+	'fitness_tiebreak')
+
+pool = None
+pool_key = None
+worker_state = {}
+
+
+def initialise_worker(input_params, init_params):
+	"""Stores parameters in worker process, so they are only sent once"""
+	worker_state['input_params'] = input_params
+	worker_state['init_params'] = init_params
+
+
+def simulate_shard(genomes, seed, particle_indices):
+	"""Runs in worker process; simulates one shard of the generation, returning
+	its results, whether each result is deterministic and the number of particle
+	steps simulated"""
+	deterministic = []
+	worker_state['init_params']['particle_steps'] = 0
+	return_list = vr.simulate_genomes(
+		worker_state['input_params'], worker_state['init_params'], genomes, seed,
+		particle_indices, deterministic)
+	return (
+		return_list, deterministic, worker_state['init_params']['particle_steps'])
+
+
+def get_num_of_workers(input_params):
+	"""Returns number of worker processes to use, defaulting to number of CPUs"""
+	if input_params['num_of_workers'] is None:
+		return os.cpu_count()
+	return input_params['num_of_workers']
+
+
+def get_pool_key(input_params):
+	"""Returns parameters that a pool of workers is created for"""
+	return tuple(
+		input_params[key] for key in worker_input_param_keys) + (
+		get_num_of_workers(input_params),)
+
+
+def get_pool(input_params, init_params):
+	"""Creates pool of worker processes, if it does not already exist for the
+	same track, particle, parameters and number of workers, replacing any pool
+	created for others"""
+	global pool, pool_key
+	key = get_pool_key(input_params)
+	if pool is not None and pool_key != key:
+		shutdown_pool()
+	if pool is None:
+		worker_init_params = {
+			key: init_params[key] for key in worker_init_param_keys}
+		pool = ProcessPoolExecutor(
+			max_workers=get_num_of_workers(input_params),
+			initializer=initialise_worker,
+			initargs=(input_params, worker_init_params))
+		pool_key = key
+	return pool
+
+
+def shutdown_pool():
+	"""Stops worker processes, if they have been started"""
+	global pool, pool_key
+	if pool is not None:
+		pool.shutdown()
+		pool = None
+		pool_key = None
+
+
+atexit.register(shutdown_pool)
+
+
+def split_into_shards(genomes, num_of_shards):
+	"""Splits genomes into num_of_shards contiguous lists of near equal length"""
+	num_of_shards = max(1, min(num_of_shards, len(genomes)))
+	shard_size, remainder = divmod(len(genomes), num_of_shards)
+	shards = []
+	start = 0
+	for i in range(num_of_shards):
+		end = start + shard_size + (1 if i < remainder else 0)
+		shards.append(genomes[start: end])
+		start = end
+	return shards
+
+
+def simulate_genomes(
+	input_params, init_params, genomes, seed=None, particle_indices=None,
+	deterministic=None):
+	"""Simulates genomes across pool of worker processes, returning the same
+	(moves, distance_score, time) results, in the same order, as
+	vectorised_run.simulate_genomes, and adding the number of particle steps
+	simulated by the workers to init_params['particle_steps']"""
+	executor = get_pool(input_params, init_params)
+	shards = split_into_shards(genomes, get_num_of_workers(input_params))
+	if seed is None:
+		seed = random.getrandbits(64)
+	# random moves depend on each particle's index in the whole generation, so
+	# results are identical to a serial run with the same seed
+	if particle_indices is None:
+		particle_indices = list(range(len(genomes)))
+	shard_indices = split_into_shards(list(particle_indices), len(shards))
+	return_list = []
+	for shard_results, shard_deterministic, particle_steps in executor.map(
+		simulate_shard, shards, [seed] * len(shards), shard_indices):
+		return_list += shard_results
+		if deterministic is not None:
+			deterministic += shard_deterministic
+		init_params['particle_steps'] = (
+			init_params.get('particle_steps', 0) + particle_steps)
+	return return_list
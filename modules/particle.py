@@ -7,17 +7,21 @@ import os
 class Particle:
 	"""Stores info and properties of a particle"""
 
-	def __init__(self, particle_size, starting_pos):
+	def __init__(self, particle_size, starting_pos, load_img=True):
 		parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 		self.x = starting_pos[0]
 		self.y = starting_pos[1]
-		self.img = pygame.image.load(
-			parent_path + '/particles/particle_{}.png'.format(particle_size))
+		if load_img:
+			self.img = pygame.image.load(
+				parent_path + '/particles/particle_{}.png'.format(particle_size))
+		else:
+			# headless particles are never drawn, so skip loading their image
+			self.img = None
 
 		self.alive = True
 		self.x_change = 0
 		self.y_change = 0
-		self.moves_made = []
+		self.moves_made = bytearray()
 		self.distance_time_record = (0, 0, 0)  # tuple of furthest distance,
 		# corresponding step no. to reach that distance and time to get to that point
 		self.current_distance_score = 0
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import pickle
+import modules.genome as g
 
 
 def pickle_me(p_path, p_obj):
@@ -16,3 +17,9 @@ def get_pickle(p_path):
 	obj = pickle.load(pickle_in)
 	pickle_in.close()
 	return obj
+
+
+def get_moves_pickle(p_path):
+	"""Retrieves pickled moves as a genome, converting moves pickled as a list of
+	move strings by older versions"""
+	return g.load(get_pickle(p_path))
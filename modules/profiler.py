@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""Optional instrumentation of training, which times each phase of every
+generation and counts steps simulated, particles alive per step and boundary
+crossings handled. It is only used when init_params['profiler'] is not None,
+with every timing and count guarded by that check, so it costs nothing when
+disabled. Phases are timed by chaining laps of a monotonic clock:
+
+	clock = profiler.clock()
+	...
+	clock = profiler.lap('mutation', clock)
+
+Sub-phases of a phase are named with a '.' separator (e.g.
+'simulation.collision'), and are also included in the time of their phase"""
+
+import json
+import time
+from collections import defaultdict
+
+
+class Profiler:
+	"""Accumulates phase times and counts of the current generation, which are
+	summarised, and optionally written to a JSON lines file, by end_generation"""
+
+	def __init__(self, output_path=None):
+		self.output_path = output_path
+		if output_path is not None:
+			# each run starts a new file
+			open(output_path, 'w').close()
+		self.summaries = []
+		self.reset()
+
+	def reset(self):
+		"""Clears times and counts of current generation"""
+		self.times = defaultdict(float)
+		self.counts = defaultdict(int)
+		self.alive_per_step = []
+
+	def clock(self):
+		"""Returns current time of monotonic clock, in seconds"""
+		return time.perf_counter()
+
+	def lap(self, phase, start):
+		"""Adds time since start to phase, returning current time, which is the
+		start of the next phase"""
+		now = time.perf_counter()
+		self.times[phase] += now - start
+		return now
+
+	def count(self, name, number=1):
+		"""Adds number to count of name"""
+		self.counts[name] += number
+
+	def record_step(self, num_alive):
+		"""Records that a step was simulated with num_alive particles moving"""
+		num_alive = int(num_alive)
+		self.alive_per_step.append(num_alive)
+		self.counts['steps'] += 1
+		self.counts['particle_steps'] += num_alive
+
+	def end_generation(self, generation):
+		"""Stores summary of current generation, writes it to output_path, and
+		starts the next generation"""
+		summary = {
+			'generation': generation,
+			'times': dict(self.times),
+			'counts': dict(self.counts),
+			'max_alive': max(self.alive_per_step, default=0)}
+		self.summaries.append(summary)
+		if self.output_path is not None:
+			with open(self.output_path, 'a') as f:
+				f.write(json.dumps(
+					dict(summary, alive_per_step=self.alive_per_step)) + '\n')
+		self.reset()
+		return summary
+
+	def get_table(self):
+		"""Returns table of total and mean per generation of each phase time and
+		count over all generations so far, as a string"""
+		num_of_generations = max(len(self.summaries), 1)
+		times = defaultdict(float)
+		counts = defaultdict(int)
+		for summary in self.summaries:
+			for phase, seconds in summary['times'].items():
+				times[phase] += seconds
+			for name, number in summary['counts'].items():
+				counts[name] += number
+		total_time = times.get('generation', 0)
+		lines = ['{:<32}{:>12}{:>16}{:>14}'.format(
+			'Phase', 'Total (s)', 'Per gen (ms)', '% of gen')]
+		for phase in sorted(times):
+			lines.append('{:<32}{:>12.3f}{:>16.3f}{:>14}'.format(
+				phase, times[phase], 1000 * times[phase] / num_of_generations,
+				'{:.1f}'.format(100 * times[phase] / total_time) if total_time else '-'))
+		lines.append('')
+		lines.append('{:<32}{:>12}{:>16}'.format('Count', 'Total', 'Per gen'))
+		for name in sorted(counts):
+			lines.append('{:<32}{:>12}{:>16.1f}'.format(
+				name, counts[name], counts[name] / num_of_generations))
+		max_alive = max(
+			[summary['max_alive'] for summary in self.summaries], default=0)
+		lines.append('{:<32}{:>12}'.format('max_alive', max_alive))
+		return '\n'.join(lines)
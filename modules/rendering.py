@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Draws particles over the track faster than redrawing the whole display every
+frame. Surfaces are converted to the display's pixel format once, so blits do
+not convert them every frame. Small populations are drawn with dirty
+rectangles: only the areas that particles left and moved to are redrawn and
+updated. Populations of batch_threshold or more particles, whose rectangles
+would cover most of the display anyway, are drawn at once with
+pygame.surfarray, by writing each pixel of the particle image at every
+particle's position straight into the display's pixels. As particles move in
+steps of movement_step from the same starting position, many of them share a
+position, and each position is only drawn once"""
+
+import os
+import numpy as np
+import pygame
+
+batch_threshold = 500
+
+
+class Renderer:
+	"""Draws frames of particle positions onto game_display"""
+
+	def __init__(self, game_display, track_img, particle_size):
+		parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+		self.game_display = game_display
+		self.track_img = track_img.convert()
+		self.particle_img = pygame.image.load(
+			parent_path + '/particles/particle_{}.png'.format(particle_size)
+		).convert_alpha()
+		# pixels of track and particle, mapped to the display's pixel format;
+		# particle pixels that are at least half opaque are drawn by draw_batch
+		self.track_pixels = pygame.surfarray.array2d(self.track_img)
+		opaque = pygame.surfarray.array_alpha(self.particle_img) >= 128
+		self.offsets_x, self.offsets_y = np.nonzero(opaque)
+		self.particle_colours = [
+			game_display.map_rgb(tuple(colour))
+			for colour in pygame.surfarray.array3d(self.particle_img)[opaque].tolist()]
+		self.previous_rects = None
+
+	def reset(self):
+		"""Redraws the whole display with the next frame, e.g. at the start of a
+		generation"""
+		self.previous_rects = None
+
+	def draw(self, xs, ys):
+		"""Draws particles at positions given by xs and ys over the track, and
+		updates the display"""
+		if len(xs) >= batch_threshold:
+			# positions are packed into one integer each, to find distinct ones
+			positions = np.unique(
+				(np.asarray(xs, dtype=np.int64) << 32) +
+				(np.asarray(ys, dtype=np.int64) + 2**31))
+			self.draw_batch(positions >> 32, (positions & 0xFFFFFFFF) - 2**31)
+		else:
+			self.draw_rects(xs, ys)
+
+	def draw_rects(self, xs, ys):
+		"""Erases particles of previous frame and draws particles of this frame,
+		updating only the areas they cover"""
+		if self.previous_rects is None:
+			self.game_display.blit(self.track_img, (0, 0))
+		else:
+			self.game_display.blits(
+				[(self.track_img, rect, rect) for rect in self.previous_rects],
+				doreturn=False)
+		rects = self.game_display.blits(
+			[(self.particle_img, (int(x), int(y))) for x, y in zip(xs, ys)])
+		if self.previous_rects is None:
+			pygame.display.update()
+		else:
+			pygame.display.update(self.previous_rects + rects)
+		self.previous_rects = rects
+
+	def draw_batch(self, xs, ys):
+		"""Draws track and all particles (arrays of distinct positions) directly
+		into the display's pixels, and updates the whole display"""
+		width, height = self.track_pixels.shape
+		particle_width, particle_height = self.particle_img.get_size()
+		inside = (
+			(xs >= 0) & (xs <= width - particle_width) &
+			(ys >= 0) & (ys <= height - particle_height))
+		pixels = pygame.surfarray.pixels2d(self.game_display)
+		pixels[...] = self.track_pixels
+		inside_xs, inside_ys = xs[inside], ys[inside]
+		for offset_x, offset_y, colour in zip(
+			self.offsets_x.tolist(), self.offsets_y.tolist(), self.particle_colours):
+			pixels[inside_xs + offset_x, inside_ys + offset_y] = colour
+		# display is locked until its pixels array is deleted
+		del pixels
+		# particles partly outside the display are clipped by blitting them
+		self.game_display.blits(
+			[(self.particle_img, (x, y)) for x, y in zip(
+				xs[~inside].tolist(), ys[~inside].tolist())], doreturn=False)
+		pygame.display.update()
+		# the whole display was drawn, so there are no rectangles to erase
+		self.previous_rects = None
@@ -1,34 +1,42 @@
 #!/usr/bin/env python3
 
 import time
+import heapq
+from bisect import bisect_left
+from itertools import accumulate
 import modules.generation_run as gr
-import modules.pickle_funcs as pf
+import modules.move_file as mf
+import modules.metrics as mt
+import modules.checkpoint as ck
+import modules.verification as vf
 import os
 import random
 
 
 def get_top_results(num_best_to_take, generation_data):
 	"""Puts top num_best_to_take results into top_results list, ranked by
-	distance_score, then by time if ditance_scores match"""
-	top_results = [[[], 0, 1000, 0] for i in range(num_best_to_take)]  # format
-	# is: moves, distance_score, time, identifying_index
-	for j, data in enumerate(generation_data):
-		for k, top_result in enumerate(top_results):
-			if data[1] >= top_result[1]:
-				if data[1] > top_result[1]:
-					top_results = top_results[0: k] + [list(data) + [j]] + top_results[k: -1]
-					break
-				elif data[2] < top_result[2]:
-					top_results = top_results[0: k] + [list(data) + [j]] + top_results[k: -1]
-					break
+	distance_score, then by time if ditance_scores match, then by earliest
+	position in generation_data. Uses a heap, so is O(N log k) for N results"""
+	# results must beat placeholder of distance_score 0 and time 1000, which
+	# fills any remaining places
+	candidates = (
+		j for j, data in enumerate(generation_data) if (
+			data[1] > 0 or (data[1] == 0 and data[2] < 1000)))
+	top_indices = heapq.nsmallest(
+		num_best_to_take, candidates,
+		key=lambda j: (-generation_data[j][1], generation_data[j][2], j))
+	top_results = (
+		[list(generation_data[j]) + [j] for j in top_indices] +
+		[[b'', 0, 1000, 0] for i in range(num_best_to_take - len(top_indices))])
+	# format is: moves, distance_score, time, identifying_index
 	return top_results
 
 
 def update_best_result(
 	best_moves, best_distance_score, corresponding_best_time, top_results,
-	testing=False):
+	testing=False, fitness_tiebreak='time', print_progress=True):
 	"""Puts previous best result to top of top_results if it beats it, such that
-	current best result is found"""
+	current best result is found, printing it if print_progress is True"""
 	if best_distance_score >= top_results[0][1]:
 		if best_distance_score > top_results[0][1]:
 			top_results = (
@@ -39,31 +47,35 @@ def update_best_result(
 				[[best_moves, best_distance_score, corresponding_best_time, None]] +
 				top_results[0: -1])
 	best_distance, corr_time = top_results[0][1], top_results[0][2]
-	if not testing:
+	if print_progress and not testing:
+		if fitness_tiebreak == 'steps':
+			corr_time_text = '{} steps'.format(corr_time)
+		else:
+			corr_time_text = 'a time of {} seconds'.format(corr_time)
 		if best_distance == 10E8:
-			print('\tVictory achieved in a time of {} seconds.'.format(corr_time))
+			print('\tVictory achieved in {}.'.format(corr_time_text))
 		else:
 			print(
-				'\tCurrent record is distance of {} pixels in time of {} seconds.'.format(
-					best_distance, corr_time))
+				'\tCurrent record is distance of {} pixels in {}.'.format(
+					best_distance, corr_time_text))
 	return top_results
 
 
-def get_random_selection(top_results, generation_data, num_random_to_take):
+def get_random_selection(
+	top_results, generation_data, num_random_to_take, rng=random):
 	"""Retrieves (without replacement) num_random_to_take random samples from
 	generation_data, provided that sample is not already in top_results"""
-	taken_indices = [x[3] for x in top_results]
+	taken_indices = set(x[3] for x in top_results)
 	possible_indices = (
-		[i for i, j in enumerate(generation_data) if i not in taken_indices])
-	random_sample_indices = random.sample(possible_indices, num_random_to_take)
+		[i for i in range(len(generation_data)) if i not in taken_indices])
+	random_sample_indices = rng.sample(possible_indices, num_random_to_take)
 	random_results = (
-		[list(j) + [i] for i, j in enumerate(generation_data) if (
-			i in random_sample_indices)])
+		[list(generation_data[i]) + [i] for i in sorted(random_sample_indices)])
 	return random_results
 
 
 def choose_samples(
-	input_params, random_results, top_results):
+	input_params, random_results, top_results, rng=random):
 	"""Chooses moves to be passed on tso next generation"""
 	sum_of_ranks = sum([i + 1 for i in range(input_params['num_best_to_take'])])
 	dividing_factor = (
@@ -76,93 +88,203 @@ def choose_samples(
 	combined_results = (
 		[y[0: 3] + [len(top_results) - x] for x, y in enumerate(top_results)] +
 		[y[0: 3] + [random_score] for y in random_results])
-	# generates indices of data points to be selected, based on their given score
-	total_score = sum([x[3] for x in combined_results])
-	chosen_indices = []
-	prev_val = 0
-	current_val = 0
-	for x in range(input_params['num_of_particles_per_generation']):
-		ran_int = random.randint(1, total_score)
-		prev_val = 0
-		for y, z in enumerate(combined_results):
-			current_val = z[3] + prev_val
-			if ran_int > prev_val and ran_int <= current_val:
-				chosen_indices.append(y)
-				break
-			prev_val = current_val
+	# generates indices of data points to be selected, based on their given
+	# score; data point y is chosen when random integer lies in the range
+	# (cumulative_scores[y - 1], cumulative_scores[y]]
+	cumulative_scores = list(accumulate(x[3] for x in combined_results))
+	total_score = cumulative_scores[-1]
+	chosen_indices = [
+		bisect_left(cumulative_scores, rng.randint(1, total_score)) for x in range(
+			input_params['num_of_particles_per_generation'])]
 	return combined_results, chosen_indices
 
 
 def run_all_generations(input_params, init_params):
 	"""Runs through specified number of generations, improving each generation
 	using a genetic algorithm, whereby better performances have a higher chance of
-	being mutated from"""
-	best_moves = []
+	being mutated from. Every input_params['checkpoint_interval'] generations (0
+	to disable), and when training ends or is interrupted, the state of training
+	is checkpointed, and if input_params['resume'] is True training continues from
+	the last checkpoint"""
+	best_moves = b''
 	best_distance_score = 0
 	corresponding_best_time = 1000000000
 	victory_status = False
 	combined_results = (
-		[([], 0, 1000000, 1)] * input_params['num_of_particles_per_generation'])
+		[(b'', 0, 1000000, 1)] * input_params['num_of_particles_per_generation'])
 	chosen_indices = (
 		[i for i in range(input_params['num_of_particles_per_generation'])])
-	overall_start_time = time.time()
-	for i in range(input_params['num_of_generations']):
-		current_time_elapsed = round(time.time() - overall_start_time, 0)
-		print(
-			'Generation: {}, with {} seconds elapsed.'.format(i, current_time_elapsed))
-		generation_data = gr.run_one_generation(
-			input_params, init_params, combined_results, chosen_indices, victory_status)
-
-		top_results = get_top_results(
-			input_params['num_best_to_take'], generation_data)
-		random_results = get_random_selection(
-			top_results, generation_data, input_params['num_random_to_take'])
-		# update best set of moves
-		top_results = update_best_result(
-			best_moves, best_distance_score, corresponding_best_time, top_results)
-		best_moves = top_results[0][0]
-		best_distance_score = top_results[0][1]
-		corresponding_best_time = top_results[0][2]
-
-		combined_results, chosen_indices = choose_samples(
-			input_params, random_results, top_results)
-
-		if best_distance_score == 10E8:
-			# victory achieved
-			if input_params['adaptive_algo'][3] == 0:
-				input_params['adaptive_algo'][3] = i + input_params['adaptive_algo'][2]
-			if i >= input_params['adaptive_algo'][3]:
-				victory_status = True
-			chosen_indices = [0] * input_params['num_of_particles_per_generation']
+	print_progress = input_params.get('print_progress', True)
+	first_generation = 0
+	previous_time_elapsed = 0
+	checkpoint_path = ck.get_checkpoint_path(input_params)
+	if input_params.get('resume'):
+		state = ck.load_checkpoint(checkpoint_path, input_params)
+		first_generation = state['generation']
+		best_moves = state['best_moves']
+		best_distance_score = state['best_distance_score']
+		corresponding_best_time = state['corresponding_best_time']
+		victory_status = state['victory_status']
+		combined_results = state['combined_results']
+		chosen_indices = state['chosen_indices']
+		input_params['adaptive_algo'][3] = state['adaptive_algo_switch']
+		init_params['rng'].setstate(state['rng_state'])
+		previous_time_elapsed = state['elapsed']
+		if print_progress:
+			print('Resuming training from generation {}.'.format(first_generation))
+	checkpoint_interval = input_params.get('checkpoint_interval', 0)
+	if checkpoint_interval > 0:
+		checkpoint_writer = ck.CheckpointWriter(checkpoint_path)
+	else:
+		checkpoint_writer = None
+	# state after last completed generation, which is checkpointed at the end
+	state = None
+	profiler = init_params.get('profiler')
+	viewer = init_params.get('viewer')
+	metrics_sink = init_params.get('metrics_sink')
+	if metrics_sink is not None and not metrics_sink.enabled:
+		metrics_sink = None
+	overall_start_time = time.time() - previous_time_elapsed
+	try:
+		for i in range(first_generation, input_params['num_of_generations']):
+			if profiler is not None:
+				generation_start = profiler.clock()
+			if viewer is not None:
+				viewer.start_generation(i)
+			# only every render_every'th generation is drawn
+			init_params['rendering'] = i % input_params.get('render_every', 1) == 0
+			if metrics_sink is not None:
+				generation_start_time = time.perf_counter()
+			current_time_elapsed = round(time.time() - overall_start_time, 0)
+			if print_progress:
+				print(
+					'Generation: {}, with {} seconds elapsed.'.format(
+						i, current_time_elapsed))
+			# counted by the engine while simulating this generation
+			init_params['particle_steps'] = 0
+			generation_data = gr.run_one_generation(
+				input_params, init_params, combined_results, chosen_indices,
+				victory_status)
+			if init_params.get('quit_requested'):
+				# results of an unfinished generation are discarded
+				print('Display closed, so training stopped at generation {}.'.format(i))
+				break
+
+			if profiler is not None:
+				clock = profiler.clock()
+			top_results = get_top_results(
+				input_params['num_best_to_take'], generation_data)
+			random_results = get_random_selection(
+				top_results, generation_data, input_params['num_random_to_take'],
+				init_params['rng'])
+			# update best set of moves
+			top_results = update_best_result(
+				best_moves, best_distance_score, corresponding_best_time, top_results,
+				fitness_tiebreak=input_params['fitness_tiebreak'],
+				print_progress=print_progress)
+			best_moves = top_results[0][0]
+			best_distance_score = top_results[0][1]
+			corresponding_best_time = top_results[0][2]
 
+			combined_results, chosen_indices = choose_samples(
+				input_params, random_results, top_results, init_params['rng'])
+			if profiler is not None:
+				profiler.lap('selection', clock)
+
+			if best_distance_score == 10E8:
+				# victory achieved
+				if input_params['adaptive_algo'][3] == 0:
+					input_params['adaptive_algo'][3] = i + input_params['adaptive_algo'][2]
+				if i >= input_params['adaptive_algo'][3]:
+					victory_status = True
+				chosen_indices = [0] * input_params['num_of_particles_per_generation']
+			if metrics_sink is not None:
+				metrics_sink.record(mt.get_generation_metrics(
+					i, generation_data, best_distance_score,
+					time.perf_counter() - generation_start_time,
+					time.time() - overall_start_time, init_params.get('fitness_cache'),
+					init_params['particle_steps']))
+			if profiler is not None:
+				profiler.lap('generation', generation_start)
+				profiler.end_generation(i)
+			if checkpoint_writer is not None:
+				state = ck.get_state(
+					input_params, init_params, i + 1, best_moves, best_distance_score,
+					corresponding_best_time, victory_status, combined_results,
+					chosen_indices, time.time() - overall_start_time)
+				if (i + 1) % checkpoint_interval == 0:
+					checkpoint_writer.submit(state)
+	except KeyboardInterrupt:
+		print('Training interrupted.')
+
+	if checkpoint_writer is not None:
+		if state is not None and state['generation'] % checkpoint_interval != 0:
+			checkpoint_writer.submit(state)
+		checkpoint_writer.close()
+		if state is not None and print_progress:
+			print('Checkpoint of generation {} written to {}.'.format(
+				state['generation'], checkpoint_path))
+	if metrics_sink is not None:
+		metrics_sink.close()
+	if profiler is not None:
+		print(profiler.get_table())
 	if input_params['pickle_best']:
-		parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-		pickle_path = (
-			parent_path +
-			"/pickles/best_moves_for_particle_{},_track_{}.pickle".format(
-				input_params['particle_size'], input_params['track_num']))
-		pf.pickle_me(pickle_path, best_moves)
+		if best_distance_score == 10E8 and input_params['fitness_tiebreak'] == 'steps':
+			achieved_steps = corresponding_best_time
+		else:
+			achieved_steps = None
+		mf.write_move_file(
+			mf.get_best_moves_path(input_params), best_moves,
+			input_params['track_num'], input_params['particle_size'],
+			input_params['movement_step'], achieved_steps)
 
 
-def run_best_moves(input_params, init_params):
-	"""Runs through pickled set of moves obtained by 'training' particle; it is
-	expected that these moves lead to victory"""
-	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-	pickle_path = (
-		parent_path +
-		"/pickles/best_moves_for_particle_{},_track_{}.pickle".format(
-			input_params['particle_size'], input_params['track_num']))
-	if os.path.isfile(pickle_path):
-		best_moves = pf.get_pickle(pickle_path)
+def load_best_moves(input_params):
+	"""Returns saved set of moves obtained by 'training' particle, converting
+	moves pickled by older versions to a move file first"""
+	move_file_path = mf.get_best_moves_path(input_params)
+	pickle_path = mf.get_pickle_path(input_params)
+	if not os.path.isfile(move_file_path) and os.path.isfile(pickle_path):
+		mf.convert_pickle(pickle_path, input_params['movement_step'], move_file_path)
+		print('Converted {} to {}.'.format(pickle_path, move_file_path))
+	if os.path.isfile(move_file_path):
+		header, best_moves = mf.load_move_file(move_file_path)
 	else:
 		raise Exception(
-			"""run_best_moves error: specified pickle path does not exist. No training
+			"""load_best_moves error: specified move file does not exist. No training
 			has been performed for particle {} on track {}.""".format(
 				input_params['particle_size'], input_params['track_num']))
+	if header['movement_step'] != input_params['movement_step']:
+		raise Exception(
+			"""load_best_moves error: moves were trained with movement_step {}, not \
+			{}""".format(
+				header['movement_step'], input_params['movement_step']).replace('\t', ''))
+	return best_moves
+
+
+def run_best_moves(input_params, init_params):
+	"""Runs through saved set of moves obtained by 'training' particle; it is
+	expected that these moves lead to victory"""
+	best_moves = load_best_moves(input_params)
 	generation_data = gr.run_one_generation(
 		input_params, init_params, [[best_moves, 0, 0, 0]], [0], False)
+	if input_params['fitness_tiebreak'] == 'steps':
+		corr_time_text = '{} steps'.format(generation_data[0][2])
+	else:
+		corr_time_text = 'a time of {} seconds'.format(generation_data[0][2])
 	print(
 		"""Saved set of moves for particle {} on track {} achieved victory \
-		in a time of {} seconds.""".format(
+		in {}.""".format(
 			input_params['particle_size'], input_params['track_num'],
-			generation_data[0][2]).replace('\t', ''))
+			corr_time_text).replace('\t', ''))
+
+
+def verify_best_moves(input_params, init_params):
+	"""Replays saved set of moves obtained by 'training' particle headlessly,
+	following only the saved moves, and reports whether they lead to victory"""
+	best_moves = load_best_moves(input_params)
+	result = vf.verify_genomes(input_params, init_params, [best_moves])[0]
+	print(vf.result_to_line(
+		'Saved set of moves for particle {} on track {}'.format(
+			input_params['particle_size'], input_params['track_num']), result))
+	return result
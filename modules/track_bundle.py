@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""Stores everything derived from a track's images and .section file, for one
+particle size, in a single binary bundle, which is memory-mapped on later runs
+so that startup does not need to load images, build masks or parse sections.
+Bundles are keyed by a hash of their source files and the bundle format version,
+and are rebuilt automatically when either changes.
+
+Bundle layout: magic bytes, 4 byte little-endian header length, JSON header,
+then each array's raw bytes at the offset given in the header"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+bundle_version = 1
+magic = b'GATB'
+array_alignment = 64
+
+
+def get_source_paths(track_num, particle_size):
+	"""Returns paths of all files that a bundle is compiled from"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	track_path = parent_path + '/tracks/track_{}/track_{}'.format(
+		track_num, track_num)
+	return [
+		parent_path + '/particles/particle_{}.png'.format(particle_size),
+		track_path + '_full.png',
+		track_path + '_boundary.png',
+		track_path + '_victory_box.png',
+		track_path + '_start_mark.png',
+		track_path + '_sections.section']
+
+
+def get_bundle_path(track_num, particle_size):
+	"""Returns path of bundle for specified track and particle size"""
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	return (
+		parent_path + '/tracks/track_{}/cache/track_bundle_particle_{}.bin'.format(
+			track_num, particle_size))
+
+
+def get_source_key(track_num, particle_size):
+	"""Returns hash of bundle_version and contents of source files; a missing
+	.section file is hashed as missing"""
+	key = hashlib.sha1('version {}'.format(bundle_version).encode())
+	for path in get_source_paths(track_num, particle_size):
+		key.update(os.path.basename(path).encode())
+		if os.path.isfile(path):
+			with open(path, 'rb') as f:
+				key.update(f.read())
+		else:
+			key.update(b'missing')
+	return key.hexdigest()
+
+
+def write_bundle(track_num, particle_size, track_data, arrays):
+	"""Writes bundle of track_data (JSON serialisable values) and arrays, keyed by
+	current source files"""
+	header = dict(track_data)
+	header['version'] = bundle_version
+	header['key'] = get_source_key(track_num, particle_size)
+	header['arrays'] = {}
+	offset = 0
+	for name, array in arrays.items():
+		header['arrays'][name] = {
+			'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+		offset += -(-array.nbytes // array_alignment) * array_alignment
+	# header is padded with space for array offsets, which are then moved to
+	# start after the header
+	header_length = len(json.dumps(header)) + 256
+	data_start = -(-(len(magic) + 4 + header_length) // array_alignment) * (
+		array_alignment)
+	for name in arrays:
+		header['arrays'][name]['offset'] += data_start
+	header_bytes = json.dumps(header).encode().ljust(
+		data_start - len(magic) - 4)
+
+	bundle_path = get_bundle_path(track_num, particle_size)
+	os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+	# written to temporary file first, so an interrupted write is never loaded
+	temporary_path = bundle_path + '.tmp'
+	with open(temporary_path, 'wb') as f:
+		f.write(magic)
+		f.write(len(header_bytes).to_bytes(4, 'little'))
+		f.write(header_bytes)
+		for name, array in arrays.items():
+			f.seek(header['arrays'][name]['offset'])
+			f.write(np.ascontiguousarray(array).tobytes())
+	os.replace(temporary_path, bundle_path)
+
+
+def read_header(bundle_path):
+	"""Returns JSON header of bundle, or None if file is not a bundle"""
+	with open(bundle_path, 'rb') as f:
+		if f.read(len(magic)) != magic:
+			return None
+		header_length = int.from_bytes(f.read(4), 'little')
+		return json.loads(f.read(header_length).decode())
+
+
+def get_current_header(track_num, particle_size):
+	"""Returns header of bundle for specified track and particle size, or None if
+	it is missing or stale (compiled from different source files or by a
+	different bundle_version)"""
+	bundle_path = get_bundle_path(track_num, particle_size)
+	if not os.path.isfile(bundle_path):
+		return None
+	header = read_header(bundle_path)
+	if header is None or header['version'] != bundle_version or (
+		header['key'] != get_source_key(track_num, particle_size)):
+		return None
+	return header
+
+
+def load_bundle(track_num, particle_size, header):
+	"""Returns memory-mapped arrays of bundle with specified header"""
+	bundle_path = get_bundle_path(track_num, particle_size)
+	arrays = {}
+	for name, spec in header['arrays'].items():
+		arrays[name] = np.memmap(
+			bundle_path, dtype=np.dtype(spec['dtype']), mode='r',
+			offset=spec['offset'], shape=tuple(spec['shape']))
+	return arrays
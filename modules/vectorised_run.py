@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+
+"""Alternative to the Particle based loop in generation_run, which holds the
+state of the whole population in NumPy arrays and advances every live particle
+in each step with array operations. It is always headless, and produces the same
+(moves, distance_score, time) results as generation_run.evaluate_performance"""
+
+import time
+import random
+import numpy as np
+import modules.distance_handling as dh
+import modules.genome as g
+import modules.generation_run as gr
+
+
+def genomes_to_matrix(genomes):
+	"""Converts list of genomes into a matrix of move codes, padded to the
+	length of the longest genome, and an array of genome lengths"""
+	lengths = np.array([len(genome) for genome in genomes], dtype=np.int64)
+	genome_matrix = np.zeros(
+		(len(genomes), max(lengths.max(initial=0), 1)), dtype=np.uint8)
+	for i, genome in enumerate(genomes):
+		genome_matrix[i, :len(genome)] = g.to_array(genome)
+	return genome_matrix, lengths
+
+
+def bitmap_lookup(bitmap, particle_width, particle_height, xs, ys):
+	"""Vectorised form of generation_run.bitmap_collision_check, for arrays of
+	x and y coordinates"""
+	i = xs + particle_width - 1
+	j = ys + particle_height - 1
+	in_range = (
+		(i >= 0) & (i < bitmap.shape[0]) & (j >= 0) & (j < bitmap.shape[1]))
+	collided = np.zeros(len(xs), dtype=bool)
+	collided[in_range] = bitmap[i[in_range], j[in_range]]
+	return collided
+
+
+def get_score_deltas(
+	sections, section_index, xs, ys, prev_xs, prev_ys, profiler=None):
+	"""Vectorised form of distance_handling.update_distance_score, returning
+	change in score for each particle moving from previous to current point.
+	Crossings between sections are counted by profiler, if given"""
+	prev_indices = section_index.get_indices(prev_xs, prev_ys)
+	current_indices = section_index.get_indices(xs, ys)
+	delta_xs = xs - prev_xs
+	delta_ys = ys - prev_ys
+	score_deltas = (
+		delta_xs * section_index.x_rewards[current_indices] +
+		delta_ys * section_index.y_rewards[current_indices])
+	# moves crossing between sections are scored by intersecting them with the
+	# sections
+	crossed = np.flatnonzero(prev_indices != current_indices)
+	if profiler is not None:
+		profiler.count('boundary_crossings', len(crossed))
+	if len(crossed) > 0:
+		score_deltas[crossed] = dh.get_axis_move_scores(
+			sections, xs[crossed], ys[crossed], prev_xs[crossed], prev_ys[crossed],
+			section_index)
+	return score_deltas
+
+
+def get_random_moves(seed, particle_indices, counter, num_of_moves):
+	"""Returns a random move index for each particle at step counter. Each move
+	depends only on seed, particle index and counter (it is a hash of them), such
+	that a particle makes the same random moves however the population is split
+	between processes"""
+	offset = (seed + counter * 0xD1B54A32D192ED03) % 2**64
+	z = np.uint64(offset) + (
+		particle_indices.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+	# splitmix64 finaliser
+	z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+	z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+	z = z ^ (z >> np.uint64(31))
+	return (z % np.uint64(num_of_moves)).astype(np.uint8)
+
+
+class Trajectories:
+	"""Position and distance score after each step of particles, up to the step
+	at which they reached their best distance score, stored by the moves they
+	returned, along with whether they reached victory. Used to resume children of
+	these particles from the step at which their moves first differ"""
+
+	def __init__(self):
+		self.particles = {}
+
+	def add(self, moves, xs, ys, scores, victorious):
+		"""Stores trajectory of particle that returned moves"""
+		self.particles.setdefault(bytes(moves), (xs, ys, scores, victorious))
+
+	def get(self, moves):
+		"""Returns (xs, ys, scores, victorious) of particle that returned moves,
+		or None"""
+		return self.particles.get(bytes(moves))
+
+	def carry_over(self, previous_trajectories, moves):
+		"""Copies trajectory for moves from previous_trajectories, if it exists,
+		e.g. for a result taken from the fitness cache rather than simulated"""
+		if previous_trajectories is not None:
+			trajectory = previous_trajectories.get(moves)
+			if trajectory is not None:
+				self.add(moves, *trajectory)
+
+
+def get_initial_state(num_of_particles, starting_pos):
+	"""Returns state arrays for particles starting from starting_pos at step 0"""
+	return {
+		'start_steps': np.zeros(num_of_particles, dtype=np.int64),
+		'parent_trajectories': [None] * num_of_particles,
+		'finished': np.zeros(num_of_particles, dtype=bool),
+		'xs': np.full(num_of_particles, starting_pos[0], dtype=np.int64),
+		'ys': np.full(num_of_particles, starting_pos[1], dtype=np.int64),
+		'victorious': np.zeros(num_of_particles, dtype=bool),
+		'current_scores': np.zeros(num_of_particles, dtype=np.int64),
+		'best_scores': np.zeros(num_of_particles, dtype=np.int64),
+		'best_steps': np.zeros(num_of_particles, dtype=np.int64),
+		'improved': np.zeros(num_of_particles, dtype=bool)}
+
+
+def get_resumed_state(
+	trajectories, genome_matrix, lengths, parent_genomes, starting_pos):
+	"""Returns state arrays in which each particle starts from the state of its
+	parent just before the first move that differs between their genomes, such
+	that the unchanged prefix of moves does not need to be simulated again. A
+	particle whose parent reached victory using all of its moves, unchanged, is
+	finished before starting"""
+	state = get_initial_state(len(lengths), starting_pos)
+	if trajectories is None:
+		return state
+	children_of_parent = {}
+	for i, parent_genome in enumerate(parent_genomes):
+		children_of_parent.setdefault(bytes(parent_genome), []).append(i)
+	for parent_genome, children in children_of_parent.items():
+		parent_trajectory = trajectories.get(parent_genome)
+		if parent_trajectory is None or len(parent_genome) == 0:
+			continue
+		parent_xs, parent_ys, scores, parent_victorious = parent_trajectory
+		children = np.array(children, dtype=np.int64)
+		parent_length = len(parent_genome)
+		parent_codes = g.to_array(parent_genome)
+		# find first move of each child that differs from parent
+		compare_length = min(parent_length, genome_matrix.shape[1])
+		differs = (
+			genome_matrix[children, :compare_length] != parent_codes[:compare_length])
+		first_changes = np.where(
+			differs.any(axis=1), differs.argmax(axis=1), compare_length)
+		first_changes = np.minimum(first_changes, lengths[children])
+
+		# parent's best distance score and corresponding step, after each step
+		scores = scores.astype(np.int64)
+		previous_best = np.maximum.accumulate(np.concatenate(([0], scores)))
+		improved_steps = np.where(
+			scores > previous_best[:-1], np.arange(parent_length), -1)
+		best_step_record = np.maximum.accumulate(improved_steps)
+
+		if parent_victorious:
+			unchanged = first_changes == parent_length
+			winners = children[unchanged]
+			state['finished'][winners] = True
+			state['victorious'][winners] = True
+			state['best_steps'][winners] = parent_length - 1
+			state['start_steps'][winners] = parent_length
+			for i in winners:
+				state['parent_trajectories'][i] = parent_trajectory
+			children = children[~unchanged]
+			first_changes = first_changes[~unchanged]
+
+		resumed = first_changes > 0
+		children = children[resumed]
+		previous_steps = first_changes[resumed] - 1
+		state['start_steps'][children] = first_changes[resumed]
+		for i in children:
+			state['parent_trajectories'][i] = parent_trajectory
+		state['xs'][children] = parent_xs[previous_steps]
+		state['ys'][children] = parent_ys[previous_steps]
+		state['current_scores'][children] = scores[previous_steps]
+		state['best_scores'][children] = previous_best[previous_steps + 1]
+		state['best_steps'][children] = np.maximum(
+			best_step_record[previous_steps], 0)
+		state['improved'][children] = best_step_record[previous_steps] >= 0
+	return state
+
+
+def run_population(
+	input_params, init_params, genome_matrix, lengths, seed, particle_indices,
+	state, record_trajectories=False, stop_at_genome_end=False):
+	"""Steps all particles, each from its start step in state, until they have
+	collided with track or victory_box, adding random moves once a particle has
+	used all of its genome, or stopping it then if stop_at_genome_end. Returns
+	their performance, an array of whether each result is deterministic
+	(particle collided before needing a random move) and, if
+	record_trajectories, a Trajectories object for the generation. The number of
+	particle steps simulated is added to init_params['particle_steps']"""
+	num_of_particles = len(lengths)
+	possible_moves = init_params['possible_moves']
+	x_changes, y_changes = g.get_direction_tables(input_params['movement_step'])
+	sections = init_params['sections']
+	section_index = init_params['section_index']
+	fitness_tiebreak = input_params['fitness_tiebreak']
+	use_steps = fitness_tiebreak == 'steps'
+	use_distance_field = input_params['fitness_mode'] == 'distance_field'
+	max_x = init_params['display_width'] - init_params['particle_width']
+	max_y = init_params['display_height'] - init_params['particle_height']
+	profiler = init_params.get('profiler')
+	viewer = init_params.get('viewer')
+
+	start_steps = state['start_steps']
+	xs, ys = state['xs'].copy(), state['ys'].copy()
+	alive = ~state['finished']
+	victorious = state['victorious'].copy()
+	current_scores = state['current_scores'].copy()
+	best_scores = state['best_scores'].copy()
+	best_steps = state['best_steps'].copy()
+	# resumed particles are only resumed when using steps, so their time is known
+	best_times = np.where(
+		state['improved'] | victorious, best_steps + 1, 0).astype(
+		np.int64 if use_steps else np.float64)
+	# step at which each particle collided, with finished particles having
+	# collided at the last step of their genome
+	collision_steps = np.where(state['finished'], lengths - 1, -1)
+	moves_made = []  # one array of move indices per step
+	recorded_states = []  # one array of (xs, ys, scores) per step
+	game_exit = False
+	start_time = time.time()
+	particle_steps = 0
+
+	if alive.any():
+		counter = first_counter = int(start_steps[alive].min())
+	else:
+		counter = first_counter = 0
+	while alive.any() and not game_exit:
+		# particles only start moving once their start step is reached
+		live = np.flatnonzero(alive & (start_steps <= counter))
+		if stop_at_genome_end:
+			used_up = counter >= lengths[live]
+			alive[live[used_up]] = False
+			live = live[~used_up]
+		particle_steps += len(live)
+		if profiler is not None:
+			profiler.record_step(len(live))
+			clock = profiler.clock()
+		# choose moves, using random moves once genome has been used up
+		step_moves = np.zeros(num_of_particles, dtype=np.uint8)
+		from_genome = counter < lengths[live]
+		if from_genome.any():
+			step_moves[live[from_genome]] = genome_matrix[live[from_genome], counter]
+		if not from_genome.all():
+			step_moves[live[~from_genome]] = get_random_moves(
+				seed, particle_indices[live[~from_genome]], counter, len(possible_moves))
+		moves_made.append(step_moves)
+
+		prev_xs, prev_ys = xs[live], ys[live]
+		xs[live] = prev_xs + x_changes[step_moves[live]]
+		ys[live] = prev_ys + y_changes[step_moves[live]]
+		if profiler is not None:
+			clock = profiler.lap('simulation.moves', clock)
+		if viewer is not None and viewer.is_due():
+			viewer.publish(xs[live], ys[live])
+
+		# check for collisions with track boundary and victory box
+		hit_track = bitmap_lookup(
+			init_params['track_bitmap'], init_params['particle_width'],
+			init_params['particle_height'], xs[live], ys[live])
+		hit_victory = bitmap_lookup(
+			init_params['victory_box_bitmap'], init_params['particle_width'],
+			init_params['particle_height'], xs[live], ys[live])
+		alive[live[hit_track | hit_victory]] = False
+		collision_steps[live[hit_track | hit_victory]] = counter
+		if hit_victory.any():
+			current_time_elapsed = gr.get_elapsed(
+				counter, start_time, fitness_tiebreak)
+			winners = live[hit_victory]
+			victorious[winners] = True
+			best_steps[winners] = counter
+			best_times[winners] = current_time_elapsed
+		if profiler is not None:
+			clock = profiler.lap('simulation.collision', clock)
+
+		# update distance scores of particles with no collisions
+		survived = ~(hit_track | hit_victory)
+		survivors = live[survived]
+		if len(survivors) > 0:
+			if use_distance_field:
+				current_scores[survivors] = init_params['distance_field'].get_progress(
+					xs[survivors], ys[survivors])
+			else:
+				current_scores[survivors] += get_score_deltas(
+					sections, section_index, xs[survivors], ys[survivors],
+					prev_xs[survived], prev_ys[survived], profiler)
+			improved = survivors[current_scores[survivors] > best_scores[survivors]]
+			if len(improved) > 0:
+				current_time_elapsed = gr.get_elapsed(
+					counter, start_time, fitness_tiebreak)
+				best_scores[improved] = current_scores[improved]
+				best_steps[improved] = counter
+				best_times[improved] = current_time_elapsed
+		if profiler is not None:
+			clock = profiler.lap('simulation.scoring', clock)
+
+		if record_trajectories:
+			recorded_states.append(np.array(
+				(xs, ys, current_scores), dtype=np.int32))
+			if profiler is not None:
+				profiler.lap('simulation.trajectories', clock)
+
+		# check that particles are within bounds of display
+		if (
+			(xs[live] > max_x).any() or (xs[live] < 0).any() or
+			(ys[live] < 0).any() or (ys[live] > max_y).any()):
+			game_exit = True
+			print("particle exceeded bounds of game!")
+
+		counter += 1
+	init_params['particle_steps'] = (
+		init_params.get('particle_steps', 0) + particle_steps)
+
+	# moves of unchanged prefixes (not simulated) are taken from genomes
+	num_of_steps = max(counter, int(start_steps.max(initial=0)))
+	all_moves = np.zeros((num_of_steps, num_of_particles), dtype=np.uint8)
+	all_moves[first_counter: counter] = np.array(
+		moves_made, dtype=np.uint8).reshape(counter - first_counter, num_of_particles)
+	genome_steps = min(num_of_steps, genome_matrix.shape[1])
+	in_genome = np.arange(genome_steps)[:, None] < lengths[None, :]
+	all_moves[:genome_steps][in_genome] = genome_matrix.T[:genome_steps][in_genome]
+
+	# return moves up until furthest distance reached, with distance_score and
+	# time, as in generation_run.evaluate_performance
+	moves_by_particle = np.ascontiguousarray(all_moves.T)
+	return_list = []
+	for i in range(num_of_particles):
+		moves = moves_by_particle[i, 0: best_steps[i] + 1].tobytes()
+		if victorious[i]:
+			distance_score = 10E8
+		else:
+			distance_score = int(best_scores[i])
+		return_list.append((moves, distance_score, best_times[i].item()))
+	deterministic = (collision_steps >= 0) & (collision_steps < lengths)
+
+	if not record_trajectories:
+		return return_list, deterministic, None
+	# states of unchanged prefixes are copied from parents
+	states = np.zeros((num_of_steps, 3, num_of_particles), dtype=np.int32)
+	if counter > first_counter:
+		states[first_counter: counter] = np.array(recorded_states)
+	trajectories = Trajectories()
+	for i in range(num_of_particles):
+		parent_trajectory = state['parent_trajectories'][i]
+		if parent_trajectory is not None:
+			for j in range(3):
+				states[:start_steps[i], j, i] = parent_trajectory[j][:start_steps[i]]
+		trajectories.add(
+			return_list[i][0], states[:best_steps[i] + 1, 0, i].copy(),
+			states[:best_steps[i] + 1, 1, i].copy(),
+			states[:best_steps[i] + 1, 2, i].copy(), victorious[i])
+	return return_list, deterministic, trajectories
+
+
+def get_particle_indices(genomes, particle_indices):
+	"""Returns particle_indices as an array, defaulting to position in genomes"""
+	if particle_indices is None:
+		return np.arange(len(genomes), dtype=np.int64)
+	return np.asarray(particle_indices, dtype=np.int64)
+
+
+def simulate_genomes(
+	input_params, init_params, genomes, seed=None, particle_indices=None,
+	deterministic=None):
+	"""Runs every genome (list of moves) from starting_pos until all particles
+	have collided with track or victory_box, adding random moves once a particle
+	has used all of its genome, and returns their performance. Random moves are
+	derived from seed and each particle's index in the generation, which is its
+	position in genomes unless particle_indices is given. If deterministic list
+	is given, it is extended with whether each result did not depend on random
+	moves"""
+	if seed is None:
+		seed = random.getrandbits(64)
+	genome_matrix, lengths = genomes_to_matrix(genomes)
+	state = get_initial_state(len(genomes), init_params['starting_pos'])
+	return_list, deterministic_results, trajectories = run_population(
+		input_params, init_params, genome_matrix, lengths, seed,
+		get_particle_indices(genomes, particle_indices), state)
+	if deterministic is not None:
+		deterministic += deterministic_results.tolist()
+	return return_list
+
+
+def simulate_children(
+	input_params, init_params, genomes, parent_genomes, seed=None,
+	particle_indices=None, deterministic=None, carried_moves=()):
+	"""As simulate_genomes, but each genome is resumed from the state its parent
+	(the moves it was mutated from) reached just before the first mutated move,
+	using the trajectories of the previous generation stored in
+	init_params['trajectories'], which are then replaced by those of this
+	generation, plus those of carried_moves (results that were not simulated).
+	Only valid when fitness_tiebreak is 'steps', as wall-clock times of the
+	unchanged prefixes are not known"""
+	if seed is None:
+		seed = random.getrandbits(64)
+	previous_trajectories = init_params['trajectories']
+	genome_matrix, lengths = genomes_to_matrix(genomes)
+	state = get_resumed_state(
+		previous_trajectories, genome_matrix, lengths, parent_genomes,
+		init_params['starting_pos'])
+	return_list, deterministic_results, trajectories = run_population(
+		input_params, init_params, genome_matrix, lengths, seed,
+		get_particle_indices(genomes, particle_indices), state,
+		record_trajectories=True)
+	for moves in carried_moves:
+		trajectories.carry_over(previous_trajectories, moves)
+	init_params['trajectories'] = trajectories
+	if deterministic is not None:
+		deterministic += deterministic_results.tolist()
+	return return_list
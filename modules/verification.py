@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""Replays saved best moves headlessly with the vectorised engine, following
+only the saved moves (no random moves are added once they are used up), to check
+that they still reach the victory box on the current track images, e.g. after
+a track or engine change. Move files are grouped by track, particle size and
+movement step, such that each group's track is loaded once, and groups are
+verified by a pool of worker processes. Each move file is loaded and verified
+on its own, so a move file that fails does not affect the others. Run as a
+script to verify every move file in the best_moves folder, converting best
+moves pickled by older versions first, e.g. python -m modules.verification, or
+python -m modules.verification -j 4"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import modules.initialisation as init
+import modules.vectorised_run as vr
+import modules.move_file as mf
+
+
+def get_input_params(
+	track_num, particle_size, movement_step, fitness_mode='sections'):
+	"""Returns input_params needed to replay moves on specified track"""
+	return {
+		'track_num': track_num,
+		'particle_size': particle_size,
+		'movement_step': movement_step,
+		'fitness_tiebreak': 'steps',
+		'fitness_mode': fitness_mode,
+		'headless': True}
+
+
+def get_init_params(input_params):
+	"""Returns init_params needed to replay moves headlessly, loaded from the
+	track bundle"""
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		track_bitmap, victory_box_bitmap, possible_moves, starting_pos,
+		sections) = init.initialise_from_track_bundle(input_params)
+	if input_params['fitness_mode'] == 'sections':
+		section_index = init.initialise_section_index(sections)
+		distance_field = None
+	else:
+		section_index = None
+		distance_field = init.initialise_distance_field(
+			input_params, track_bitmap, victory_box_bitmap, particle_width,
+			particle_height, display_width, display_height, starting_pos)
+	return {
+		'particle_width': particle_width,
+		'particle_height': particle_height,
+		'display_width': display_width,
+		'display_height': display_height,
+		'track_bitmap': track_bitmap,
+		'victory_box_bitmap': victory_box_bitmap,
+		'possible_moves': possible_moves,
+		'starting_pos': starting_pos,
+		'sections': sections,
+		'section_index': section_index,
+		'distance_field': distance_field}
+
+
+def verify_genomes(input_params, init_params, genomes):
+	"""Replays genomes, returning a result for each, with outcome 'victory',
+	'collided' or 'moves used up', the number of steps taken to reach victory or
+	the best distance score, and the best distance score (10E8 for victory)"""
+	input_params = dict(input_params, fitness_tiebreak='steps')
+	genome_matrix, lengths = vr.genomes_to_matrix(genomes)
+	state = vr.get_initial_state(len(genomes), init_params['starting_pos'])
+	return_list, collided, trajectories = vr.run_population(
+		input_params, init_params, genome_matrix, lengths, 0,
+		vr.get_particle_indices(genomes, None), state, stop_at_genome_end=True)
+	results = []
+	for (moves, distance_score, steps), is_collided in zip(
+		return_list, collided.tolist()):
+		if distance_score == 10E8:
+			outcome = 'victory'
+		elif is_collided:
+			outcome = 'collided'
+		else:
+			outcome = 'moves used up'
+		results.append({
+			'outcome': outcome, 'victory': outcome == 'victory', 'steps': steps,
+			'distance_score': distance_score})
+	return results
+
+
+def verify_group(track_num, particle_size, movement_step, paths, fitness_mode):
+	"""Verifies move files of the same track, particle size and movement step,
+	returning a result for each, which is the exception raised if the move file
+	could not be loaded or verified. Runs in a worker process"""
+	input_params = get_input_params(
+		track_num, particle_size, movement_step, fitness_mode)
+	init_params = get_init_params(input_params)
+	results = []
+	for path in paths:
+		try:
+			header, genome = mf.load_move_file(path)
+			result = verify_genomes(input_params, init_params, [genome])[0]
+		except Exception as e:
+			results.append(e)
+			continue
+		# steps stored when moves were saved, which should still be achieved
+		result['saved_steps'] = header['achieved_steps']
+		results.append(result)
+	return results
+
+
+def verify_move_files(paths, num_of_workers=None, fitness_mode='sections'):
+	"""Verifies move files in a pool of num_of_workers processes (by default one
+	per CPU), returning a result for each path in order. Move files that could
+	not be verified, e.g. as their header or track could not be read, have the
+	exception as their result"""
+	groups = {}
+	results = {}
+	for path in paths:
+		try:
+			header = mf.read_header(path)
+		except Exception as e:
+			results[path] = e
+			continue
+		groups.setdefault(
+			(header['track_num'], header['particle_size'], header['movement_step']),
+			[]).append(path)
+	if num_of_workers is None:
+		num_of_workers = os.cpu_count()
+	num_of_workers = max(1, min(num_of_workers, len(groups)))
+	with ProcessPoolExecutor(max_workers=num_of_workers) as pool:
+		futures = {
+			key: pool.submit(verify_group, *key, group_paths, fitness_mode)
+			for key, group_paths in groups.items()}
+		for key, future in futures.items():
+			try:
+				group_results = future.result()
+			except Exception as e:
+				group_results = [e] * len(groups[key])
+			results.update(zip(groups[key], group_results))
+	return [results[path] for path in paths]
+
+
+def result_to_line(path, result):
+	"""Returns one line description of verification of a move file"""
+	if isinstance(result, Exception):
+		return '{}: failed ({})'.format(path, result)
+	if result['victory']:
+		line = '{}: victory in {} steps'.format(path, result['steps'])
+		if result.get('saved_steps') not in (None, result['steps']):
+			line += ' (saved with {} steps)'.format(result['saved_steps'])
+		return line
+	return '{}: no victory ({}), distance of {} pixels in {} steps'.format(
+		path, result['outcome'], result['distance_score'], result['steps'])
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Verify that saved best moves still reach the victory box')
+	parser.add_argument(
+		'paths', nargs='*',
+		help='move files to verify; all files in best_moves folder if none given')
+	parser.add_argument(
+		'-j', '--workers', type=int, default=None,
+		help='number of worker processes; one per CPU if not given')
+	parser.add_argument(
+		'--fitness-mode', default='sections', choices=('sections', 'distance_field'),
+		help='how distance scores of moves without victory are measured')
+	parser.add_argument(
+		'--movement-step', type=int, default=15,
+		help='movement_step that pickled best moves were trained with')
+	args = parser.parse_args()
+
+	paths = args.paths
+	if not paths:
+		# pickles without a move file are converted, so that they are verified too
+		for pickle_path in mf.get_pickle_paths():
+			move_file_path = mf.get_best_moves_folder() + '/' + (
+				os.path.basename(pickle_path)[:-len('.pickle')] + '.moves')
+			if not os.path.isfile(move_file_path):
+				mf.convert_pickle(pickle_path, args.movement_step, move_file_path)
+				print('Converted {} to {}.'.format(pickle_path, move_file_path))
+		# headers are read by verify_move_files, so that a bad file fails alone
+		paths = mf.get_move_file_paths(mf.get_best_moves_folder())
+	results = verify_move_files(paths, args.workers, args.fitness_mode)
+	for path, result in zip(paths, results):
+		print(result_to_line(path, result))
+	if not all(
+		not isinstance(result, Exception) and result['victory']
+		for result in results):
+		raise SystemExit(1)
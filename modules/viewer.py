@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""Live view of headless training, drawn by a separate viewer process so that
+the simulation is never slowed down to display speed. The simulation publishes
+the positions of its particles (one compact array per frame) into a small
+queue, at no more than fps frames per second; frames that the viewer has not
+taken yet are dropped rather than waited for, and the viewer only draws the
+latest frame it has received. Closing the viewer window stops the frames, but
+not the training"""
+
+import os
+import time
+import queue
+import signal
+import multiprocessing
+import numpy as np
+import pygame
+from modules.rendering import Renderer
+
+
+def run_viewer(
+	frames, closed, track_num, particle_size, display_width, display_height, fps):
+	"""Runs in viewer process; draws the latest frame from frames until None is
+	received, or the window is closed, which sets closed"""
+	# Ctrl-C is handled by the trainer, which then closes the viewer
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	parent_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+	pygame.init()
+	game_display = pygame.display.set_mode((display_width, display_height))
+	pygame.display.set_caption('Genetic Algorithm Demo (viewer)')
+	renderer = Renderer(
+		game_display, pygame.image.load(
+			parent_path + '/tracks/track_{}/track_{}_full.png'.format(
+				track_num, track_num)),
+		particle_size)
+	clock = pygame.time.Clock()
+	frame = None
+	while True:
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT:
+				closed.set()
+				pygame.quit()
+				return
+		# older frames waiting in the queue are skipped
+		try:
+			while True:
+				next_frame = frames.get_nowait()
+				if next_frame is None:
+					pygame.quit()
+					return
+				frame = next_frame
+		except queue.Empty:
+			pass
+		if frame is not None:
+			generation, positions = frame
+			pygame.display.set_caption(
+				'Genetic Algorithm Demo (viewer), generation {}'.format(generation))
+			renderer.draw(positions[0], positions[1])
+			frame = None
+		clock.tick(fps)
+
+
+class Viewer:
+	"""Starts viewer process, and publishes frames of the simulation to it"""
+
+	def __init__(
+		self, track_num, particle_size, display_width, display_height, fps=60,
+		max_frames=2):
+		self.frames = multiprocessing.Queue(max_frames)
+		self.closed = multiprocessing.Event()
+		self.frame_interval = 1 / fps
+		self.last_frame_time = 0
+		self.generation = 0
+		self.frames_dropped = 0
+		self.process = multiprocessing.Process(
+			target=run_viewer, args=(
+				self.frames, self.closed, track_num, particle_size, display_width,
+				display_height, fps),
+			daemon=True)
+		self.process.start()
+
+	def start_generation(self, generation):
+		"""Sets generation shown with following frames"""
+		self.generation = generation
+
+	def is_due(self):
+		"""Checks if a frame should be published now, so that positions are only
+		gathered when they will be sent"""
+		return time.perf_counter() - self.last_frame_time >= self.frame_interval
+
+	def publish(self, xs, ys):
+		"""Sends positions of particles to viewer, unless it has been closed, or
+		dropping them if the viewer has fallen behind"""
+		self.last_frame_time = time.perf_counter()
+		if self.closed.is_set():
+			return
+		try:
+			self.frames.put_nowait(
+				(self.generation, np.array((xs, ys), dtype=np.int32)))
+		except queue.Full:
+			self.frames_dropped += 1
+
+	def close(self):
+		"""Stops viewer process, waiting briefly for it to close its window"""
+		# frames still queued are discarded, rather than blocking exit
+		self.frames.cancel_join_thread()
+		if not self.closed.is_set():
+			try:
+				self.frames.put(None, timeout=1)
+			except queue.Full:
+				pass
+		self.process.join(timeout=5)
+		if self.process.is_alive():
+			self.process.terminate()
+			self.process.join()
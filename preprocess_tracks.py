@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+"""Prepares every track in the tracks folder for training, by counting the
+colours of its image, finding its start mark, creating its .section file and
+compiling its track bundles, with tracks processed in parallel by a pool of
+worker processes. Tracks whose input images have not changed since they were
+last preprocessed are skipped. Run as a script, e.g. python preprocess_tracks.py,
+or python preprocess_tracks.py 0 1 --particle-sizes 15"""
+
+import os
+import re
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import modules.initialisation as init
+import modules.colour_store as cs
+import modules.colour_tester as ct
+import modules.track_bundle as tb
+import section_creator as sc
+
+# increment when preprocessing changes, so all tracks are preprocessed again
+preprocessing_version = 1
+
+
+def get_parent_path():
+	"""Returns path of repository root"""
+	return os.path.dirname(os.path.abspath(__file__))
+
+
+def discover_tracks():
+	"""Returns track_nums of all track_{track_num} folders with a full track
+	image, in numerical order"""
+	tracks_path = get_parent_path() + '/tracks'
+	track_nums = []
+	for name in os.listdir(tracks_path):
+		match = re.fullmatch(r'track_(\w+)', name)
+		if match and os.path.isfile(
+			tracks_path + '/{}/{}_full.png'.format(name, name)):
+			track_nums.append(match.group(1))
+	return sorted(
+		track_nums, key=lambda n: (not n.isdigit(), int(n) if n.isdigit() else n))
+
+
+def discover_particle_sizes():
+	"""Returns sizes of all particle images, in ascending order"""
+	sizes = []
+	for name in os.listdir(get_parent_path() + '/particles'):
+		match = re.fullmatch(r'particle_(\d+)\.png', name)
+		if match:
+			sizes.append(match.group(1))
+	return sorted(sizes, key=int)
+
+
+def get_manifest_path(track_num):
+	"""Returns path of record of last preprocessing of specified track"""
+	return get_parent_path() + '/tracks/track_{}/cache/preprocessing.json'.format(
+		track_num)
+
+
+def get_section_path(track_num):
+	"""Returns path of .section file of specified track"""
+	return get_parent_path() + '/tracks/track_{}/track_{}_sections.section'.format(
+		track_num, track_num)
+
+
+def get_inputs_key(track_num, particle_sizes):
+	"""Returns hash of preprocessing_version, particle_sizes and the images that
+	track is preprocessed from; the .section file is not included, as it is
+	created by preprocessing"""
+	key = hashlib.sha1('version {} particle sizes {}'.format(
+		preprocessing_version, sorted(particle_sizes, key=int)).encode())
+	track_path = get_parent_path() + '/tracks/track_{}/track_{}'.format(
+		track_num, track_num)
+	paths = [
+		track_path + suffix for suffix in (
+			'_full.png', '_boundary.png', '_victory_box.png', '_start_mark.png')] + [
+		get_parent_path() + '/particles/particle_{}.png'.format(size)
+		for size in particle_sizes]
+	for path in paths:
+		key.update(os.path.basename(path).encode())
+		with open(path, 'rb') as f:
+			key.update(f.read())
+	return key.hexdigest()
+
+
+def is_up_to_date(track_num, particle_sizes, inputs_key):
+	"""Checks if track was last preprocessed from the same inputs, and that its
+	.section file and track bundles still exist and are current"""
+	manifest_path = get_manifest_path(track_num)
+	if not os.path.isfile(manifest_path):
+		return False
+	with open(manifest_path) as f:
+		manifest = json.load(f)
+	if manifest.get('inputs_key') != inputs_key:
+		return False
+	if not os.path.isfile(get_section_path(track_num)):
+		return False
+	return all(
+		tb.get_current_header(track_num, size) is not None
+		for size in particle_sizes)
+
+
+def write_sections_if_changed(track_num, sections):
+	"""Writes sections to track's .section file, unless it already contains
+	them, so that track bundles compiled from it are not made stale. Returns
+	True if file was written"""
+	section_path = get_section_path(track_num)
+	lines = sc.sections_to_lines(sections)
+	if os.path.isfile(section_path):
+		with open(section_path) as f:
+			if f.readlines() == lines:
+				return False
+	sc.write_sections_to_file(track_num, sections)
+	return True
+
+
+def preprocess_track(track_num, particle_sizes, force=False):
+	"""Preprocesses one track, unless it is up to date and force is False,
+	returning a summary of what was done. Runs in a worker process"""
+	summary = {'track_num': track_num, 'skipped': False}
+	inputs_key = get_inputs_key(track_num, particle_sizes)
+	if not force and is_up_to_date(track_num, particle_sizes, inputs_key):
+		summary['skipped'] = True
+		return summary
+
+	colour_counts = ct.get_track_colour_counts(track_num)
+	starting_pos = init.get_starting_pos(track_num, cs.green, get_parent_path())
+	sections = sc.create_sections(track_num)
+	summary['sections_written'] = write_sections_if_changed(track_num, sections)
+	summary['bundles_compiled'] = []
+	for size in particle_sizes:
+		if force or tb.get_current_header(track_num, size) is None:
+			init.compile_track(track_num, size)
+			summary['bundles_compiled'].append(size)
+
+	manifest = {
+		'inputs_key': inputs_key,
+		'particle_sizes': list(particle_sizes),
+		'starting_pos': list(starting_pos),
+		'num_of_sections': len(sections),
+		# json keys must be strings, so colours are stored as [colour, count] pairs
+		'colour_counts': [
+			[list(colour), count] for colour, count in colour_counts.items()]}
+	manifest_path = get_manifest_path(track_num)
+	os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+	# written to temporary file first, so an interrupted write is never loaded
+	temporary_path = manifest_path + '.tmp'
+	with open(temporary_path, 'w') as f:
+		json.dump(manifest, f)
+	os.replace(temporary_path, manifest_path)
+	summary.update(
+		{key: manifest[key] for key in ('starting_pos', 'num_of_sections')})
+	return summary
+
+
+def preprocess_tracks(
+	track_nums=None, particle_sizes=None, num_of_workers=None, force=False):
+	"""Preprocesses tracks (by default all tracks) in a pool of num_of_workers
+	processes (by default one per CPU), returning a summary of each track in the
+	order of track_nums. A track that fails has its exception as its summary,
+	and is preprocessed again on the next run"""
+	if track_nums is None:
+		track_nums = discover_tracks()
+	if particle_sizes is None:
+		particle_sizes = discover_particle_sizes()
+	if num_of_workers is None:
+		num_of_workers = os.cpu_count()
+	num_of_workers = max(1, min(num_of_workers, len(track_nums)))
+	summaries = []
+	with ProcessPoolExecutor(max_workers=num_of_workers) as pool:
+		futures = [
+			pool.submit(preprocess_track, track_num, particle_sizes, force)
+			for track_num in track_nums]
+		for future in futures:
+			try:
+				summaries.append(future.result())
+			except Exception as e:
+				summaries.append(e)
+	return summaries
+
+
+def summary_to_line(track_num, summary):
+	"""Returns one line description of preprocessing of a track"""
+	if isinstance(summary, Exception):
+		return 'track_{}: failed ({})'.format(track_num, summary)
+	if summary['skipped']:
+		return 'track_{}: unchanged, skipped'.format(track_num)
+	return (
+		'track_{}: {} sections{}, starting_pos {}, bundles compiled for particle '
+		'sizes {}'.format(
+			track_num, summary['num_of_sections'],
+			' (.section file written)' if summary['sections_written'] else '',
+			tuple(summary['starting_pos']),
+			', '.join(summary['bundles_compiled']) or 'none'))
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Preprocess tracks in parallel, skipping unchanged tracks')
+	parser.add_argument(
+		'track_nums', nargs='*',
+		help='numbers of tracks to preprocess; all tracks if none are given')
+	parser.add_argument(
+		'--particle-sizes', nargs='+', default=None,
+		help='particle sizes to compile bundles for; all sizes if not given')
+	parser.add_argument(
+		'-j', '--workers', type=int, default=None,
+		help='number of worker processes; one per CPU if not given')
+	parser.add_argument(
+		'--force', action='store_true',
+		help='preprocess tracks even if they are unchanged')
+	args = parser.parse_args()
+
+	track_nums = args.track_nums or discover_tracks()
+	summaries = preprocess_tracks(
+		track_nums, args.particle_sizes, args.workers, args.force)
+	for track_num, summary in zip(track_nums, summaries):
+		print(summary_to_line(track_num, summary))
+	if any(isinstance(summary, Exception) for summary in summaries):
+		raise SystemExit(1)
@@ -1,94 +1,93 @@
 #!/usr/bin/env python3
 
+"""Splits a track into the rectangular sections used for distance scoring, and
+writes them to the track's .section file. Run as a script, e.g.
+python section_creator.py 1, or import and call create_sections"""
+
 import os
+import argparse
 import cv2
-import pygame
+import numpy as np
 import modules.initialisation as init
 import modules.colour_store as cs
 
-track_num = 1
-
-
-def get_track_dimensions(track_num, path):
-	"""Obtain track width and height"""
-	track_img = pygame.image.load(
-		path + '/tracks/track_{}/track_{}_full.png'.format(track_num, track_num))
-	display_width, display_height = (
-		track_img.get_rect().size[0], track_img.get_rect().size[1])
-	return display_width, display_height
 
-
-def get_img_filtered_by_colour(track_num, colour):
-	"""Returns matrix of pixels that represent image, with values of True if
-	pixel matches specified colour, False otherwise"""
-	current_path = os.path.dirname(__file__)
+def get_track_img(track_num):
+	"""Returns full image of track, indexed by [y, x, channel], as loaded by cv2"""
+	current_path = os.path.dirname(os.path.abspath(__file__))
 	img = cv2.imread(
 		current_path + '/tracks/track_{}/track_{}_full.png'.format(
 			track_num, track_num))
-	img_to_list = img.tolist()
-	display_width, display_height = get_track_dimensions(track_num, current_path)
-	track_matrix = (
-		[[False for j in range(display_height)] for i in range(display_width)])
-	# index items by track_matrix[x][y]
-	for i, j in enumerate(img_to_list):
-		for k, l in enumerate(j):
-			if str(colour) in str(tuple(l)):
-				track_matrix[k][i] = True
-	return track_matrix
+	if img is None:
+		raise Exception(
+			"get_track_img error: track {} image not found".format(track_num))
+	return img
+
+
+def get_img_filtered_by_colour(track_num, colour):
+	"""Returns boolean array of pixels that represent image, indexed by [x, y],
+	with values of True if pixel matches specified colour, False otherwise"""
+	return filter_img_by_colour(get_track_img(track_num), colour)
+
+
+def filter_img_by_colour(img, colour):
+	"""Returns boolean array, indexed by [x, y], of pixels in img (indexed by
+	[y, x, channel], as loaded by cv2) that match colour"""
+	# comparing channels separately avoids a full size 3 channel temporary array
+	matches = img[:, :, 0] == colour[0]
+	for channel in range(1, len(colour)):
+		matches &= img[:, :, channel] == colour[channel]
+	return matches.T
 
 
 def validate_point(filtered_track, point):
 	"""Check that point is on track (cs.grey colour)"""
-	if filtered_track[point[0]][point[1]]:
+	if filtered_track[point[0], point[1]]:
 		return point
 	else:
 		return None
 
 
-def get_section_direction(section_bounds):
-	"""From 3/4 section bounds, determine section direction from one remaining
-	None value section bound"""
-	if section_bounds.count(None) > 1:
-		raise Exception('Not all section_bounds identified correctly!')
-	for i, bound in enumerate(section_bounds):
-		if bound is None:
-			return i
+def get_line(bitmap, point, step):
+	"""Returns values of bitmap at point + n * step for n = 1, 2, ... until edge of
+	bitmap, where step is one of add_values"""
+	x, y = point
+	if step == (-1, 0):
+		return bitmap[:x, y][::-1]
+	elif step == (1, 0):
+		return bitmap[x + 1:, y]
+	elif step == (0, -1):
+		return bitmap[x, :y][::-1]
+	return bitmap[x, y + 1:]
+
+
+def get_run_length(line):
+	"""Returns number of consecutive True values at start of line"""
+	first_false = int(np.argmin(line)) if len(line) > 0 else 0
+	if len(line) > 0 and line[first_false]:
+		return len(line)
+	return first_false
 
 
 def get_section_bounds_and_direction(filtered_track, start_pos, add_values):
 	"""Obtain initial 1st 3 section bounds, and direction of section, defined to
 	be the 1 of 4 directions that is furthest from start_pos"""
-	section_bounds = [None for i in range(4)]
-	current_pos = [start_pos for i in range(4)]
 	# 0 index: left path, 1: right path, 2: top path, 3: bottom path
-	bounds_found = 0
-	while bounds_found < 3:
-		next_points = []
-		for i, j in enumerate(current_pos):
-			if current_pos[i] is not None:
-				next_point = (
-					j[0] + add_values[i][0], j[1] + add_values[i][1])
-				validated_point = validate_point(filtered_track, next_point)
-				next_points.append(validated_point)
-				if validated_point is None:
-					section_bounds[i] = current_pos[i]
-					bounds_found += 1
-			else:
-				next_points.append(None)
-		current_pos = next_points
-	direction_index = get_section_direction(section_bounds)
+	run_lengths = [
+		get_run_length(get_line(filtered_track, start_pos, step))
+		for step in add_values]
+	direction_index = run_lengths.index(max(run_lengths))
+	if sorted(run_lengths)[2] == run_lengths[direction_index]:
+		raise Exception(
+			"get_section_bounds_and_direction error: section direction at {} is "
+			"ambiguous".format(start_pos))
+	section_bounds = [(
+		start_pos[0] + run_length * step[0], start_pos[1] + run_length * step[1])
+		for run_length, step in zip(run_lengths, add_values)]
+	section_bounds[direction_index] = None
 	return section_bounds, direction_index
 
 
-def victory_box_present(points, victory_box):
-	"""Checks if point lies in victory_box"""
-	for point in points:
-		if victory_box[point[0]][point[1]]:
-			return True
-	else:
-		return False
-
-
 def get_last_boundary(
 	filtered_track, section_bounds, direction_index, add_values, victory_box):
 	"""Obtain final section bound by moving along the edges, in the direction of
@@ -102,31 +101,41 @@ def get_last_boundary(
 		[section_bounds[0], section_bounds[1]],
 		[section_bounds[0], section_bounds[1]]]
 
-	boundary_there = True
+	step = add_values[direction_index]
 	boundary_crawlers = boundary_crawler_options[direction_index]
-	while boundary_there:
-		next_points = [(
-			point[0] + add_values[direction_index][0], point[1] +
-			add_values[direction_index][1]) for point in boundary_crawlers]
-		if not victory_box_present(next_points, victory_box):
-			look_points = [(
-				point[0] + look_directions[direction_index][i][0],
-				point[1] + look_directions[direction_index][i][1]) for
-				i, point in enumerate(next_points)]
-			for i, lp in enumerate(look_points):
-				if validate_point(filtered_track, lp) is not None:
-					boundary_there = False
-					section_bounds[direction_index] = boundary_crawlers[i]
-					next_section_direction = look_directions[direction_index][i]
-					last_point = lp
-			if boundary_there:
-				boundary_crawlers = next_points
-		else:
-			# hit victory box
-			boundary_there = False
-			section_bounds[direction_index] = boundary_crawlers[0]
-			last_point = None
-			next_section_direction = None
+	# scan along both edges at once, for the first step at which either edge
+	# reaches the victory box, or the track appears beyond either edge
+	victory_lines = [
+		get_line(victory_box, crawler, step) for crawler in boundary_crawlers]
+	look_lines = [get_line(filtered_track, (
+		crawler[0] + look_directions[direction_index][i][0],
+		crawler[1] + look_directions[direction_index][i][1]), step)
+		for i, crawler in enumerate(boundary_crawlers)]
+	length = min(len(line) for line in victory_lines + look_lines)
+	victory_reached = victory_lines[0][:length] | victory_lines[1][:length]
+	stops = np.flatnonzero(
+		victory_reached | look_lines[0][:length] | look_lines[1][:length])
+	if len(stops) == 0:
+		raise Exception(
+			"get_last_boundary error: end of section not found before edge of track")
+	steps_taken = int(stops[0])
+
+	if victory_reached[steps_taken]:
+		crawler_index = 0
+		last_point = None
+		next_section_direction = None
+	else:
+		# edge with track beyond it, preferring second edge if both have
+		crawler_index = 1 if look_lines[1][steps_taken] else 0
+		next_section_direction = look_directions[direction_index][crawler_index]
+		last_point = (
+			boundary_crawlers[crawler_index][0] + (steps_taken + 1) * step[0] +
+			next_section_direction[0],
+			boundary_crawlers[crawler_index][1] + (steps_taken + 1) * step[1] +
+			next_section_direction[1])
+	section_bounds[direction_index] = (
+		boundary_crawlers[crawler_index][0] + steps_taken * step[0],
+		boundary_crawlers[crawler_index][1] + steps_taken * step[1])
 	return section_bounds, next_section_direction, last_point
 
 
@@ -204,23 +213,44 @@ def sections_to_lines(sections):
 	return lines
 
 
-def write_sections_to_file(track_num, sections):
-	"""Take sections and write them to file, in particular format"""
-	current_path = os.path.dirname(__file__)
+def write_sections_to_file(track_num, sections, path=None):
+	"""Take sections and write them to file, in particular format, by default
+	the track's .section file"""
+	if path is None:
+		current_path = os.path.dirname(os.path.abspath(__file__))
+		path = current_path + '/tracks/track_{}/track_{}_sections.section'.format(
+			track_num, track_num)
 	lines = sections_to_lines(sections)
 
-	with open(
-		current_path + '/tracks/track_{}/track_{}_sections.section'.format(
-			track_num, track_num), 'w') as f:
+	with open(path, 'w') as f:
 		for line in lines:
 			f.write(line)
 
 
-filtered_track = get_img_filtered_by_colour(track_num, cs.grey)
-victory_box = get_img_filtered_by_colour(track_num, cs.vb_red)
-starting_pos = init.get_starting_pos(
-	track_num, cs.green, os.path.dirname(__file__))
-
-all_sections = explore_all_sections(filtered_track, starting_pos, victory_box)
-
-write_sections_to_file(track_num, all_sections)
+def create_sections(track_num):
+	"""Returns list of all sections of specified track"""
+	img = get_track_img(track_num)
+	filtered_track = filter_img_by_colour(img, cs.grey)
+	victory_box = filter_img_by_colour(img, cs.vb_red)
+	starting_pos = init.get_starting_pos(
+		track_num, cs.green, os.path.dirname(os.path.abspath(__file__)))
+	return explore_all_sections(filtered_track, starting_pos, victory_box)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Create .section file of a track from its images')
+	parser.add_argument('track_num', help='number of track, e.g. 1')
+	parser.add_argument(
+		'-o', '--output', default=None,
+		help='path to write sections to, instead of the track\'s .section file')
+	parser.add_argument(
+		'--dry-run', action='store_true',
+		help='print sections instead of writing them to file')
+	args = parser.parse_args()
+
+	all_sections = create_sections(args.track_num)
+	if args.dry_run:
+		print(''.join(sections_to_lines(all_sections)), end='')
+	else:
+		write_sections_to_file(args.track_num, all_sections, args.output)
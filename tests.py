@@ -2,6 +2,7 @@
 
 import os
 import copy
+import random
 from time import time
 import modules.pickle_funcs as pf
 from modules.particle import Particle
@@ -10,6 +11,29 @@ import modules.initialisation as init
 import modules.distance_handling as dh
 import modules.generation_run as gr
 import modules.run_modes as rm
+import modules.vectorised_run as vr
+import modules.parallel_run as pr
+import modules.fitness_cache as fc
+import modules.genome as g
+import modules.distance_field as df
+import modules.track_bundle as tb
+import section_creator as sc
+import preprocess_tracks as pt
+import modules.colour_tester as ct
+import track_generator as tg
+import benchmarks.suite as bs
+from modules.profiler import Profiler
+import modules.metrics as mt
+import modules.checkpoint as ck
+import modules.move_file as mf
+import modules.verification as vf
+from modules.viewer import Viewer
+from modules.rendering import Renderer
+import modules.rendering as rd
+import pygame
+import json
+import shutil
+import numpy as np
 
 # Begin tests on pickle_funcs module
 
@@ -24,6 +48,93 @@ def pickle_funcs_tests():
 	if retrieved_obj != pickle_obj:
 		print('pickle_funcs error: original object and pickled object do not match.')
 	os.remove(pickle_path)
+	# moves pickled as a list of move strings are loaded as a genome
+	pf.pickle_me(pickle_path, ['up', 'right', 'left'])
+	if pf.get_moves_pickle(pickle_path) != bytes([g.UP, g.RIGHT, g.LEFT]):
+		print('pickle_funcs error: old format moves pickle not converted to genome')
+	os.remove(pickle_path)
+
+
+# Begin tests on move_file module
+
+
+def test_pack_moves():
+	rng = random.Random(0)
+	for length in range(10):
+		genome = bytes(rng.choice(g.possible_moves) for i in range(length))
+		packed = mf.pack_moves(genome)
+		if len(packed) != -(-length // 4) or mf.unpack_moves(packed, length) != genome:
+			print('pack_moves error: genome of {} moves not packed correctly'.format(
+				length))
+	if mf.pack_moves(bytes([g.DOWN, g.LEFT, g.RIGHT, g.UP, g.RIGHT])) != bytes(
+		[0b00111001, 0b00000011]):
+		print('pack_moves error: moves not packed in 2 bits, lowest bits first')
+
+
+def test_move_file():
+	move_file_path = 'move_file_test.moves'
+	genome = g.from_names(['right'] * 42 + ['up'] * 30 + ['left'] * 45)
+	mf.write_move_file(move_file_path, genome, 'test', '15', 15, 112)
+	header, loaded_genome = mf.load_move_file(move_file_path)
+	if loaded_genome != genome or header != mf.read_header(move_file_path):
+		print('load_move_file error: moves not loaded correctly')
+	if (
+		header['track_num'] != 'test' or header['particle_size'] != '15' or
+		header['movement_step'] != 15 or header['genome_length'] != 117 or
+		header['achieved_steps'] != 112):
+		print('write_move_file error: header not written correctly')
+	if os.path.getsize(move_file_path) != mf.header_format.size + 30:
+		print('write_move_file error: moves not packed')
+	# corrupted moves are detected by their checksum
+	with open(move_file_path, 'r+b') as f:
+		f.seek(mf.header_format.size)
+		f.write(b'\x00')
+	try:
+		mf.load_move_file(move_file_path)
+		print('load_move_file error: corrupted moves loaded')
+	except Exception:
+		pass
+	os.remove(move_file_path)
+
+
+def test_convert_pickle():
+	pickle_path = 'best_moves_for_particle_15,_track_test.pickle'
+	move_file_path = 'move_file_test.moves'
+	names = ['up', 'right', 'left', 'down', 'up']
+	pf.pickle_me(pickle_path, names)
+	mf.convert_pickle(pickle_path, 15, move_file_path)
+	header, genome = mf.load_move_file(move_file_path)
+	if (
+		genome != g.from_names(names) or header['track_num'] != 'test' or
+		header['particle_size'] != '15' or header['achieved_steps'] is not None):
+		print('convert_pickle error: pickle not converted correctly')
+	os.remove(pickle_path)
+	os.remove(move_file_path)
+
+
+def move_file_tests():
+	# ensures that genomes are packed 4 moves to a byte, and unpacked exactly
+	test_pack_moves()
+	# ensures that move files are written and loaded correctly, and verified
+	test_move_file()
+	# ensures that old best moves pickles are converted into move files
+	test_convert_pickle()
+
+
+# Begin tests on genome module
+
+
+def genome_tests():
+	"""Checks that genomes convert to and from lists of move strings"""
+	names = ['up', 'down', 'left', 'right', 'up']
+	genome = g.from_names(names)
+	if genome != bytes([0, 1, 2, 3, 0]) or g.to_names(genome) != names:
+		print('genome error: move strings converted incorrectly')
+	if g.load(bytearray(genome)) != genome or g.load(names) != genome:
+		print('genome error: load does not return genome')
+	x_changes, y_changes = g.get_direction_tables(5)
+	if x_changes.tolist() != [0, 0, -5, 5] or y_changes.tolist() != [-5, 5, 0, 0]:
+		print('genome error: incorrect direction tables produced')
 
 
 # Begin tests on particle module
@@ -41,6 +152,10 @@ def particle_tests():
 	p.update_position((5, 10))
 	if p.x != 10 or p.y != 15:
 		print("particle error: particle's position is not being updated correctly")
+	# check headless particles skip loading their image
+	p = Particle(particle_size, starting_pos, load_img=False)
+	if p.img is not None:
+		print('particle error: image loaded for headless particle')
 
 
 # Begin tests on initialisation module
@@ -58,7 +173,8 @@ def test_get_starting_pos():
 
 
 def test_initialise_setup():
-	input_params = {'particle_size': 10, 'track_num': 0}
+	input_params = {
+		'particle_size': 10, 'track_num': 0, 'fitness_mode': 'sections'}
 	(
 		track_img, particle_width, particle_height, display_width, display_height,
 		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
@@ -77,6 +193,36 @@ def test_initialise_setup():
 				display_height, display_width).replace('\n', ''))
 
 
+def test_initialise_from_track_bundle():
+	input_params = {
+		'particle_size': 10, 'track_num': 0, 'fitness_mode': 'sections',
+		'headless': True}
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
+		sections) = init.initialise_setup(input_params)
+	track_bitmap, victory_box_bitmap = init.initialise_collision_bitmaps(
+		particle_mask, track_mask, victory_box_mask)
+	# bundle is compiled when it is out of date, and loaded when it is current
+	tb.bundle_version += 1
+	if tb.get_current_header(0, 10) is not None:
+		print('track_bundle error: bundle of old version not identified as stale')
+	tb.bundle_version -= 1
+	for i in range(2):
+		bundle_data = init.initialise_from_track_bundle(input_params)
+		if (
+			bundle_data[1: 5] != (
+				particle_width, particle_height, display_width, display_height) or
+			(bundle_data[5] != track_bitmap).any() or
+			(bundle_data[6] != victory_box_bitmap).any() or
+			bundle_data[8] != starting_pos or
+			[section.top_left_point for section in bundle_data[9]] != [
+				section.top_left_point for section in sections]):
+			print(
+				"""initialise_from_track_bundle error: bundle data does not match data \
+				computed from track files""".replace('\t', ''))
+
+
 def initialisation_tests():
 	"""Tests that initialisation module retrieves starting position correctly and
 	other initial parameters and settings"""
@@ -84,6 +230,8 @@ def initialisation_tests():
 	test_get_starting_pos()
 	# test that initialise_setup function produced correct results
 	test_initialise_setup()
+	# test that track bundle matches initialise_setup and is rebuilt when stale
+	test_initialise_from_track_bundle()
 
 
 # Begin tests on distance_handling module
@@ -169,6 +317,28 @@ def test_get_section(sections):
 				str(e)))
 
 
+def test_section_index(sections):
+	section_index = dh.SectionIndex(sections)
+	indices = section_index.get_indices(
+		np.array([300, 700, 100]), np.array([500, 300, 50]))
+	if indices.tolist() != [0, 1, 2]:
+		print('SectionIndex error: points matched to incorrect sections')
+	# index should agree with scanning every section, including on boundaries
+	for point in [(26, 479), (638, 569), (639, 105), (300, 500), (653, 101)]:
+		if section_index.get_section(point) is not dh.get_section(point, sections):
+			print('SectionIndex error: point {} matched to incorrect section'.format(
+				point))
+	for point in [(10, 10), (-5, 500), (5000, 5000)]:
+		try:
+			section_index.get_indices(np.array([point[0]]), np.array([point[1]]))
+			print("""SectionIndex error: point that was not in a section was \
+				incorrectly matched to a section""".replace('\t', ''))
+		except Exception as e:
+			if str(e)[0: 17] != 'get_section error':
+				print('SectionIndex error: unanticipated exception raised: {}'.format(
+					str(e)))
+
+
 def test_delta_sign_handle():
 	# positive delta case
 	resulting_range = dh.delta_sign_handle(5, 10, 5)
@@ -227,6 +397,36 @@ def test_handle_move_through_boundary(sections):
 			delta_y""".replace('\t', ''))
 
 
+def test_get_axis_move_scores(sections):
+	# matches handle_move_through_boundary for moves between 2 sections
+	prev_points = [(636, 486), (641, 486), (653, 108), (653, 101)]
+	points = [(641, 486), (636, 486), (653, 101), (653, 108)]
+	scores = dh.get_axis_move_scores(
+		sections, np.array([p[0] for p in points]), np.array([p[1] for p in points]),
+		np.array([p[0] for p in prev_points]), np.array([p[1] for p in prev_points]),
+		dh.SectionIndex(sections))
+	if scores.tolist() != [2, -2, 3, -3]:
+		print('get_axis_move_scores error: incorrect scores for 2 sections')
+	# 3 adjacent sections, with x rewards of 1, 0 and 1
+	row_sections = [
+		dh.Section((x, 0), (x + 9, 0), (x, 9), (x + 9, 9), (x // 10 + 1) % 2, 0)
+		for x in (0, 10, 20)]
+	scores = dh.get_axis_move_scores(
+		row_sections, np.array([25, 5]), np.array([5, 5]), np.array([5, 25]),
+		np.array([5, 5]))
+	if scores.tolist() != [9, -9]:
+		print('get_axis_move_scores error: incorrect scores for 3 sections')
+	try:
+		dh.get_axis_move_scores(
+			row_sections, np.array([35]), np.array([5]), np.array([5]), np.array([5]))
+		print("""get_axis_move_scores error: move leaving sections was not \
+			identified""".replace('\t', ''))
+	except Exception as e:
+		if str(e)[0: 17] != 'get_section error':
+			print('get_axis_move_scores error: unanticipated exception raised: {}'.format(
+				str(e)))
+
+
 def test_update_distance_score(sections):
 	p = Particle(10, (5, 5))
 	p.update_position((539, 492))
@@ -251,6 +451,8 @@ def distance_handling_tests():
 	test_section_check(sections)
 	# tests that correct section is matched to certain points
 	test_get_section(sections)
+	# tests that section index matches points to same sections as get_section
+	test_section_index(sections)
 	# tests that delta_sign_handle produces correct range form inputted values
 	test_delta_sign_handle()
 	# tests that separate_by+section_identifier correctly separates points into
@@ -259,6 +461,9 @@ def distance_handling_tests():
 	# tests that handle_move_through_boundary correctly scores particle moving
 	# between 2 sections
 	test_handle_move_through_boundary(sections)
+	# tests that scoring moves by intersecting sections matches per pixel
+	# scoring, and handles moves through more than 2 sections
+	test_get_axis_move_scores(sections)
 	# tests that update_distance_score gives correct score
 	test_update_distance_score(sections)
 
@@ -277,14 +482,39 @@ def test_collision_check(init_params):
 			'collision_check error: collision detected when it should not have been')
 
 
+def test_bitmap_collision_check(init_params):
+	track_rows = gr.get_init_collision_rows(init_params, 'track_bitmap')
+	if not gr.bitmap_collision_check(
+		track_rows, init_params['particle_width'],
+		init_params['particle_height'], 225, 470):
+		print(
+			"""bitmap_collision_check error: collision not detected when it should \
+			have been""".replace('\t', ''))
+	if gr.bitmap_collision_check(
+		track_rows, init_params['particle_width'],
+		init_params['particle_height'], 253, 498):
+		print(
+			"""bitmap_collision_check error: collision detected when it should not \
+			have been""".replace('\t', ''))
+	# bitmap should agree with mask overlap everywhere, including off the track
+	for x, y in [(-25, -25), (0, 0), (32, 60), (110, 100), (790, 590), (900, 50)]:
+		if gr.bitmap_collision_check(
+			track_rows, init_params['particle_width'],
+			init_params['particle_height'], x, y) != gr.collision_check(
+			init_params['track_mask'], init_params['particle_mask'], x, y):
+			print(
+				'bitmap_collision_check error: bitmap and mask disagree at {}'.format(
+					(x, y)))
+
+
 def test_mutate_moves():
-	original_moves = [['up', 'down', 'left', 'right',] for i in range(100)]
+	original_moves = g.from_names(['up', 'down', 'left', 'right'] * 25)
 	input_params = {
 		'mutate_moves_mapping_func_type': 'exp',
 		'mutation_chance_options': [1000],
 		'adaptive_algo': (False, 0, 0, 0)}
 	new_moves = gr.mutate_moves(
-		original_moves, input_params, ['up', 'left', 'right', 'down'], False)
+		original_moves, input_params, g.possible_moves, False)
 	if new_moves == original_moves:
 		print(
 			"""mutate_moves error: resulting list from mutate_moves is same as \
@@ -292,6 +522,38 @@ def test_mutate_moves():
 				'\t', ''))
 
 
+def test_get_mutation_probabilities():
+	probabilities = gr.get_mutation_probabilities(200, 'exp')
+	if abs(probabilities.sum() - 1) > 1E-9 or not (
+		np.diff(probabilities) > 0).all():
+		print(
+			"""get_mutation_probabilities error: probabilities do not sum to 1, or 			are not highest for last moves""".replace('\t', ''))
+
+
+def test_mutate_genomes():
+	original_genomes = [g.from_names(['up', 'down', 'left', 'right'] * 100)] * 50
+	input_params = {
+		'mutate_moves_mapping_func_type': 'exp',
+		'mutation_chance_options': [1000],
+		'adaptive_algo': (True, 0, 0, 0)}
+	new_genomes = gr.mutate_genomes(
+		original_genomes, input_params, g.possible_moves, False, random.Random(1))
+	if new_genomes == original_genomes or [
+		len(genome) for genome in new_genomes] != [400] * 50:
+		print('mutate_genomes error: genomes not mutated, or lengths changed')
+	input_params['mutation_chance_options'] = [0]
+	if gr.mutate_genomes(
+		original_genomes, input_params, g.possible_moves, False) != original_genomes:
+		print('mutate_genomes error: genomes mutated with zero chance of mutation')
+	# adaptive algorithm changes a single move, once victory has been achieved
+	new_genomes = gr.mutate_genomes(
+		original_genomes, input_params, g.possible_moves, True, random.Random(1))
+	for genome in new_genomes:
+		if sum(a != b for a, b in zip(genome, original_genomes[0])) > 1:
+			print('mutate_genomes error: adaptive algorithm changed multiple moves')
+			break
+
+
 def test_some_alive_check():
 	particles = [Particle(10, (5, 5)) for i in range(5)]
 	# test for 1 dead particle
@@ -310,11 +572,11 @@ def test_some_alive_check():
 
 def test_choose_move():
 	p = Particle(10, (5, 5))
-	p.best_moves_mutated = ['left', 'right', 'up']
-	possible_moves = ['right', 'up', 'down', 'left']
+	p.best_moves_mutated = g.from_names(['left', 'right', 'up'])
+	possible_moves = g.possible_moves
 	# picking existing move
 	move = gr.choose_move(1, possible_moves, p)
-	if move != 'right':
+	if move != g.RIGHT:
 		print('choose_move error: picked incorrect move from best_moves_mutated')
 	try:
 		move = gr.choose_move(10, possible_moves, p)
@@ -325,14 +587,14 @@ def test_choose_move():
 
 def test_act_on_move():
 	# changing y coordinate
-	x_change, y_change = gr.act_on_move('up', 5)
+	x_change, y_change = gr.act_on_move(g.UP, 5)
 	if x_change != 0 or y_change != -5:
 		print(
 			"""act_on_move error: wrong moves made. Gave an x_change of {}, a y_change \
 			of {}. Should have produced x_change of 0, y_change of -5""".format(
 				x_change, y_change).replace('\t', ''))
 	# changing x coordinatew
-	x_change, y_change = gr.act_on_move('right', 3)
+	x_change, y_change = gr.act_on_move(g.RIGHT, 3)
 	if x_change != 3 or y_change != 0:
 		print(
 			"""act_on_move error: wrong moves made. Gave an x_change of {}, a y_change \
@@ -382,26 +644,31 @@ def test_check_particle_in_bounds(init_params):
 
 def test_evaluate_performance():
 	p = Particle(20, (50, 50))
-	p.moves_made = ['up', 'right', 'down', 'right', 'left']
+	p.moves_made = bytearray(g.from_names(['up', 'right', 'down', 'right', 'left']))
 	p.distance_time_record = (10, 3, 0.3)
 	return_list = gr.evaluate_performance([p])
 	if (
-		return_list[0][0] != ['up', 'right', 'down', 'right'] or
+		return_list[0][0] != g.from_names(['up', 'right', 'down', 'right']) or
 		return_list[0][1] != 10 or
 		return_list[0][2] != 0.3):
 		print('evaluate_performance error: incorrect return_list returned')
 
 
 def generation_run_tests():
-	input_params = {'particle_size': 20, 'track_num': 0}
+	input_params = {
+		'particle_size': 20, 'track_num': 0, 'fitness_mode': 'sections'}
 	(
 		track_img, particle_width, particle_height, display_width, display_height,
 		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
 		sections) = init.initialise_setup(input_params)
+	track_bitmap, victory_box_bitmap = init.initialise_collision_bitmaps(
+		particle_mask, track_mask, victory_box_mask)
 	init_params = {
 		'track_mask': track_mask,
 		'particle_mask': particle_mask,
 		'victory_box_mask': victory_box_mask,
+		'track_bitmap': track_bitmap,
+		'victory_box_bitmap': victory_box_bitmap,
 		'particle_width': particle_width,
 		'particle_height': particle_height,
 		'display_width': display_width,
@@ -409,8 +676,14 @@ def generation_run_tests():
 	}
 	# tests that collisions are being detected correctly by collision_check
 	test_collision_check(init_params)
+	# tests that precomputed collision bitmap agrees with mask collisions
+	test_bitmap_collision_check(init_params)
 	# tests that mutate moves does indeed change the moves
 	test_mutate_moves()
+	# tests that mutation probabilities are normalised and favour last moves
+	test_get_mutation_probabilities()
+	# tests that batched mutation changes moves as specified
+	test_mutate_genomes()
 	# tests that some_alive_check correctly determines when some particles are
 	# alive, and when all are dead
 	test_some_alive_check()
@@ -426,6 +699,615 @@ def generation_run_tests():
 	test_evaluate_performance()
 
 
+# Begin tests on vectorised_run module
+
+
+def test_genomes_to_matrix():
+	genome_matrix, lengths = vr.genomes_to_matrix(
+		[g.from_names(['up', 'left']), g.from_names(['right'])])
+	if genome_matrix.tolist() != [[0, 2], [3, 0]] or lengths.tolist() != [2, 1]:
+		print('genomes_to_matrix error: incorrect matrix of move indices produced')
+
+
+def test_bitmap_lookup(init_params):
+	xs, ys = np.array([225, 253, -25, 900]), np.array([470, 498, -25, 50])
+	collided = vr.bitmap_lookup(
+		init_params['track_bitmap'], init_params['particle_width'],
+		init_params['particle_height'], xs, ys)
+	if collided.tolist() != [True, False, False, False]:
+		print('bitmap_lookup error: collisions not detected correctly')
+
+
+def test_simulate_genomes(input_params, init_params):
+	# genomes are long enough that no random moves are needed, so results should
+	# match the Particle based engine exactly, apart from times
+	genomes = list(map(g.from_names, [
+		['right'] * 40 + ['up'] * 40, ['up'] * 40,
+		['right'] * 30 + ['down'] * 40, ['left'] * 40]))
+	combined_results = [[genome, 0, 0, 0] for genome in genomes]
+	input_params['engine'] = 'particle'
+	particle_results = gr.run_one_generation(
+		input_params, init_params, combined_results, [0, 1, 2, 3], False)
+	input_params['engine'] = 'vectorised'
+	vectorised_results = gr.run_one_generation(
+		input_params, init_params, combined_results, [0, 1, 2, 3], False)
+	for particle_result, vectorised_result in zip(
+		particle_results, vectorised_results):
+		if particle_result[0: 2] != vectorised_result[0: 2]:
+			print(
+				"""simulate_genomes error: vectorised engine result {} does not match \
+				particle engine result {}""".format(
+					vectorised_result[0: 2], particle_result[0: 2]).replace('\t', ''))
+
+
+def test_get_random_moves():
+	particle_indices = np.arange(1000)
+	moves = vr.get_random_moves(7, particle_indices, 3, 4)
+	if (moves != vr.get_random_moves(7, particle_indices, 3, 4)).any():
+		print('get_random_moves error: random moves are not reproducible')
+	if (moves[500:] != vr.get_random_moves(7, particle_indices[500:], 3, 4)).any():
+		print(
+			'get_random_moves error: random moves depend on how population is split')
+	if sorted(set(moves.tolist())) != [0, 1, 2, 3]:
+		print('get_random_moves error: not all moves are produced')
+
+
+def test_seeded_simulate_genomes(input_params, init_params):
+	genomes = list(map(g.from_names, [['right'] * 3, ['right', 'up']] * 10))
+	results = vr.simulate_genomes(input_params, init_params, genomes, 11)
+	if results != vr.simulate_genomes(input_params, init_params, genomes, 11):
+		print(
+			"""simulate_genomes error: results differ between runs with the same \
+			seed""".replace('\t', ''))
+
+
+def test_simulate_children(input_params, init_params):
+	genomes = list(map(
+		g.from_names, [['right'] * 3, ['right', 'up'], ['right'] * 10, ['up'] * 2] * 2))
+	init_params['trajectories'] = None
+	parent_results = vr.simulate_children(
+		input_params, init_params, genomes, genomes, 3)
+	# children are unchanged, or have a changed move part way through
+	parent_genomes = [result[0] for result in parent_results] * 2
+	genomes = (
+		[result[0] for result in parent_results] +
+		[result[0][0: -2] + bytes([g.DOWN]) * 2 for result in parent_results])
+	resumed_results = vr.simulate_children(
+		input_params, init_params, genomes, parent_genomes, 4)
+	if resumed_results != vr.simulate_genomes(
+		input_params, init_params, genomes, 4):
+		print(
+			"""simulate_children error: resuming from parent state gives different \
+			results to simulating from the start""".replace('\t', ''))
+	# unchanged children of victorious parents need no simulation
+	victorious_genome = vr.simulate_genomes(
+		input_params, init_params,
+		[bytes([g.RIGHT]) * 42 + bytes([g.UP]) * 30 + bytes([g.LEFT]) * 45])[0][0]
+	genomes = [victorious_genome] * 2
+	vr.simulate_children(input_params, init_params, genomes, genomes, 5)
+	if vr.simulate_children(
+		input_params, init_params, genomes, genomes, 6) != (
+		vr.simulate_genomes(input_params, init_params, genomes, 6)):
+		print(
+			"""simulate_children error: unchanged children of victorious parents give \
+			different results to simulating from the start""".replace('\t', ''))
+
+
+def vectorised_run_tests():
+	input_params = {
+		'particle_size': 15, 'track_num': 0, 'num_of_particles_per_generation': 4,
+		'movement_step': 15, 'mutation_chance_options': [0],
+		'mutate_moves_mapping_func_type': 'exp',
+		'adaptive_algo': [False, 0, 0, 0], 'headless': True,
+		'fitness_tiebreak': 'steps', 'reuse_parent_prefix': False,
+		'fitness_mode': 'sections'}
+	(
+		track_img, particle_width, particle_height, display_width, display_height,
+		particle_mask, track_mask, victory_box_mask, possible_moves, starting_pos,
+		sections) = init.initialise_setup(input_params)
+	track_bitmap, victory_box_bitmap = init.initialise_collision_bitmaps(
+		particle_mask, track_mask, victory_box_mask)
+	init_params = {
+		'particle_width': particle_width,
+		'particle_height': particle_height,
+		'display_width': display_width,
+		'display_height': display_height,
+		'track_bitmap': track_bitmap,
+		'victory_box_bitmap': victory_box_bitmap,
+		'possible_moves': possible_moves,
+		'starting_pos': starting_pos,
+		'sections': sections,
+		'section_index': dh.SectionIndex(sections),
+		'distance_field': init.initialise_distance_field(
+			input_params, track_bitmap, victory_box_bitmap, particle_width,
+			particle_height, display_width, display_height, starting_pos),
+		'rng': random.Random(0)}
+	# tests that genomes are converted to a matrix of move codes correctly
+	test_genomes_to_matrix()
+	# tests that vectorised collision lookups match bitmap_collision_check
+	test_bitmap_lookup(init_params)
+	# tests that vectorised engine matches Particle based engine
+	test_simulate_genomes(input_params, init_params)
+	# tests that random moves are reproducible and independent of sharding
+	test_get_random_moves()
+	# tests that simulation is reproducible for a given seed
+	test_seeded_simulate_genomes(input_params, init_params)
+	# tests that resuming children from parent states matches full simulation
+	test_simulate_children(input_params, init_params)
+	return input_params, init_params
+
+
+# Begin tests on distance_field module
+
+
+def test_compute_distances():
+	# wall along x = 2, except at y = 4, with goal at top-left corner
+	passable = np.ones((5, 5), dtype=bool)
+	passable[2, 0: 4] = False
+	goal = np.zeros((5, 5), dtype=bool)
+	goal[0, 0] = True
+	distances = df.compute_distances(passable, goal)
+	if distances[0, 0] != 0 or distances[1, 3] != 4 or distances[3, 0] != 11:
+		print('compute_distances error: incorrect distances along shortest path')
+	if distances[2, 0] != -1:
+		print('compute_distances error: distance given for impassable position')
+
+
+def test_get_distances(input_params, init_params):
+	passable, goal = df.get_passable_and_goal(
+		init_params['track_bitmap'], init_params['victory_box_bitmap'],
+		init_params['particle_width'], init_params['particle_height'],
+		init_params['display_width'], init_params['display_height'])
+	# distances are cached by initialise_distance_field in vectorised_run_tests
+	if not os.path.isfile(
+		df.get_cache_path(input_params['track_num'], input_params['particle_size'])):
+		print('get_distances error: distances not cached')
+	if (df.get_distances(
+		input_params['track_num'], input_params['particle_size'], passable,
+		goal) != df.compute_distances(passable, goal)).any():
+		print('get_distances error: cached distances do not match computed distances')
+
+
+def test_distance_field_engines(input_params, init_params):
+	# particles score more the closer they get to the victory box, with the same
+	# results from both engines
+	genomes = list(map(g.from_names, [
+		['right'] * 40 + ['up'] * 40, ['up'] * 40, ['left'] * 40]))
+	combined_results = [[genome, 0, 0, 0] for genome in genomes]
+	input_params['fitness_mode'] = 'distance_field'
+	input_params['engine'] = 'particle'
+	particle_results = gr.run_one_generation(
+		input_params, init_params, combined_results, [0, 1, 2], False)
+	input_params['engine'] = 'vectorised'
+	vectorised_results = gr.run_one_generation(
+		input_params, init_params, combined_results, [0, 1, 2], False)
+	input_params['fitness_mode'] = 'sections'
+	if particle_results != vectorised_results:
+		print(
+			"""distance_field error: vectorised engine results do not match particle \
+			engine results""".replace('\t', ''))
+	if particle_results[0][1] <= 0:
+		print('distance_field error: progress towards victory box not scored')
+
+
+def distance_field_tests(input_params, init_params):
+	# tests that distances follow shortest path around impassable positions
+	test_compute_distances()
+	# tests that distances are cached and reloaded correctly
+	test_get_distances(input_params, init_params)
+	# tests that both engines score particles by distance field
+	test_distance_field_engines(input_params, init_params)
+
+
+# Begin tests on parallel_run module
+
+
+def test_split_into_shards():
+	shards = pr.split_into_shards(list(range(10)), 4)
+	if shards != [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]:
+		print('split_into_shards error: genomes split incorrectly')
+	if pr.split_into_shards([1, 2], 4) != [[1], [2]]:
+		print('split_into_shards error: empty shards produced')
+
+
+def test_parallel_simulate_genomes(input_params, init_params):
+	# short genomes, so that random moves are needed
+	genomes = list(map(
+		g.from_names, [['right'] * 2, ['right'] * 4, [], ['right', 'up'], ['right'] * 6]))
+	input_params['num_of_workers'] = 2
+	init_params['particle_steps'] = 0
+	parallel_results = pr.simulate_genomes(input_params, init_params, genomes, 5)
+	pr.shutdown_pool()
+	parallel_steps = init_params['particle_steps']
+	init_params['particle_steps'] = 0
+	vectorised_results = vr.simulate_genomes(
+		input_params, init_params, genomes, 5)
+	if parallel_results != vectorised_results:
+		print(
+			"""parallel simulate_genomes error: results do not match vectorised engine \
+			results""".replace('\t', ''))
+	if parallel_steps != init_params['particle_steps']:
+		print('parallel simulate_genomes error: particle steps of workers not added')
+
+
+def test_parallel_simulate_genomes_tracks():
+	genomes = list(map(
+		g.from_names, [['right'] * 20, ['up'] * 20, ['right'] * 42 + ['up'] * 30]))
+	for track_num in ('0', '1'):
+		input_params = dict(
+			vf.get_input_params(track_num, '15', 15), num_of_workers=2)
+		init_params = vf.get_init_params(input_params)
+		# pool created for previous track is not reused
+		parallel_results = pr.simulate_genomes(input_params, init_params, genomes, 5)
+		if parallel_results != vr.simulate_genomes(
+			input_params, init_params, genomes, 5):
+			print(
+				'parallel simulate_genomes error: results on track {} do not match '
+				'vectorised engine results'.format(track_num))
+	pr.shutdown_pool()
+
+
+def parallel_run_tests(input_params, init_params):
+	# tests that genomes are split into near equal shards, in order
+	test_split_into_shards()
+	# tests that parallel evaluation gives same results as serial evaluation
+	test_parallel_simulate_genomes(input_params, init_params)
+	# tests that workers are recreated for another track
+	test_parallel_simulate_genomes_tracks()
+
+
+# Begin tests on fitness_cache module
+
+
+def test_fitness_cache():
+	cache = fc.FitnessCache(2)
+	up, down, left = bytes([g.UP]), bytes([g.DOWN]), bytes([g.LEFT])
+	cache.add(up, (up, 10, 1))
+	cache.add(down, (down, 20, 1))
+	if cache.get(up) != (up, 10, 1):
+		print('FitnessCache error: stored result not returned')
+	# down is now least recently used, so is removed
+	cache.add(left, (left, 30, 1))
+	if cache.get(down) is not None or cache.get(up) is None:
+		print('FitnessCache error: least recently used result not removed')
+	if cache.get_hit_rate() != 66.7:
+		print('FitnessCache error: incorrect hit rate calculated')
+
+
+def test_cached_run_one_generation(input_params, init_params):
+	# long genomes collide before using random moves, so are cached; short
+	# genomes are not
+	genomes = list(map(g.from_names, [
+		['right'] * 40 + ['up'] * 40, ['right'] * 2, ['right'] * 30 +
+		['down'] * 40, []] * 2))
+	combined_results = [[genome, 0, 0, 0] for genome in genomes]
+	input_params['engine'] = 'vectorised'
+	init_params['trajectories'] = None
+	fitness_cache = fc.FitnessCache(100)
+	all_results = []
+	for cache in (None, fitness_cache):
+		init_params['fitness_cache'] = cache
+		init_params['rng'] = random.Random(2)
+		all_results.append([gr.run_one_generation(
+			input_params, init_params, combined_results, list(range(8)), False)
+			for i in range(2)])
+	init_params['fitness_cache'] = None
+	if all_results[0] != all_results[1]:
+		print(
+			"""run_one_generation error: cached results differ from simulated 			results""".replace('	', ''))
+	if fitness_cache.get_hit_rate() != 50:
+		print('run_one_generation error: deterministic results not cached')
+
+
+def fitness_cache_tests(input_params, init_params):
+	# tests that least recently used results are removed when cache is full
+	test_fitness_cache()
+	# tests that cached results match simulated results
+	test_cached_run_one_generation(input_params, init_params)
+
+
+# Begin tests on profiler module
+
+
+def test_profiler():
+	output_path = 'profile_test.jsonl'
+	profiler = Profiler(output_path)
+	clock = profiler.clock()
+	clock = profiler.lap('phase', clock)
+	profiler.lap('phase', clock)
+	profiler.count('events', 2)
+	profiler.record_step(3)
+	profiler.record_step(1)
+	profiler.end_generation(0)
+	profiler.end_generation(1)
+	with open(output_path) as f:
+		summaries = [json.loads(line) for line in f]
+	os.remove(output_path)
+	if (
+		len(summaries) != 2 or summaries[0]['counts'] != {
+			'events': 2, 'steps': 2, 'particle_steps': 4} or
+		summaries[0]['alive_per_step'] != [3, 1] or
+		summaries[1]['counts'] != {} or 'phase' not in summaries[0]['times']):
+		print('Profiler error: generation summaries not recorded correctly')
+	if 'phase' not in profiler.get_table():
+		print('Profiler error: phases missing from table')
+
+
+def test_profiled_run_one_generation(input_params, init_params):
+	genomes = list(map(g.from_names, [
+		['right'] * 43 + ['up'] * 40, ['right'] * 30 + ['down'] * 40] * 2))
+	combined_results = [[genome, 0, 0, 0] for genome in genomes]
+	for engine in ('particle', 'vectorised'):
+		input_params['engine'] = engine
+		all_results = []
+		for profiler in (None, Profiler()):
+			init_params['profiler'] = profiler
+			init_params['trajectories'] = None
+			init_params['rng'] = random.Random(3)
+			init_params['particle_steps'] = 0
+			all_results.append(gr.run_one_generation(
+				input_params, init_params, combined_results, list(range(4)), False))
+		init_params['profiler'] = None
+		summary = profiler.end_generation(0)
+		# steps counted by engine should match those recorded by profiler
+		if init_params['particle_steps'] != summary['counts']['particle_steps']:
+			print(
+				'run_one_generation error: {} engine miscounted particle steps'.format(
+					engine))
+		if all_results[0] != all_results[1]:
+			print(
+				"""run_one_generation error: results of {} engine differ when \
+				profiled""".format(engine).replace('\t', ''))
+		if (
+			summary['counts'].get('steps', 0) == 0 or
+			summary['counts'].get('boundary_crossings', 0) == 0 or
+			summary['max_alive'] != 4 or
+			'simulation.collision' not in summary['times']):
+			print(
+				'run_one_generation error: {} engine not profiled'.format(engine))
+
+
+def profiler_tests(input_params, init_params):
+	# ensures that times and counts are summarised for each generation
+	test_profiler()
+	# ensures that profiling records phases without changing results
+	test_profiled_run_one_generation(input_params, init_params)
+
+
+# Begin tests on metrics module
+
+
+def test_ring_buffer_sink():
+	sink = mt.RingBufferSink(max_records=2)
+	for i in range(3):
+		sink.record({'generation': i})
+	if sink.get_records() != [{'generation': 1}, {'generation': 2}]:
+		print('RingBufferSink error: last generations not kept')
+
+
+def test_file_sinks():
+	records = [
+		{'generation': i, 'best_distance_score': 10 * i, 'victory': False}
+		for i in range(3)]
+	for output_path in ('metrics_test.jsonl', 'metrics_test.csv'):
+		sink = mt.get_sink(output_path, buffer_size=2, flush_interval=60)
+		sink.record(records[0])
+		with open(output_path) as f:
+			if f.read() != '':
+				print('{} error: record not buffered'.format(type(sink).__name__))
+		for record in records[1:]:
+			sink.record(record)
+		sink.close()
+		with open(output_path) as f:
+			if output_path.endswith('.csv'):
+				lines = f.read().splitlines()
+				written = lines[0] == 'generation,best_distance_score,victory' and (
+					lines[1:] == ['0,0,False', '1,10,False', '2,20,False'])
+			else:
+				written = [json.loads(line) for line in f] == records
+		os.remove(output_path)
+		if not written:
+			print('{} error: records not written correctly'.format(
+				type(sink).__name__))
+	if mt.get_sink(None).enabled:
+		print('get_sink error: NullSink not returned without a path')
+
+
+def test_get_generation_metrics():
+	generation_data = [
+		[b'\x00\x01', 10E8, 2], [b'\x00\x01', 10E8, 2], [b'\x03', 50, 1],
+		[b'\x03\x03\x03', 30, 3]]
+	metrics = mt.get_generation_metrics(4, generation_data, 10E8, 0.5, 2.0, None, 20)
+	if (
+		metrics['best_distance_score'] != 10E8 or
+		metrics['mean_distance_score'] != 40 or
+		not metrics['victory'] or metrics['num_victorious'] != 2 or
+		metrics['diversity'] != 0.75 or metrics['mean_genome_length'] != 2 or
+		metrics['max_genome_length'] != 3 or metrics['steps'] != 20 or
+		'fitness_cache_hit_rate' in metrics):
+		print('get_generation_metrics error: incorrect metrics')
+
+
+def metrics_tests():
+	# ensures that only the last max_records generations are kept
+	test_ring_buffer_sink()
+	# ensures that file sinks buffer records and write them all when closed
+	test_file_sinks()
+	# ensures that metrics are computed correctly from a generation's results
+	test_get_generation_metrics()
+
+
+# Begin tests on checkpoint module
+
+
+def test_checkpoint_writer(input_params):
+	checkpoint_path = 'checkpoint_test.pickle'
+	states = [
+		{
+			'checkpoint_version': ck.checkpoint_version, 'generation': i,
+			'particle_size': input_params['particle_size'],
+			'track_num': input_params['track_num'],
+			'num_of_particles_per_generation': (
+				input_params['num_of_particles_per_generation'])}
+		for i in range(3)]
+	checkpoint_writer = ck.CheckpointWriter(checkpoint_path)
+	for state in states:
+		checkpoint_writer.submit(state)
+	checkpoint_writer.close()
+	if ck.load_checkpoint(checkpoint_path, input_params) != states[-1]:
+		print('CheckpointWriter error: latest checkpoint not written')
+	if os.path.isfile(checkpoint_path + '.tmp'):
+		print('write_checkpoint error: temporary file not replaced')
+	try:
+		ck.load_checkpoint(checkpoint_path, dict(input_params, track_num='other'))
+		print('load_checkpoint error: checkpoint of other track loaded')
+	except Exception:
+		pass
+	os.remove(checkpoint_path)
+
+
+def test_resume_run_all_generations(input_params, init_params):
+	checkpoint_path = 'checkpoint_test.pickle'
+	input_params = dict(
+		input_params, engine='vectorised', num_best_to_take=2, num_random_to_take=1,
+		chance_of_picking_random_sample=10, mutation_chance_options=[10, 50],
+		pickle_best=False, print_progress=False, checkpoint_interval=2,
+		checkpoint_path=checkpoint_path)
+	init_params = dict(init_params, trajectories=None, fitness_cache=None)
+	final_states = []
+	# training is run uninterrupted, then stopped after 3 generations and resumed
+	for num_of_generations, resume in ((6, False), (3, False), (6, True)):
+		input_params.update(
+			num_of_generations=num_of_generations, resume=resume,
+			adaptive_algo=[False, 0, 0, 0])
+		# random state of resumed training is restored from checkpoint
+		init_params['rng'] = random.Random(5)
+		rm.run_all_generations(input_params, init_params)
+		state = ck.load_checkpoint(checkpoint_path, input_params)
+		if state['generation'] != num_of_generations:
+			print('run_all_generations error: last generation not checkpointed')
+		del state['elapsed']
+		final_states.append(state)
+	os.remove(checkpoint_path)
+	if final_states[0] != final_states[2]:
+		print('run_all_generations error: resumed training differs')
+
+
+def checkpoint_tests(input_params, init_params):
+	# ensures that only the latest checkpoint is written, and is checked on load
+	test_checkpoint_writer(input_params)
+	# ensures that resumed training matches uninterrupted training
+	test_resume_run_all_generations(input_params, init_params)
+
+
+# Begin tests on verification module
+
+
+def test_verify_genomes(input_params, init_params):
+	genomes = list(map(g.from_names, [
+		['right'] * 42 + ['up'] * 30 + ['left'] * 45, ['up'] * 50,
+		['right'] * 42 + ['up'] * 3]))
+	results = vf.verify_genomes(input_params, init_params, genomes)
+	if [result['outcome'] for result in results] != [
+		'victory', 'collided', 'moves used up']:
+		print('verify_genomes error: outcomes of replayed genomes incorrect')
+	if results[0]['steps'] != 112 or results[2]['steps'] != 45:
+		print('verify_genomes error: steps of replayed genomes incorrect')
+
+
+def test_verify_move_files():
+	move_file_paths = ['verification_test_{}.moves'.format(i) for i in range(5)]
+	genome = g.from_names(['right'] * 42 + ['up'] * 30 + ['left'] * 45)
+	mf.write_move_file(move_file_paths[0], genome, 0, 15, 15, 112)
+	mf.write_move_file(move_file_paths[1], genome[:50], 0, 15, 15)
+	# moves of a missing track fail without affecting other tracks
+	mf.write_move_file(move_file_paths[2], genome, 'missing', 15, 15)
+	# a corrupt move file fails without affecting others of its track, as does
+	# a file that is not a move file at all
+	mf.write_move_file(move_file_paths[3], genome, 0, 15, 15)
+	with open(move_file_paths[3], 'r+b') as f:
+		f.seek(mf.header_format.size)
+		f.write(b'\x00')
+	with open(move_file_paths[4], 'wb') as f:
+		f.write(b'not a move file')
+	results = vf.verify_move_files(move_file_paths, num_of_workers=2)
+	for path in move_file_paths:
+		os.remove(path)
+	if (
+		not results[0]['victory'] or results[0]['saved_steps'] != 112 or
+		results[1]['victory'] or
+		not all(isinstance(result, Exception) for result in results[2:])):
+		print('verify_move_files error: move files not verified correctly')
+
+
+def verification_tests(input_params, init_params):
+	# ensures that genomes are replayed without random moves, with outcomes
+	test_verify_genomes(input_params, init_params)
+	# ensures that move files are verified in a pool, grouped by track
+	test_verify_move_files()
+
+
+# Begin tests on viewer module
+
+
+def test_viewer(input_params, init_params):
+	viewer = Viewer(
+		0, 15, init_params['display_width'], init_params['display_height'], fps=10)
+	if not viewer.is_due():
+		print('Viewer error: first frame not due')
+	viewer.publish(np.array([100, 200]), np.array([50, 60]))
+	if viewer.is_due():
+		print('Viewer error: frames published faster than fps')
+	# frames published during a generation are sent to the viewer process
+	init_params = dict(init_params, viewer=viewer, rng=random.Random(0))
+	gr.run_one_generation(
+		dict(input_params, engine='vectorised'), init_params,
+		[[g.from_names(['right'] * 40), 0, 0, 0]] * 4, list(range(4)), False)
+	viewer.close()
+	if viewer.process.exitcode != 0:
+		print('Viewer error: viewer process did not close cleanly')
+
+
+def viewer_tests(input_params, init_params):
+	# ensures that frames are published to a viewer process, which is closed
+	test_viewer(input_params, init_params)
+
+
+# Begin tests on rendering module
+
+
+def test_renderer():
+	pygame.init()
+	game_display = pygame.display.set_mode((800, 600))
+	track_img = pygame.image.load(os.path.join(
+		os.path.dirname(__file__), 'tracks', 'track_1', 'track_1_full.png'))
+	renderer = Renderer(game_display, track_img, 15)
+	rng = random.Random(0)
+	for num_of_particles in (20, rd.batch_threshold + 20):
+		# particles are on a grid, so some share a position, and some are partly
+		# outside the display
+		particles = [
+			Particle(15, (rng.randrange(-15, 800, 15), rng.randrange(-15, 600, 15)))
+			for i in range(num_of_particles)]
+		init_params = {'game_display': game_display, 'track_img': track_img}
+		gr.draw_particles(init_params, particles)
+		expected_pixels = pygame.surfarray.array3d(game_display)
+		renderer.reset()
+		# particles drawn in the previous frame are erased
+		renderer.draw(
+			[30 + x for x in range(num_of_particles)], [300] * num_of_particles)
+		gr.draw_particles(dict(init_params, renderer=renderer), particles)
+		if not (pygame.surfarray.array3d(game_display) == expected_pixels).all():
+			print('Renderer error: {} particles not drawn correctly'.format(
+				num_of_particles))
+	pygame.display.quit()
+
+
+def rendering_tests():
+	# ensures that renderer draws the same frames as redrawing the whole display
+	test_renderer()
+
+
 # Begin tests on run_modes module
 
 def test_get_top_results(generation_data):
@@ -434,6 +1316,11 @@ def test_get_top_results(generation_data):
 		top_results[0][0] != ['down', 'right', 'right'] or
 		top_results[1][0] != ['down', 'left', 'right']):
 		print('get_top_results error: incorrect ordering produced')
+	# equal results are ranked by position, and unfilled places are placeholders
+	tied_data = [(b'a', 20, 3), (b'b', 20, 3), (b'c', 0, 1000)]
+	if [result[3] for result in rm.get_top_results(4, tied_data)] != [0, 1, 0, 0] or (
+		rm.get_top_results(4, tied_data)[2] != [b'', 0, 1000, 0]):
+		print('get_top_results error: ties or placeholders handled incorrectly')
 	return top_results
 
 
@@ -487,11 +1374,243 @@ def run_modes_tests():
 	test_choose_samples(top_results, random_selection)
 
 
+# Begin tests on section_creator module
+
+
+def test_filter_img_by_colour():
+	img = np.zeros((2, 3, 3), dtype=np.uint8)
+	img[1, 2] = cs.grey
+	img[0, 1] = (127, 127, 0)
+	filtered = sc.filter_img_by_colour(img, cs.grey)
+	if filtered.shape != (3, 2) or list(zip(*np.nonzero(filtered))) != [(2, 1)]:
+		print('filter_img_by_colour error: pixels not filtered by colour correctly')
+
+
+def test_get_run_length():
+	if (
+		sc.get_run_length(np.array([True, True, False, True])) != 2 or
+		sc.get_run_length(np.array([False, True])) != 0 or
+		sc.get_run_length(np.array([True, True])) != 2 or
+		sc.get_run_length(np.array([], dtype=bool)) != 0):
+		print('get_run_length error: run of True values not measured correctly')
+
+
+def test_get_section_bounds_and_direction():
+	add_values = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+	filtered_track = np.zeros((10, 6), dtype=bool)
+	filtered_track[1:9, 2:5] = True
+	section_bounds, direction_index = sc.get_section_bounds_and_direction(
+		filtered_track, (3, 3), add_values)
+	if (
+		direction_index != 1 or
+		section_bounds != [(1, 3), None, (3, 2), (3, 4)]):
+		print(
+			'get_section_bounds_and_direction error: bounds or direction not found '
+			'correctly')
+	# a square section has no furthest direction
+	square_track = np.pad(np.ones((3, 3), dtype=bool), 1)
+	try:
+		sc.get_section_bounds_and_direction(square_track, (2, 2), add_values)
+		print(
+			'get_section_bounds_and_direction error: ambiguous direction not '
+			'detected')
+	except Exception:
+		pass
+
+
+def test_create_sections():
+	for track_num in (0, 1):
+		section_path = os.path.join(
+			os.path.dirname(__file__), 'tracks', 'track_{}'.format(track_num),
+			'track_{}_sections.section'.format(track_num))
+		with open(section_path) as f:
+			expected_lines = f.readlines()
+		if sc.sections_to_lines(sc.create_sections(track_num)) != expected_lines:
+			print(
+				'create_sections error: sections of track {} do not match its .section '
+				'file'.format(track_num))
+
+
+def section_creator_tests():
+	# ensures that pixels of a colour are found, indexed by [x, y]
+	test_filter_img_by_colour()
+	test_get_run_length()
+	# ensures that the furthest direction from start_pos is the section direction
+	test_get_section_bounds_and_direction()
+	# ensures that sections created from track images match the .section files
+	test_create_sections()
+
+
+# Begin tests on preprocess_tracks module
+
+
+def test_get_colour_counts():
+	img = np.zeros((2, 3, 3), dtype=np.uint8)
+	img[0, :2] = cs.grey
+	img[1, 2] = cs.vb_red
+	if ct.get_colour_counts(img) != {cs.black: 3, cs.grey: 2, cs.vb_red: 1}:
+		print('get_colour_counts error: colours not counted correctly')
+
+
+def test_discover_tracks():
+	track_nums = pt.discover_tracks()
+	if track_nums[:2] != ['0', '1'] or '15' not in pt.discover_particle_sizes():
+		print('discover_tracks error: tracks or particle sizes not found')
+
+
+def test_preprocess_track():
+	section_path = pt.get_section_path(0)
+	with open(section_path) as f:
+		section_lines = f.readlines()
+	summary = pt.preprocess_track('0', ['15'], force=True)
+	if (
+		summary['skipped'] or summary['num_of_sections'] != 3 or
+		summary['sections_written'] or summary['bundles_compiled'] != ['15']):
+		print('preprocess_track error: track not preprocessed correctly')
+	with open(section_path) as f:
+		if f.readlines() != section_lines:
+			print('preprocess_track error: .section file of track changed')
+	# unchanged track is skipped, in a worker process
+	summaries = pt.preprocess_tracks(['0'], ['15'], 1)
+	if isinstance(summaries[0], Exception) or not summaries[0]['skipped']:
+		print('preprocess_tracks error: unchanged track not skipped')
+
+
+def preprocess_tracks_tests():
+	# ensures that pixels of each colour in an image are counted
+	test_get_colour_counts()
+	test_discover_tracks()
+	# ensures that preprocessing reproduces .section file and skips unchanged
+	# tracks
+	test_preprocess_track()
+
+
+# Begin tests on track_generator module
+
+
+def test_generate_path():
+	for seed in range(20):
+		path = tg.generate_path((12, 9), 15, random.Random(seed))
+		steps = [
+			(path[i + 1][0] - path[i][0], path[i + 1][1] - path[i][1])
+			for i in range(len(path) - 1)]
+		runs = [1]
+		for i in range(1, len(steps)):
+			if steps[i] == steps[i - 1]:
+				runs[-1] += 1
+			else:
+				runs.append(1)
+		if (
+			len(set(path)) != len(path) or
+			any(abs(x) + abs(y) != 1 for x, y in steps) or
+			len(runs) != 16 or min(runs) < tg.min_run_length or
+			any(not (0 <= x < 12 and 0 <= y < 9) for x, y in path)):
+			print('generate_path error: path is not a valid path with 15 turns')
+			break
+	try:
+		tg.generate_path((12, 9), 100, random.Random(0))
+		print('generate_path error: path with too many turns for grid generated')
+	except Exception:
+		pass
+
+
+def test_generate_track():
+	track_num = 'generator_test'
+	try:
+		sections = tg.generate_track(
+			track_num, 1000, 700, 60, 8, num_of_turns=9, seed=1)
+		input_params = {
+			'particle_size': 15, 'track_num': track_num,
+			'fitness_mode': 'sections'}
+		if (
+			len(sections) != 10 or
+			len(init.initialise_setup(input_params)[-1]) != 10):
+			print('generate_track error: generated track does not have 10 sections')
+		# generated tracks are reproducible for a given seed
+		with open(pt.get_section_path(track_num)) as f:
+			section_lines = f.readlines()
+		tg.generate_track(
+			track_num, 1000, 700, 60, 8, num_of_turns=9, seed=1, overwrite=True)
+		with open(pt.get_section_path(track_num)) as f:
+			if f.readlines() != section_lines:
+				print('generate_track error: track not reproducible from seed')
+	finally:
+		shutil.rmtree(
+			os.path.join(
+				os.path.dirname(__file__), 'tracks', 'track_{}'.format(track_num)),
+			ignore_errors=True)
+
+
+def track_generator_tests():
+	# ensures that paths are self-avoiding with the specified number of turns
+	test_generate_path()
+	# ensures that generated tracks can be loaded, with one section per run
+	test_generate_track()
+
+
+# Begin tests on benchmarks
+
+
+def test_run_generations():
+	input_params, init_params = bs.get_params('0', '15', 20, 'vectorised')
+	elapsed, num_of_steps = bs.run_generations(input_params, init_params, 3)
+	if elapsed <= 0 or num_of_steps <= 0:
+		print('run_generations error: generations not timed or steps not counted')
+
+
+def test_benchmark_parallel_generations():
+	results = bs.benchmark_generations('0', '15', 10, 'parallel', 2)
+	if 'pool_startup' not in results or pr.pool is not None:
+		print(
+			'benchmark_generations error: parallel workers not started before '
+			'timing, or not stopped after the case')
+
+
+def test_compare_results():
+	baseline = {'results': {
+		'faster_is_better': bs.get_result(10, 'ms', False),
+		'more_is_better': bs.get_result(100, 'steps/s', True),
+		'removed': bs.get_result(1, 'ms', False)}}
+	results = {'results': {
+		'faster_is_better': bs.get_result(11, 'ms', False),
+		'more_is_better': bs.get_result(70, 'steps/s', True),
+		'added': bs.get_result(1, 'ms', False)}}
+	regressions = bs.compare_results(results, baseline, 0.2)
+	if [regression[0] for regression in regressions] != ['more_is_better']:
+		print('compare_results error: regressions not identified correctly')
+
+
+def benchmarks_tests():
+	# ensures that generations can be timed headlessly
+	test_run_generations()
+	# ensures that parallel workers are started and stopped for each case
+	test_benchmark_parallel_generations()
+	# ensures that only results worse than baseline by more than tolerance are
+	# flagged
+	test_compare_results()
+
+
 if __name__ == '__main__':
 	print('All tests completed successfully if no more print statements appear.\n')
 	pickle_funcs_tests()
+	move_file_tests()
+	genome_tests()
 	particle_tests()
 	initialisation_tests()
 	distance_handling_tests()
 	generation_run_tests()
+	input_params, init_params = vectorised_run_tests()
+	distance_field_tests(input_params, init_params)
+	parallel_run_tests(input_params, init_params)
+	fitness_cache_tests(input_params, init_params)
+	profiler_tests(input_params, init_params)
+	metrics_tests()
+	checkpoint_tests(input_params, init_params)
+	verification_tests(input_params, init_params)
+	viewer_tests(input_params, init_params)
+	rendering_tests()
 	run_modes_tests()
+	section_creator_tests()
+	preprocess_tracks_tests()
+	track_generator_tests()
+	benchmarks_tests()
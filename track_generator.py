@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""Generates complete track folders, in the same format as hand drawn tracks,
+from a canvas size, corridor width, wall width, number of turns and seed, e.g.
+for benchmarking on tracks much larger than the ones provided. The track is a
+random self-avoiding path through a grid of square cells, each corridor_width
+pixels wide and separated by walls wall_width pixels wide, with every straight
+run at least 2 cells long so that section_creator can find its sections. Run as
+a script, e.g. python track_generator.py 2 --width 8000 --height 6000 --turns 200
+--seed 1"""
+
+import os
+import random
+import argparse
+import cv2
+import numpy as np
+import modules.colour_store as cs
+import section_creator as sc
+
+# rows of cells in each band of the path
+band_height = 3
+min_run_length = 2
+
+
+def get_grid_size(width, height, corridor_width, wall_width):
+	"""Returns number of columns and rows of cells that fit within canvas"""
+	pitch = corridor_width + wall_width
+	return (width - wall_width) // pitch, (height - wall_width) // pitch
+
+
+def generate_band_path(columns, rows, num_of_runs, rng):
+	"""Returns list of cells of a path made of num_of_runs straight runs,
+	alternating between along and across rows, or None if it does not fit. The
+	path zig-zags between the top and bottom rows of a band of band_height rows,
+	moving along the band in runs of random length, then moves down into the
+	next band and zig-zags back along it, so that it never touches itself"""
+	num_of_bands = rows // band_height
+	if columns < min_run_length + 1 or num_of_bands == 0:
+		return None
+	# mean length of runs along rows that spreads path over all bands
+	num_of_row_runs = (num_of_runs + 1) // 2
+	mean_length = max(
+		min_run_length, num_of_bands * (columns - 1) // num_of_row_runs)
+	runs_per_band = (columns - 1) // min_run_length
+	path = [(0, 0)]
+	step = 1
+	for run in range(num_of_runs):
+		column, row = path[-1]
+		band = row // band_height
+		if run % 2 == 0:
+			# run along row, leaving room in this band for any later runs that will
+			# not fit in the bands below, and to edge of canvas if a further run
+			# across and along the band would not fit
+			available = columns - 1 - column if step == 1 else column
+			later_runs = num_of_row_runs - run // 2 - 1
+			runs_needed_in_band = (
+				later_runs - (num_of_bands - band - 1) * runs_per_band)
+			max_length = available - max(0, runs_needed_in_band) * min_run_length
+			if max_length < min_run_length:
+				return None
+			length = min(
+				max_length,
+				rng.randint(min_run_length, 2 * mean_length - min_run_length))
+			if available - length < min_run_length:
+				length = available
+			path.extend((column + step * i, row) for i in range(1, length + 1))
+		else:
+			at_edge = column == (columns - 1 if step == 1 else 0)
+			if not at_edge or run == num_of_runs - 1:
+				# zig-zag to other row of band
+				if row == band * band_height:
+					target_row = row + band_height - 1
+				else:
+					target_row = band * band_height
+			else:
+				# move down into next band, and back along it
+				if band + 1 >= num_of_bands:
+					return None
+				target_rows = [
+					target for target in (
+						(band + 1) * band_height, (band + 2) * band_height - 1)
+					if target - row >= min_run_length]
+				target_row = rng.choice(target_rows)
+				step = -step
+			direction = 1 if target_row > row else -1
+			path.extend(
+				(column, row + direction * i)
+				for i in range(1, abs(target_row - row) + 1))
+	return path
+
+
+def generate_path(grid_size, num_of_turns, rng):
+	"""Returns list of cells of a random self-avoiding path through grid, made of
+	num_of_turns + 1 straight runs of at least min_run_length cells. The path
+	from generate_band_path is randomly transposed and flipped"""
+	columns, rows = grid_size
+	transposes = [False, True]
+	rng.shuffle(transposes)
+	for transpose in transposes:
+		if transpose:
+			path = generate_band_path(rows, columns, num_of_turns + 1, rng)
+		else:
+			path = generate_band_path(columns, rows, num_of_turns + 1, rng)
+		if path is not None:
+			break
+	else:
+		raise Exception(
+			"generate_path error: could not fit {} turns in a {}x{} grid".format(
+				num_of_turns, columns, rows))
+	if transpose:
+		path = [(row, column) for column, row in path]
+	flip_x, flip_y = rng.random() < 0.5, rng.random() < 0.5
+	return [(
+		columns - 1 - x if flip_x else x, rows - 1 - y if flip_y else y)
+		for x, y in path]
+
+
+def get_cell_rect(cell, corridor_width, wall_width):
+	"""Returns (x, y, width, height) of inside of cell, in pixels"""
+	pitch = corridor_width + wall_width
+	return (
+		wall_width + cell[0] * pitch, wall_width + cell[1] * pitch,
+		corridor_width, corridor_width)
+
+
+def get_opening_rect(cell, next_cell, corridor_width, wall_width):
+	"""Returns (x, y, width, height) of wall between two neighbouring cells"""
+	x, y, w, h = get_cell_rect(
+		(min(cell[0], next_cell[0]), min(cell[1], next_cell[1])), corridor_width,
+		wall_width)
+	if cell[0] != next_cell[0]:
+		return x + corridor_width, y, wall_width, h
+	return x, y + corridor_width, w, wall_width
+
+
+def fill_rect(img, rect, colour):
+	"""Fills (x, y, width, height) rect of img, indexed by [y, x]"""
+	x, y, w, h = rect
+	img[y: y + h, x: x + w] = colour
+
+
+# values of pixels in track drawn by draw_track, and their colours in full image
+background, boundary_pixel, track_pixel, victory_box_pixel = 0, 1, 2, 3
+pixel_colours = np.array((cs.white, cs.black, cs.grey, cs.vb_red), dtype=np.uint8)
+
+
+def draw_track(path, width, height, corridor_width, wall_width):
+	"""Returns array of pixels of track, indexed by [y, x], with values of
+	background, boundary_pixel, track_pixel or victory_box_pixel. The last cell of
+	path is the victory box"""
+	pixels = np.full((height, width), background, dtype=np.uint8)
+	for cell in path:
+		x, y, w, h = get_cell_rect(cell, corridor_width, wall_width)
+		fill_rect(
+			pixels, (x - wall_width, y - wall_width, w + 2 * wall_width,
+				h + 2 * wall_width), boundary_pixel)
+	for i, cell in enumerate(path):
+		fill_rect(pixels, get_cell_rect(cell, corridor_width, wall_width), track_pixel)
+		if i > 0:
+			fill_rect(
+				pixels, get_opening_rect(path[i - 1], cell, corridor_width, wall_width),
+				track_pixel)
+	fill_rect(
+		pixels, get_cell_rect(path[-1], corridor_width, wall_width),
+		victory_box_pixel)
+	return pixels
+
+
+def get_overlay(pixels, colour):
+	"""Returns image with alpha channel, of colour where pixels is True and
+	transparent elsewhere, as used for boundary and victory box images"""
+	overlay = np.zeros(pixels.shape + (4,), dtype=np.uint8)
+	overlay[:, :, :3] = cs.white
+	overlay[pixels] = tuple(colour) + (255,)
+	return overlay
+
+
+def generate_track(
+	track_num, width=800, height=600, corridor_width=90, wall_width=10,
+	num_of_turns=4, seed=None, overwrite=False):
+	"""Writes track_{track_num} folder with full, boundary, victory box and start
+	mark images and .section file, returning sections. Existing tracks are only
+	replaced if overwrite is True"""
+	parent_path = os.path.dirname(os.path.abspath(__file__))
+	track_path = parent_path + '/tracks/track_{}'.format(track_num)
+	if os.path.exists(track_path) and not overwrite:
+		raise Exception(
+			"generate_track error: track {} already exists".format(track_num))
+	if wall_width < 2:
+		raise Exception("generate_track error: wall_width must be at least 2")
+	rng = random.Random(seed)
+	path = generate_path(
+		get_grid_size(width, height, corridor_width, wall_width), num_of_turns, rng)
+	pixels = draw_track(path, width, height, corridor_width, wall_width)
+	x, y, w, h = get_cell_rect(path[0], corridor_width, wall_width)
+	start_mark = np.zeros((height, width, 4), dtype=np.uint8)
+	start_mark[:, :, :3] = cs.white
+	start_mark[y + h // 2, x + w // 2] = tuple(cs.green) + (255,)
+
+	os.makedirs(track_path, exist_ok=True)
+	file_prefix = track_path + '/track_{}'.format(track_num)
+	cv2.imwrite(file_prefix + '_full.png', pixel_colours[pixels])
+	cv2.imwrite(
+		file_prefix + '_boundary.png',
+		get_overlay(pixels == boundary_pixel, cs.black))
+	cv2.imwrite(
+		file_prefix + '_victory_box.png',
+		get_overlay(pixels == victory_box_pixel, cs.vb_red))
+	cv2.imwrite(file_prefix + '_start_mark.png', start_mark)
+	sections = sc.create_sections(track_num)
+	if len(sections) != num_of_turns + 1:
+		raise Exception(
+			"generate_track error: found {} sections instead of {}".format(
+				len(sections), num_of_turns + 1))
+	sc.write_sections_to_file(track_num, sections)
+	return sections
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(
+		description='Generate a random track folder for benchmarking')
+	parser.add_argument('track_num', help='number of track to create, e.g. 2')
+	parser.add_argument('--width', type=int, default=800, help='canvas width')
+	parser.add_argument('--height', type=int, default=600, help='canvas height')
+	parser.add_argument(
+		'--corridor-width', type=int, default=90, help='width of track, in pixels')
+	parser.add_argument(
+		'--wall-width', type=int, default=10,
+		help='width of track boundary, in pixels')
+	parser.add_argument('--turns', type=int, default=4, help='number of turns')
+	parser.add_argument('--seed', type=int, default=None, help='random seed')
+	parser.add_argument(
+		'--overwrite', action='store_true', help='replace existing track folder')
+	args = parser.parse_args()
+
+	sections = generate_track(
+		args.track_num, args.width, args.height, args.corridor_width,
+		args.wall_width, args.turns, args.seed, args.overwrite)
+	print('track_{}: {} sections written'.format(args.track_num, len(sections)))